@@ -0,0 +1,4 @@
+"""
+Воспроизводимые замеры производительности primitive_db на синтетических
+таблицах. Запуск: python -m src.benchmark --help.
+"""
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Командная строка бенчмарка: замер, отчёт и сравнение с базовым."""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from prettytable import PrettyTable
+
+from src.primitive_db.tables import STORAGE_ENGINES, TABLE_LAYOUTS
+from src.primitive_db.utils import TABLE_SUFFIXES
+
+from .generators import DEFAULT_CARDINALITY, parse_schema
+from .runner import (
+    SCENARIOS,
+    SIZES,
+    compare,
+    default_workers,
+    run_benchmarks,
+    scenario_label,
+)
+
+DEFAULT_SCHEMA = ["name:str", "age:int", "active:bool"]
+DEFAULT_THRESHOLD = 0.10
+# Бюджет запуска разовой команды сверх запуска пустого интерпретатора, мс.
+DEFAULT_STARTUP_BUDGET_MS = 60
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.benchmark",
+        description="Замеры производительности primitive_db.")
+    parser.add_argument(
+        "--schema", nargs="+", default=DEFAULT_SCHEMA, metavar="COL:TYPE",
+        help="столбцы таблицы, как в create_table "
+             f"(по умолчанию: {' '.join(DEFAULT_SCHEMA)})")
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=list(SIZES), metavar="N",
+        help="размеры таблицы в строках")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS),
+        default=list(SCENARIOS), metavar="NAME",
+        help=f"сценарии: {', '.join(SCENARIOS)}")
+    parser.add_argument(
+        "--ops", type=int, default=1000,
+        help="число операций в точечных сценариях")
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="число повторов сохранения и чтения таблицы")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cardinality", type=int, default=DEFAULT_CARDINALITY,
+        help="число различных значений в столбцах")
+    parser.add_argument(
+        "--workers", nargs="+", type=int, metavar="N",
+        help="числа процессов для сценария parallel_scan "
+             f"(по умолчанию: {' '.join(map(str, default_workers()))})")
+    parser.add_argument("--layout", choices=TABLE_LAYOUTS, default="rows")
+    parser.add_argument("--storage", choices=STORAGE_ENGINES, default="log")
+    parser.add_argument(
+        "--format", dest="fmt", choices=list(TABLE_SUFFIXES), default="json")
+    parser.add_argument(
+        "--output", metavar="FILE", default="bench_results.json",
+        help="куда записать результаты в JSON")
+    parser.add_argument(
+        "--baseline", metavar="FILE",
+        help="сравнить результаты с базовыми из файла")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="допустимое ухудшение (доля, по умолчанию 0.10)")
+    parser.add_argument(
+        "--update-baseline", action="store_true",
+        help="записать результаты в файл --baseline")
+    parser.add_argument(
+        "--startup-budget", type=float, metavar="MS",
+        const=DEFAULT_STARTUP_BUDGET_MS, nargs="?",
+        help="проверить, что p50 сценария startup за вычетом запуска "
+             "интерпретатора не больше MS миллисекунд "
+             f"(по умолчанию {DEFAULT_STARTUP_BUDGET_MS})")
+    args = parser.parse_args(argv)
+    if any(size < 1 for size in args.sizes):
+        parser.error("Размеры таблицы должны быть положительными.")
+    if args.update_baseline and not args.baseline:
+        parser.error("--update-baseline требует --baseline.")
+    if args.startup_budget is not None and "startup" not in args.scenarios:
+        parser.error("--startup-budget требует сценария startup.")
+    if args.workers is not None:
+        if "parallel_scan" not in args.scenarios:
+            parser.error("--workers требует сценария parallel_scan.")
+        if any(n < 0 for n in args.workers):
+            parser.error("Число процессов не может быть отрицательным.")
+    try:
+        args.schema = parse_schema(args.schema)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def _progress(scenario: str, rows: int, result: dict) -> None:
+    print(
+        f"{scenario:>12} {rows:>9} строк: {result['throughput']:,.0f} "
+        f"{result['unit']}, p95 {result['latency_ms']['p95']:.3f} мс",
+        flush=True,
+    )
+
+
+def print_results(results: dict) -> None:
+    """Печатает таблицу результатов."""
+    table = PrettyTable()
+    table.field_names = ["сценарий", "строк", "операций", "пропускная",
+                         "p50, мс", "p95, мс", "p99, мс", "память, КБ"]
+    for item in results["results"]:
+        latency = item["latency_ms"]
+        table.add_row([
+            scenario_label(item), item["rows"], item["ops"],
+            f"{item['throughput']:,.0f} {item['unit']}",
+            f"{latency['p50']:.3f}", f"{latency['p95']:.3f}",
+            f"{latency['p99']:.3f}",
+            f"{item['peak_memory_bytes'] / 1024:,.0f}",
+        ])
+    print(table)
+
+
+def print_comparison(rows: list[dict], threshold: float) -> int:
+    """Печатает сравнение с базовым и возвращает число регрессий."""
+    table = PrettyTable()
+    table.field_names = ["сценарий", "строк", "пропускная", "p95", ""]
+    for row in rows:
+        table.add_row([
+            row["scenario"], row["rows"],
+            f"{row['throughput_change']:+.1%}", f"{row['p95_change']:+.1%}",
+            "РЕГРЕССИЯ" if row["regression"] else "",
+        ])
+    print(table)
+    regressions = sum(row["regression"] for row in rows)
+    print(f"Регрессий (порог {threshold:.0%}): {regressions}")
+    return regressions
+
+
+def check_startup(results: dict, budget: float) -> int:
+    """Печатает время запуска сверх интерпретатора; возвращает превышения."""
+    interpreter = results["meta"]["interpreter_ms"]
+    exceeded = 0
+    for item in results["results"]:
+        if item["scenario"] != "startup":
+            continue
+        overhead = item["latency_ms"]["p50"] - interpreter
+        over = overhead > budget
+        exceeded += over
+        print(f"startup {item['rows']} строк: {overhead:.1f} мс сверх "
+              f"интерпретатора ({interpreter:.1f} мс), бюджет {budget:g} мс"
+              + (" — ПРЕВЫШЕН" if over else ""))
+    return exceeded
+
+
+def print_speedup(results: dict) -> None:
+    """Печатает ускорение parallel_scan по числу процессов."""
+    for item in results["results"]:
+        if item["scenario"] != "parallel_scan":
+            continue
+        print(f"parallel_scan {item['layout']} {item['rows']} строк, "
+              f"процессов {item['workers']}: "
+              f"ускорение x{item['speedup']:.2f}")
+
+
+def main(argv=None) -> None:
+    """Запускает замеры; при регрессии завершается с кодом 1."""
+    args = parse_args(argv)
+    output = Path(args.output).resolve()
+    baseline = Path(args.baseline).resolve() if args.baseline else None
+
+    results = run_benchmarks(
+        args.schema, args.sizes, args.scenarios, ops=args.ops,
+        repeat=args.repeat, seed=args.seed, cardinality=args.cardinality,
+        layout=args.layout, storage=args.storage, fmt=args.fmt,
+        workers=args.workers, progress=_progress)
+    print_results(results)
+    print_speedup(results)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=4),
+                      encoding="utf-8")
+    print(f"Результаты записаны в {output}")
+    if (args.startup_budget is not None
+            and check_startup(results, args.startup_budget)):
+        sys.exit(1)
+
+    if baseline is None:
+        return
+    if args.update_baseline:
+        baseline.write_text(json.dumps(results, ensure_ascii=False, indent=4),
+                            encoding="utf-8")
+        print(f"Базовые результаты обновлены: {baseline}")
+        return
+    try:
+        previous = json.loads(baseline.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        print(f"Файл базовых результатов {baseline} не найден.")
+        sys.exit(2)
+    if print_comparison(compare(results, previous, args.threshold),
+                        args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
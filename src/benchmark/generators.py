@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Генераторы синтетических данных для схем в формате create_table.
+Данные воспроизводимы: одинаковые схема, число строк и seed
+дают одни и те же строки.
+"""
+
+import random
+
+from src.primitive_db.core import parse_columns
+
+# Число различных значений столбца по умолчанию: равенство по столбцу
+# отбирает примерно rows / DEFAULT_CARDINALITY строк.
+DEFAULT_CARDINALITY = 1000
+
+
+def parse_schema(columns: list[str]) -> list[tuple[str, str]]:
+    """Схема из описаний столбцов <имя>:<тип>, как у create_table (без ID)."""
+    schema = parse_columns(columns)
+    if any(name == "ID" for name, _ in schema):
+        raise ValueError("Столбец ID добавляется автоматически.")
+    return schema
+
+
+def value_generator(name: str, col_type: str, rng: random.Random,
+                    cardinality: int = DEFAULT_CARDINALITY):
+    """Функция без аргументов, выдающая случайные значения столбца."""
+    cardinality = max(1, cardinality)
+    if col_type == "int":
+        return lambda: rng.randrange(cardinality)
+    if col_type == "bool":
+        return lambda: rng.random() < 0.5
+    return lambda: f"{name}_{rng.randrange(cardinality)}"
+
+
+def generate_rows(schema: list[tuple[str, str]], count: int, seed: int = 0,
+                  cardinality: int = DEFAULT_CARDINALITY):
+    """Лениво выдаёт count строк — списки значений в порядке столбцов."""
+    rng = random.Random(seed)
+    generators = [value_generator(name, col_type, rng, cardinality)
+                  for name, col_type in schema]
+    for _ in range(count):
+        yield [generate() for generate in generators]
+
@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Сценарии нагрузки и замеры.
+
+Каждый размер таблицы прогоняется в отдельном временном каталоге:
+таблица bench заполняется синтетическими строками (сценарий bulk_insert),
+затем по очереди выполняются остальные сценарии. Для каждого сценария
+считаются пропускная способность, процентили задержек операций и пик
+памяти. Первая операция сценария — прогрев: она не входит в замер
+времени, по ней под tracemalloc меряется пик памяти.
+"""
+
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from math import ceil
+from pathlib import Path
+
+from src.constants import BULK_BATCH_SIZE
+from src.decorators import set_confirm_mode
+from src.primitive_db import parallel
+from src.primitive_db.binary import BinaryTable, write_binary_table
+from src.primitive_db.bulk import batched
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.core import (
+    append_rows,
+    cache_result,
+    create_table,
+    delete,
+    indexes,
+    insert,
+    select,
+    update,
+)
+from src.primitive_db.engine import command_cache, connect, disconnect, execute
+from src.primitive_db.predicates import Between, Compare, bind
+from src.primitive_db.tables import TableManager
+from src.primitive_db.utils import load_table_data, save_table_data
+
+from .generators import DEFAULT_CARDINALITY, generate_rows, value_generator
+
+TABLE_NAME = "bench"
+SIZES = (10_000, 100_000, 1_000_000)
+# Минимальное число пакетов массовой вставки, чтобы процентили имели смысл.
+MIN_BULK_BATCHES = 10
+# Доля значений, которую захватывает диапазон в select_range.
+RANGE_FRACTION = 0.01
+# Каталог, из которого запускается python -m src.primitive_db.main.
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+# Представления таблицы, которые просматривает parallel_scan.
+PARALLEL_LAYOUTS = ("columnar", "binary")
+
+
+class Workload:
+    """
+    Таблица bench заданного размера во временном каталоге.
+    Используется как контекстный менеджер: на входе создаёт каталог
+    и таблицу, на выходе сохраняет изменения и удаляет каталог.
+    """
+
+    def __init__(self, schema: list[tuple[str, str]], rows: int, seed: int = 0,
+                 cardinality: int = DEFAULT_CARDINALITY, layout: str = "rows",
+                 storage: str = "log", fmt: str = "json"):
+        self.schema = schema
+        self.rows = rows
+        self.seed = seed
+        self.cardinality = cardinality
+        self.layout = layout
+        self.storage = storage
+        self.fmt = fmt
+        self.rng = random.Random(seed + 1)
+        self.values = {name: value_generator(name, col_type, self.rng,
+                                             cardinality)
+                       for name, col_type in schema}
+        self.types = {"ID": "int", **dict(schema)}
+        # Столбец для условий: первый int-столбец, иначе ID.
+        self.key = next((name for name, col_type in schema
+                         if col_type == "int"), "ID")
+        # Столбец, который меняют update.
+        self.target = schema[0][0]
+        self.tables = None
+        self._cwd = None
+        self._tmp = None
+
+    def __enter__(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.mkdtemp(prefix="primitive_db_bench_")
+        os.chdir(self._tmp)
+        os.mkdir("data")
+        indexes.drop(TABLE_NAME)
+        cache_result.invalidate()
+        command_cache.invalidate()
+        self.tables = TableManager(layout=self.layout, storage=self.storage)
+        connect(self.tables)
+        with quiet():
+            metadata = create_table(
+                self.tables.metadata, TABLE_NAME,
+                [f"{name}:{col_type}" for name, col_type in self.schema])
+        self.tables.save_metadata(metadata)
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            disconnect(self.tables)
+        finally:
+            indexes.drop(TABLE_NAME)
+            cache_result.invalidate()
+            command_cache.invalidate()
+            os.chdir(self._cwd)
+            shutil.rmtree(self._tmp, ignore_errors=True)
+
+    @property
+    def metadata(self) -> dict:
+        return self.tables.metadata
+
+    def data(self, writable: bool = False):
+        return self.tables.get(TABLE_NAME, writable=writable)
+
+    def settle(self) -> None:
+        """Сохраняет изменения и дожидается компакции (вне замеров)."""
+        self.tables.flush()
+        self.tables.wait_compaction()
+
+    def random_id(self) -> int:
+        return self.rng.randint(1, max(1, self.rows))
+
+    def random_value(self, column: str):
+        if column == "ID":
+            return self.random_id()
+        return self.values[column]()
+
+    def random_range(self, column: str) -> tuple:
+        """Диапазон, захватывающий около RANGE_FRACTION значений столбца."""
+        domain = self.rows if column == "ID" else self.cardinality
+        width = max(1, int(domain * RANGE_FRACTION))
+        low = self.random_value(column)
+        return low, low + width - 1
+
+    def where(self, node):
+        """Условие, связанное со схемой, как после разбора команды."""
+        return bind(node, self.types)
+
+    def random_row(self) -> list:
+        return [self.values[name]() for name, _ in self.schema]
+
+
+@contextmanager
+def quiet():
+    """Подавляет вывод команд во время замеров."""
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        with redirect_stdout(devnull):
+            yield
+
+
+def _literal(value) -> str:
+    """Значение в виде литерала команды."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return f'"{value}"'
+    return str(value)
+
+
+def scenario_bulk_insert(w: Workload, settings: dict):
+    """Заполнение таблицы пакетами append_rows (как команда load)."""
+    batch_size = max(1, min(BULK_BATCH_SIZE, w.rows // MIN_BULK_BATCHES))
+    batches = batched(
+        generate_rows(w.schema, w.rows, w.seed, w.cardinality), batch_size)
+    data = w.data(writable=True)
+
+    def op(_):
+        append_rows(w.metadata, TABLE_NAME, next(batches), data,
+                    w.tables.reserve_ids)
+        w.tables.mark_dirty(TABLE_NAME)
+
+    return op, ceil(w.rows / batch_size), batch_size
+
+
+def scenario_select_eq(w: Workload, settings: dict):
+    """core.select по равенству (с индексом после первого запроса)."""
+    data = w.data()
+
+    def op(_):
+        cache_result.invalidate(TABLE_NAME)
+        where = w.where(Compare(w.key, "=", w.random_value(w.key)))
+        select(data, where, table_name=TABLE_NAME)
+
+    return op, settings["ops"] + 1, 1
+
+
+def scenario_select_range(w: Workload, settings: dict):
+    """core.select по диапазону between."""
+    data = w.data()
+
+    def op(_):
+        cache_result.invalidate(TABLE_NAME)
+        where = w.where(Between(w.key, *w.random_range(w.key)))
+        select(data, where, table_name=TABLE_NAME)
+
+    return op, settings["ops"] + 1, 1
+
+
+def scenario_insert(w: Workload, settings: dict):
+    """core.insert по одной строке."""
+    data = w.data(writable=True)
+
+    def op(_):
+        insert(w.metadata, TABLE_NAME, w.random_row(), data,
+               reserve_ids=w.tables.reserve_ids)
+        w.tables.mark_dirty(TABLE_NAME)
+
+    return op, settings["ops"] + 1, 1
+
+
+def scenario_update(w: Workload, settings: dict):
+    """core.update одной строки по ID."""
+    data = w.data(writable=True)
+
+    def op(_):
+        where = w.where(Compare("ID", "=", w.random_id()))
+        update(data, {w.target: w.random_value(w.target)}, where,
+               table_name=TABLE_NAME, schema=w.metadata[TABLE_NAME])
+        w.tables.mark_dirty(TABLE_NAME)
+
+    return op, settings["ops"] + 1, 1
+
+
+def scenario_delete(w: Workload, settings: dict):
+    """
+    core.delete одной строки по ID. Удаление перестраивает таблицу
+    и индексы целиком, поэтому операций в сто раз меньше, чем у остальных.
+    """
+    data = w.data(writable=True)
+
+    def op(_):
+        where = w.where(Compare("ID", "=", w.random_id()))
+        delete(data, where, table_name=TABLE_NAME)
+        w.tables.mark_dirty(TABLE_NAME)
+
+    return op, max(1, settings["ops"] // 100) + 1, 1
+
+
+def scenario_save(w: Workload, settings: dict):
+    """utils.save_table_data: запись снимка таблицы целиком."""
+    w.settle()
+    data = w.data()
+    schema = w.metadata[TABLE_NAME]
+
+    def op(_):
+        save_table_data(TABLE_NAME, data, schema)
+
+    return op, settings["repeat"] + 1, len(data)
+
+
+def scenario_load(w: Workload, settings: dict):
+    """utils.load_table_data: чтение снимка таблицы целиком."""
+    w.settle()
+    rows = len(w.data())
+
+    def op(_):
+        data = load_table_data(TABLE_NAME)
+        if hasattr(data, "close"):
+            data.close()
+
+    return op, settings["repeat"] + 1, rows
+
+
+def scenario_repl(w: Workload, settings: dict):
+    """
+    Команды REPL целиком: разбор, выполнение, вывод и сохранение.
+    Чередуются select по равенству, агрегат по диапазону, update и insert.
+    """
+    def commands():
+        while True:
+            yield (f"select from {TABLE_NAME} where "
+                   f"{w.key} = {_literal(w.random_value(w.key))}")
+            low, high = w.random_range(w.key)
+            yield (f"select count(*) from {TABLE_NAME} where "
+                   f"{w.key} between {low} and {high}")
+            yield (f"update {TABLE_NAME} set {w.target} = "
+                   f"{_literal(w.random_value(w.target))} "
+                   f"where ID = {w.random_id()}")
+            yield (f"insert into {TABLE_NAME} values ("
+                   + ", ".join(_literal(v) for v in w.random_row()) + ")")
+
+    stream = commands()
+    w.tables.flush_policy = "command"
+
+    def op(_):
+        execute(w.tables, next(stream))
+        w.tables.end_command()
+
+    return op, settings["ops"] + 1, 1
+
+
+def _spawn(args: list[str]) -> None:
+    """Запускает интерпретатор с аргументами и ждёт его завершения."""
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    subprocess.run([sys.executable, *args], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def scenario_startup(w: Workload, settings: dict):
+    """
+    Разовая команда -c в новом процессе, как из скрипта: запуск
+    интерпретатора, импорт, чтение таблицы и select по ID в формате tsv.
+    Время включает запуск самого интерпретатора (см. interpreter_startup).
+    """
+    w.settle()
+
+    def op(_):
+        _spawn(["-m", "src.primitive_db.main", "-c",
+                f"select from {TABLE_NAME} where ID = {w.random_id()} "
+                "format tsv"])
+
+    return op, settings["repeat"] + 1, 1
+
+
+def default_workers() -> list[int]:
+    """Числа процессов для parallel_scan: 0, 1, 2, … по числу ядер (не меньше 2)."""
+    return list(range(max(2, os.cpu_count() or 1) + 1))
+
+
+def scenario_parallel_scan(w: Workload, settings: dict):
+    """
+    Полный просмотр select ... where без индексов по столбцовой
+    и бинарной копиям таблицы для каждого числа процессов из
+    settings["workers"] (0 и 1 — просмотр в текущем процессе).
+    Порог PARALLEL_MIN_ROWS на время сценария снимается. В отличие
+    от остальных сценариев выдаёт варианты:
+    ({"layout": ..., "workers": ...}, op, count, rows_per_op).
+    """
+    w.settle()
+    rows = list(w.data())
+    schema = w.metadata[TABLE_NAME]
+    # Абсолютный путь: рабочие процессы не зависят от текущего каталога.
+    path = Path(f"{TABLE_NAME}_parallel.tbl").resolve()
+    write_binary_table(path, rows, schema)
+    copies = {"columnar": ColumnarTable.from_rows(schema, rows),
+              "binary": BinaryTable(path)}
+    del rows
+    saved = dict(parallel.settings)
+    try:
+        for layout in PARALLEL_LAYOUTS:
+            data = copies[layout]
+            for workers in settings["workers"]:
+                parallel.configure(workers=workers, min_rows=0)
+
+                def op(_, data=data):
+                    select(data, w.where(
+                        Compare(w.key, "=", w.random_value(w.key))))
+
+                yield ({"layout": layout, "workers": workers},
+                       op, settings["repeat"] + 1, len(data))
+    finally:
+        parallel.configure(**saved)
+        parallel.shutdown()
+        copies["binary"].close()
+
+
+SCENARIOS = {
+    "bulk_insert": scenario_bulk_insert,
+    "select_eq": scenario_select_eq,
+    "select_range": scenario_select_range,
+    "insert": scenario_insert,
+    "update": scenario_update,
+    "delete": scenario_delete,
+    "save": scenario_save,
+    "load": scenario_load,
+    "startup": scenario_startup,
+    "repl": scenario_repl,
+    "parallel_scan": scenario_parallel_scan,
+}
+# Сценарии, которые выдают несколько вариантов замера.
+VARIANT_SCENARIOS = ("parallel_scan",)
+
+
+def interpreter_startup(repeat: int = 3) -> float:
+    """Медиана запуска пустого интерпретатора, мс (база для startup)."""
+    timings = []
+    for _ in range(max(1, repeat) + 1):
+        start = time.perf_counter()
+        _spawn(["-c", "pass"])
+        timings.append(time.perf_counter() - start)
+    timings = sorted(timings[1:])
+    return percentile(timings, 50) * 1e3
+
+
+def percentile(values: list[float], p: float) -> float:
+    """p-й процентиль отсортированного списка (ближайший ранг)."""
+    if not values:
+        return 0.0
+    rank = max(1, ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+def measure(op, count: int, rows_per_op: int) -> dict:
+    """
+    Выполняет op(0) как прогрев под tracemalloc, затем op(1..count-1)
+    с замером времени каждой операции.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    op(0)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    if not was_tracing:
+        tracemalloc.stop()
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(1, count):
+        op_start = time.perf_counter()
+        op(i)
+        latencies.append(time.perf_counter() - op_start)
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    ops = len(latencies)
+    return {
+        "ops": ops,
+        "seconds": seconds,
+        "throughput": ops * rows_per_op / seconds if seconds else 0.0,
+        "unit": "ops/s" if rows_per_op == 1 else "rows/s",
+        "latency_ms": {
+            "mean": sum(latencies) / ops * 1e3 if ops else 0.0,
+            "p50": percentile(latencies, 50) * 1e3,
+            "p95": percentile(latencies, 95) * 1e3,
+            "p99": percentile(latencies, 99) * 1e3,
+            "max": (latencies[-1] if ops else 0.0) * 1e3,
+        },
+        "peak_memory_bytes": max(0, peak),
+    }
+
+
+def run_benchmarks(schema: list[tuple[str, str]], sizes=SIZES,
+                   scenarios=tuple(SCENARIOS), ops: int = 1000,
+                   repeat: int = 3, seed: int = 0,
+                   cardinality: int = DEFAULT_CARDINALITY,
+                   layout: str = "rows", storage: str = "log",
+                   fmt: str = "json", workers=None,
+                   progress=None) -> dict:
+    """
+    Прогоняет сценарии для каждого размера таблицы.
+    bulk_insert выполняется всегда: он заполняет таблицу.
+    workers — числа процессов для parallel_scan (по умолчанию
+    default_workers()); его ускорение считается относительно
+    наименьшего из них.
+    progress(scenario, rows, result) вызывается после каждого замера.
+    Возвращает {"meta": {...}, "results": [...]}.
+    """
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(
+            f"Неизвестные сценарии: {', '.join(sorted(unknown))}. "
+            f"Допустимые: {', '.join(SCENARIOS)}"
+        )
+    if workers is not None and any(n < 0 for n in workers):
+        raise ValueError("Число процессов не может быть отрицательным.")
+    settings = {"ops": max(1, ops), "repeat": max(1, repeat),
+                "workers": sorted(set(workers or default_workers()))}
+    set_confirm_mode("yes")
+    results = []
+    for rows in sizes:
+        with Workload(schema, rows, seed, cardinality, layout, storage,
+                      fmt) as w:
+            for name in SCENARIOS:
+                if name != "bulk_insert" and name not in scenarios:
+                    continue
+                if name in VARIANT_SCENARIOS:
+                    results.extend(_run_variants(name, w, settings, progress))
+                    continue
+                op, count, rows_per_op = SCENARIOS[name](w, settings)
+                with quiet():
+                    result = measure(op, count, rows_per_op)
+                if name == "bulk_insert":
+                    w.settle()
+                    if fmt != "json":
+                        w.tables.convert(TABLE_NAME, fmt)
+                    if name not in scenarios:
+                        continue
+                result = {"scenario": name, "rows": rows, **result}
+                results.append(result)
+                if progress is not None:
+                    progress(name, rows, result)
+
+    meta = {}
+    if "startup" in scenarios:
+        meta["interpreter_ms"] = interpreter_startup(settings["repeat"])
+    if "parallel_scan" in scenarios:
+        meta["workers"] = settings["workers"]
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "executable": sys.executable,
+            "cpus": os.cpu_count(),
+            "schema": [f"{name}:{col_type}" for name, col_type in schema],
+            "sizes": list(sizes),
+            "ops": settings["ops"],
+            "repeat": settings["repeat"],
+            "seed": seed,
+            "cardinality": cardinality,
+            "layout": layout,
+            "storage": storage,
+            "format": fmt,
+            **meta,
+        },
+        "results": results,
+    }
+
+
+def _run_variants(name: str, w: Workload, settings: dict, progress) -> list:
+    """
+    Замеряет варианты сценария. speedup — пропускная способность
+    относительно первого варианта того же представления таблицы.
+    """
+    results = []
+    base = {}
+    for variant, op, count, rows_per_op in SCENARIOS[name](w, settings):
+        with quiet():
+            result = measure(op, count, rows_per_op)
+        first = base.setdefault(variant["layout"], result["throughput"])
+        result = {"scenario": name, "rows": w.rows, **variant, **result,
+                  "speedup": result["throughput"] / first if first else 0.0}
+        results.append(result)
+        if progress is not None:
+            progress(scenario_label(result), w.rows, result)
+    return results
+
+
+def scenario_label(item: dict) -> str:
+    """Имя сценария вместе с вариантом, если он есть."""
+    if "workers" not in item:
+        return item["scenario"]
+    return f"{item['scenario']} {item['layout']} w={item['workers']}"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[dict]:
+    """
+    Сравнивает результаты с базовыми по парам (сценарий с вариантом, размер).
+    Регрессия — пропускная способность упала больше чем на threshold
+    или p95 задержки вырос больше чем на threshold (доли, 0.1 = 10%).
+    """
+    base = {(scenario_label(item), item["rows"]): item
+            for item in baseline.get("results", [])}
+    rows = []
+    for item in results["results"]:
+        old = base.get((scenario_label(item), item["rows"]))
+        if old is None:
+            continue
+        throughput = _change(old["throughput"], item["throughput"])
+        p95 = _change(old["latency_ms"]["p95"], item["latency_ms"]["p95"])
+        rows.append({
+            "scenario": scenario_label(item),
+            "rows": item["rows"],
+            "throughput_change": throughput,
+            "p95_change": p95,
+            "regression": throughput < -threshold or p95 > threshold,
+        })
+    return rows
+
+
+def _change(old: float, new: float) -> float:
+    """Относительное изменение new к old."""
+    if not old:
+        return 0.0
+    return new / old - 1
@@ -6,9 +6,74 @@ from pathlib import Path
 # Файл с метаданными БД.
 META_FILE = Path("db_meta.json")
 
+# Файл со служебным состоянием таблиц (счётчики ID).
+STATS_FILE = Path("db_stats.json")
+
 # Директория с данными таблиц.
 DATA_DIR = Path("data")
-DATA_DIR.mkdir(exist_ok=True)
+
+# Политика сброса изменённых таблиц на диск:
+# "command" — после каждой команды, "every_n" — каждые FLUSH_EVERY
+# изменений, "group" — групповая фиксация: изменения, накопленные
+# за GROUP_COMMIT_WINDOW секунд (но не больше FLUSH_EVERY), сохраняются
+# одной записью, "exit" — только при выходе, "background" — в фоновом
+# потоке записи, не задерживая команды (так работает интерактивный режим).
+FLUSH_POLICY = "command"
+FLUSH_EVERY = 100
+GROUP_COMMIT_WINDOW = 0.01
+
+# Сбрасывать ли файлы БД на диск (fsync) при записи. Без fsync запись
+# остаётся атомарной, но последние изменения могут пропасть при сбое ОС.
+SYNC_WRITES = True
+
+# Движок хранения: "json" — перезапись файла таблицы целиком,
+# "log" — дозапись изменений в журнал data/<table>.log.
+STORAGE_ENGINE = "log"
+
+# Размер журнала (в байтах), после которого он сворачивается в снимок.
+LOG_COMPACT_BYTES = 1 << 20
+
+# Формат файлов новых таблиц: "json" — data/<table>.json,
+# "binary" — data/<table>.tbl (см. primitive_db/binary.py),
+# "segments" — каталог data/<table>.seg/ с сегментами по SEGMENT_ROWS
+# строк (см. primitive_db/segments.py).
+# Формат существующей таблицы определяется по её файлу.
+TABLE_FORMAT = "json"
+
+# Число строк (диапазон ID) в одном сегменте новой сегментированной таблицы.
+SEGMENT_ROWS = 10_000
+
+# Представление таблиц в памяти: "rows" — список словарей,
+# "columnar" — типизированные столбцы (см. primitive_db/columnar.py).
+TABLE_LAYOUT = "rows"
+
+# Размер пакета строк при массовой загрузке (load ... from ...).
+BULK_BATCH_SIZE = 10000
+
+# Число строк на одной странице табличного вывода select.
+SELECT_PAGE_SIZE = 100
+
+# Сколько строк order by сортирует в памяти; большие результаты
+# сортируются частями во временных файлах и сливаются.
+SORT_MEMORY_ROWS = 100_000
+
+# Максимальное число результатов select в кэше (LRU).
+CACHE_MAX_ENTRIES = 128
+
+# Максимальное число разобранных команд и условий в кэше (LRU).
+COMMAND_CACHE_MAX_ENTRIES = 256
+
+# Параллельный просмотр больших столбцовых и бинарных таблиц:
+# число процессов (0 или 1 — выключен) и минимальный размер таблицы.
+PARALLEL_WORKERS = 0
+PARALLEL_MIN_ROWS = 500_000
+
+# Режим сервера (--serve): адрес по умолчанию (host:port или путь
+# к Unix-сокету), число потоков выполнения команд и предельная длина
+# строки команды в байтах.
+SERVER_ADDRESS = "127.0.0.1:7433"
+SERVER_THREADS = 4
+SERVER_LINE_LIMIT = 16 << 20
 
 # Поддерживаемые типы данных.
 VALID_TYPES = {"int": int, "str": str, "bool": bool}
@@ -21,21 +86,45 @@ HELP_TEXT = """
 <command> create_table <имя_таблицы> <столбец:тип> ... - создать таблицу
 <command> list_tables - показать список таблиц
 <command> drop_table <имя_таблицы> - удалить таблицу
+<command> create_index <имя_таблицы> <столбец> using trigram|prefix
+- создать индекс для like и contains по столбцу str
 
 <command> insert into <имя_таблицы> values (<значение1>, <значение2>, ...)
-- создать запись
+- создать запись (можно несколько: values (...), (...), ...)
+<command> load <имя_таблицы> from <файл.csv|файл.jsonl>
+- загрузить записи из файла
+<command> export <имя_таблицы> [where <условие>] to <файл> [format csv|jsonl]
+- выгрузить записи в файл (*.gz — со сжатием gzip)
 
 <command> select from <имя_таблицы> - прочитать все записи
-<command> select from <имя_таблицы> where <столбец> = <значение> 
-- прочитать записи по условию
+<command> select from <имя_таблицы> where <условие> - прочитать записи по условию
+  условие: <столбец> =|!=|<|<=|>|>= <значение>, <столбец> between <a> and <b>,
+  <столбец> in (<a>, <b>, ...), <столбец> like 'abc%' (% и _ — шаблоны),
+  <столбец> contains 'abc'; части соединяются and / or и скобками
+<command> select from <имя_таблицы> ... [limit N] [offset M] [format table|tsv|jsonl]
+- постраничная выборка и потоковый вывод
+<command> select count(*), sum(<столбец>), ... from <имя_таблицы> [where ...] 
+[group by <столбец>] - агрегаты count, sum, min, max, avg
+<command> select ... [order by <столбец>|<агрегат> [asc|desc]] - сортировка
+
+<command> select [<таблица.столбец>, ...] from <a> join <b> on <a.столбец> = 
+<b.столбец> [where ...] - соединение двух таблиц (hash join)
+
+<command> update <имя_таблицы> set <столбец> = <значение> [, ...] where 
+<условие> - обновить записи
 
-<command> update <имя_таблицы> set <столбец> = <значение> where 
-<столбец> = <значение> - обновить записи
+<command> delete from <имя_таблицы> where <условие> - удалить записи
+<command> explain <select|update|delete ...> - показать план поиска строк
 
-<command> delete from <имя_таблицы> where <столбец> = <значение> 
-- удалить записи
+<command> info <имя_таблицы> - информация и статистика таблицы
+<command> convert <имя_таблицы> <json|binary|segments> - сменить формат
+файла таблицы
+<command> commit - сохранить накопленные изменения на диск
+(с фоновой записью — поставить в очередь)
+<command> sync - дождаться записи всех изменений на диск
 
-<command> info <имя_таблицы> - информация о таблице
+<command> stats [json [файл] | reset] - метрики: задержки, счётчики, кэши
+<command> profile <команда> - выполнить команду под cProfile
 
 <command> exit - выход
 <command> help - справка
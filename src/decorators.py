@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 """Декораторы и замыкания для управления БД."""
 
+import threading
 import time
+from collections import OrderedDict
 from functools import wraps
 
-import prompt
+from src.constants import CACHE_MAX_ENTRIES
+from src.metrics import registry
 
 
 def handle_db_errors(func):
@@ -41,15 +44,38 @@ def handle_db_errors(func):
     return wrapper
 
 
+# Режим подтверждений: "ask" — спрашивать пользователя,
+# "yes" — подтверждать автоматически, "no" — автоматически отклонять.
+CONFIRM_MODES = ("ask", "yes", "no")
+_confirm = {"mode": "ask"}
+
+
+def set_confirm_mode(mode: str) -> None:
+    """Переключает режим подтверждения опасных действий."""
+    if mode not in CONFIRM_MODES:
+        raise ValueError(f"Некорректный режим подтверждения: {mode}")
+    _confirm["mode"] = mode
+
+
 def confirm_action(action_name: str):
     """Декоратор-фабрика: спрашивает подтверждение у пользователя."""
 
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            answer = prompt.string(
-                f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: '
-            )
+            mode = _confirm["mode"]
+            if mode == "ask":
+                import prompt
+
+                answer = prompt.string(
+                    f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: '
+                )
+            elif mode == "yes":
+                answer = "y"
+            else:
+                print(f'Подтверждение "{action_name}" в пакетном режиме '
+                      "требует флага --yes.")
+                answer = "n"
             if answer.lower() != "y":
                 print("Операция отменена пользователем.")
                 return None
@@ -61,37 +87,69 @@ def confirm_action(action_name: str):
 
 
 def log_time(func):
-    """Декоратор: измеряет время выполнения функции."""
+    """
+    Декоратор: измеряет время выполнения функции и записывает его
+    в гистограмму function.<имя> реестра метрик (см. команду stats).
+    """
+    name = f"function.{func.__name__}"
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start = time.monotonic()
-        result = func(*args, **kwargs)
-        duration = time.monotonic() - start
-        print(f"Функция {func.__name__} выполнилась за {duration:.3f} секунд.")
-        return result
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            registry.observe(name, time.perf_counter() - start)
 
     return wrapper
 
 
-def create_cacher():
+def create_cacher(max_entries: int = CACHE_MAX_ENTRIES):
     """
     Замыкание для кэширования результатов.
-    cache_result(key, value_func) — возвращает результат из кэша
+    cache_result(key, value_func, table=None) — возвращает результат из кэша
     или пересчитывает.
+    У каждой таблицы свой счётчик поколений: invalidate(table) увеличивает
+    его, и старые результаты этой таблицы перестают находиться, не трогая
+    кэш других таблиц. Неиспользуемые записи вытесняются по LRU.
+    Кэш можно использовать из нескольких потоков: value_func
+    выполняется вне блокировки.
     """
-    cache = {}
-
-    def cache_result(key, value_func):
-        if key in cache:
-            return cache[key]
+    cache = OrderedDict()
+    generations = {}
+    counters = {"hits": 0, "misses": 0, "evictions": 0}
+    lock = threading.Lock()
+
+    def cache_result(key, value_func, table=None):
+        with lock:
+            full_key = (table, generations.get(table, 0), key)
+            if full_key in cache:
+                cache.move_to_end(full_key)
+                counters["hits"] += 1
+                return cache[full_key]
+            counters["misses"] += 1
         result = value_func()
-        cache[key] = result
+        with lock:
+            cache[full_key] = result
+            while len(cache) > max_entries:
+                cache.popitem(last=False)
+                counters["evictions"] += 1
         return result
 
-    def invalidate():
-        cache.clear()
+    def invalidate(table=None):
+        with lock:
+            if table is None:
+                cache.clear()
+                generations.clear()
+            else:
+                generations[table] = generations.get(table, 0) + 1
+
+    def stats():
+        with lock:
+            return {**counters, "size": len(cache),
+                    "max_entries": max_entries}
 
     wrapper = cache_result
     wrapper.invalidate = invalidate
+    wrapper.stats = stats
     return wrapper
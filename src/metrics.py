@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Реестр метрик: счётчики, гистограммы задержек и время по фазам команды
+(parse, load, execute, save, render). Данные выводит команда stats.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from math import ceil, log
+
+# Гистограммы хранят счётчики по логарифмическим корзинам:
+# граница корзины i — HISTOGRAM_BASE ** i микросекунд (погрешность ~5%).
+HISTOGRAM_BASE = 1.1
+PHASES = ("parse", "load", "execute", "save", "render")
+
+
+class Histogram:
+    """Распределение задержек с процентилями по корзинам."""
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        micros = max(seconds * 1e6, 1.0)
+        index = ceil(log(micros, HISTOGRAM_BASE))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        """Верхняя граница корзины, в которую попал p-й процентиль (секунды)."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(HISTOGRAM_BASE ** index / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Registry:
+    """
+    Метрики процесса. Время фаз внутри команды накапливается отдельно:
+    execute — время команды за вычетом остальных фаз.
+    Датчики (gauges) — функции, значения которых читаются при снимке.
+    Команды из разных потоков (режим сервера) замеряются независимо.
+    """
+
+    def __init__(self):
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    @property
+    def _command_phases(self) -> dict | None:
+        """Время фаз текущей команды потока (None — вне команды)."""
+        return getattr(self._local, "phases", None)
+
+    @_command_phases.setter
+    def _command_phases(self, value: dict | None) -> None:
+        self._local.phases = value
+
+    def reset(self) -> None:
+        """Обнуляет накопленные метрики (датчики остаются)."""
+        with self._lock:
+            self.counters: dict[str, int] = {}
+            self.histograms: dict[str, Histogram] = {}
+            self.phases = dict.fromkeys(PHASES, 0.0)
+        # Сброс внутри команды (stats reset) не должен ломать её замер.
+        if self._command_phases is not None:
+            self._command_phases = {}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def register_gauge(self, name: str, func) -> None:
+        self.gauges[name] = func
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замеряет фазу команды: parse, load, save или render."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] += elapsed
+            if self._command_phases is not None:
+                self._command_phases[name] = (
+                    self._command_phases.get(name, 0.0) + elapsed)
+
+    @contextmanager
+    def command(self, name: str):
+        """Замеряет команду целиком; вложенные команды не учитываются."""
+        if self._command_phases is not None:
+            yield
+            return
+        self._command_phases = {}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            other = sum(self._command_phases.values())
+            with self._lock:
+                self.phases["execute"] += max(0.0, elapsed - other)
+            self._command_phases = None
+            self.observe(f"command.{name}", elapsed)
+            self.incr("commands")
+
+    def snapshot(self) -> dict:
+        """Все метрики в виде словаря для вывода и выгрузки в JSON."""
+        with self._lock:
+            counters = dict(sorted(self.counters.items()))
+            latency = {name: histogram.summary() for name, histogram
+                       in sorted(self.histograms.items())}
+            phases = dict(self.phases)
+        return {
+            "counters": counters,
+            "latency": latency,
+            "phases": phases,
+            "gauges": {name: func() for name, func in self.gauges.items()},
+        }
+
+
+registry = Registry()
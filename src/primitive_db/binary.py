@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Бинарный формат файлов таблиц data/<table>.tbl.
+
+Структура файла (little-endian):
+    заголовок   — магия b"PDBT", версия, число строк, длина схемы;
+    схема       — JSON-список [[имя, тип], ...];
+    оглавление  — смещение блока каждого столбца (uint64);
+    блоки       — int: int64 на строку, bool: int8 на строку,
+                  str: таблица смещений (uint64, строк + 1) и куча UTF-8.
+Каждый блок выровнен по 8 байтам.
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from .durable import atomic_write
+
+MAGIC = b"PDBT"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQI")
+OFFSET = struct.Struct("<Q")
+TYPECODES = {"int": "q", "bool": "b"}
+NATIVE = sys.byteorder == "little"
+
+
+def _pad(size: int) -> int:
+    return -size % 8
+
+
+def _infer_schema(rows: list[dict]) -> list[list[str]]:
+    """Определяет схему по первой строке, если она не передана."""
+    if not rows:
+        return []
+    schema = []
+    for name, value in rows[0].items():
+        if isinstance(value, bool):
+            schema.append([name, "bool"])
+        elif isinstance(value, int):
+            schema.append([name, "int"])
+        else:
+            schema.append([name, "str"])
+    return schema
+
+
+def _column_block(rows, name: str, col_type: str) -> bytes:
+    """Кодирует значения одного столбца в байты блока."""
+    if col_type == "str":
+        offsets = array("q", [0])
+        heap = bytearray()
+        for row in rows:
+            value = row[name]
+            heap += (value if isinstance(value, str) else str(value)).encode()
+            offsets.append(len(heap))
+        if not NATIVE:
+            offsets.byteswap()
+        return offsets.tobytes() + bytes(heap)
+    try:
+        values = array(TYPECODES[col_type], (int(row[name]) for row in rows))
+    except (OverflowError, TypeError, ValueError):
+        raise ValueError(
+            f"Столбец {name} содержит значения, не подходящие под тип {col_type}")
+    if not NATIVE:
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_binary_table(path, rows, schema=None) -> None:
+    """Записывает строки таблицы в бинарный файл (атомарно)."""
+    if schema is None:
+        schema = getattr(rows, "schema", None)
+    if not isinstance(rows, list):
+        rows = list(rows)
+    if schema is None:
+        schema = _infer_schema(rows)
+    schema_bytes = json.dumps(schema, ensure_ascii=False).encode()
+    head = HEADER.pack(MAGIC, VERSION, 0, len(rows), len(schema_bytes))
+    position = len(head) + len(schema_bytes)
+    position += _pad(position)
+    position += OFFSET.size * len(schema)
+
+    blocks = []
+    offsets = []
+    for name, col_type in schema:
+        position += _pad(position)
+        block = _column_block(rows, name, col_type)
+        offsets.append(position)
+        blocks.append(block)
+        position += len(block)
+
+    with atomic_write(path, "wb") as f:
+        f.write(head)
+        f.write(schema_bytes)
+        f.write(b"\0" * _pad(len(head) + len(schema_bytes)))
+        for offset in offsets:
+            f.write(OFFSET.pack(offset))
+        for offset, block in zip(offsets, blocks):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(block)
+
+
+class _StrColumnView:
+    """Ленивое чтение строкового столбца из кучи в mmap."""
+
+    def __init__(self, offsets, heap):
+        self.offsets = offsets
+        self.heap = heap
+
+    def __getitem__(self, pos: int) -> str:
+        return str(self.heap[self.offsets[pos]:self.offsets[pos + 1]], "utf-8")
+
+    def __iter__(self):
+        heap = self.heap
+        offsets = self.offsets
+        for i in range(len(offsets) - 1):
+            yield str(heap[offsets[i]:offsets[i + 1]], "utf-8")
+
+
+class BinaryTable:
+    """
+    Таблица только для чтения поверх mmap бинарного файла.
+    Столбцы декодируются лениво: запрос читает лишь те строки
+    и столбцы, к которым обращается.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, schema_len = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Файл {path} не является таблицей primitive_db.")
+        start = HEADER.size
+        self.schema = [tuple(col) for col in json.loads(
+            self._mm[start:start + schema_len].decode())]
+        position = start + schema_len
+        position += _pad(position)
+        self._offsets = [
+            OFFSET.unpack_from(self._mm, position + i * OFFSET.size)[0]
+            for i in range(len(self.schema))
+        ]
+        self._count = count
+        self._columns = {}
+
+    def _column(self, name: str):
+        column = self._columns.get(name)
+        if column is not None:
+            return column
+        for (col_name, col_type), offset in zip(self.schema, self._offsets):
+            if col_name == name:
+                break
+        else:
+            raise KeyError(name)
+        view = memoryview(self._mm)
+        count = self._count
+        if col_type == "str":
+            end = offset + (count + 1) * OFFSET.size
+            offsets = self._cast(view[offset:end], "q")
+            heap = view[end:end + offsets[count]]
+            column = _StrColumnView(offsets, heap)
+        else:
+            typecode = TYPECODES[col_type]
+            size = array(typecode).itemsize
+            column = self._cast(view[offset:offset + count * size], typecode)
+        self._columns[name] = column
+        return column
+
+    @staticmethod
+    def _cast(view, typecode: str):
+        if NATIVE:
+            return view.cast(typecode)
+        values = array(typecode, view.tobytes())
+        values.byteswap()
+        return values
+
+    def column(self, name: str):
+        """Столбец с доступом по позиции без копирования (bool — как 0/1)."""
+        return self._column(name)
+
+    def values(self, column: str):
+        """Итератор значений столбца в исходных типах Python."""
+        data = self._column(column)
+        if dict(self.schema)[column] == "bool":
+            return map(bool, data)
+        return iter(data)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, pos: int) -> dict:
+        if pos < 0:
+            pos += self._count
+        if not 0 <= pos < self._count:
+            raise IndexError(pos)
+        row = {}
+        for name, col_type in self.schema:
+            value = self._column(name)[pos]
+            row[name] = bool(value) if col_type == "bool" else value
+        return row
+
+    def __iter__(self):
+        names = [name for name, _ in self.schema]
+        for values in zip(*(self.values(name) for name in names)):
+            yield dict(zip(names, values))
+
+    def to_rows(self) -> list[dict]:
+        """Декодирует всю таблицу в список строк."""
+        return list(self)
+
+    def close(self) -> None:
+        """Освобождает отображение файла в память."""
+        views = []
+        for column in self._columns.values():
+            if isinstance(column, _StrColumnView):
+                views.extend((column.offsets, column.heap))
+            else:
+                views.append(column)
+        for view in views:
+            if isinstance(view, memoryview):
+                view.release()
+        self._columns.clear()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Потоковая массовая загрузка и выгрузка строк в CSV и JSON Lines."""
+
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from src.constants import BULK_BATCH_SIZE
+
+from .core import append_rows, select_stream
+from .durable import atomic_write
+
+BULK_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+EXPORT_FORMATS = ("csv", "jsonl")
+# Суффикс файла, который выгружается со сжатием gzip.
+GZIP_SUFFIX = ".gz"
+
+
+def _csv_rows(f, columns: list[str]):
+    """
+    Строки CSV как списки значений в порядке столбцов схемы.
+    Если первая строка — заголовок с именами столбцов,
+    значения сопоставляются по именам (столбец ID пропускается).
+    """
+    reader = csv.reader(f)
+    first = next(reader, None)
+    if first is None:
+        return
+    header = [name.strip() for name in first]
+    if set(columns) <= set(header):
+        positions = [header.index(name) for name in columns]
+        for values in reader:
+            if not values:
+                continue
+            if len(values) != len(header):
+                raise ValueError(
+                    f"В строке {reader.line_num} значений {len(values)}, "
+                    f"а столбцов в заголовке {len(header)}: "
+                    f"{','.join(values)}")
+            yield [values[i] for i in positions]
+        return
+    yield first
+    for values in reader:
+        if values:
+            yield values
+
+
+def _jsonl_rows(f, columns: list[str]):
+    """
+    Строки JSON Lines: объект сопоставляется по именам столбцов,
+    список — по позициям.
+    """
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict):
+            try:
+                yield [item[name] for name in columns]
+            except KeyError as e:
+                raise ValueError(f"В строке нет столбца {e}: {line}")
+        else:
+            yield item
+
+
+def read_rows(path, columns: list[str]):
+    """Лениво читает строки файла CSV/JSONL, не загружая его целиком."""
+    path = Path(path)
+    fmt = BULK_FORMATS.get(path.suffix.lower())
+    if fmt is None:
+        raise ValueError(
+            f"Неподдерживаемый формат файла: {path.name}. "
+            f"Допустимые: {', '.join(BULK_FORMATS)}"
+        )
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            yield from _csv_rows(f, columns)
+        else:
+            yield from _jsonl_rows(f, columns)
+
+
+def batched(iterable, size: int):
+    """Разбивает итератор на списки длиной не больше size."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def bulk_load(tables, table_name: str, path,
+              batch_size: int = BULK_BATCH_SIZE) -> int:
+    """
+    Загружает строки из файла в таблицу пакетами по batch_size.
+    Каждый пакет проверяется по схеме целиком, получает ID из счётчика
+    и фиксируется одной записью (с фоновой записью — без ожидания
+    диска). Возвращает число строк.
+    """
+    metadata = tables.metadata
+    if table_name not in metadata:
+        raise KeyError(table_name)
+    columns = [name for name, _ in metadata[table_name][1:]]
+
+    start = time.monotonic()
+    total = 0
+    data = tables.get(table_name, writable=True)
+    for batch in batched(read_rows(path, columns), batch_size):
+        try:
+            append_rows(metadata, table_name, batch, data, tables.reserve_ids)
+        except ValueError as e:
+            raise ValueError(f"{e} (пакет начиная со строки {total + 1})")
+        tables.put(table_name, data)
+        tables.commit()
+        total += len(batch)
+
+    duration = time.monotonic() - start
+    rate = total / duration if duration else float(total)
+    print(
+        f'Загружено записей: {total} в таблицу "{table_name}" '
+        f"за {duration:.3f} секунд ({rate:.0f} строк/с)."
+    )
+    return total
+
+
+def _write_csv(f, rows, columns: list[str]) -> int:
+    """Пишет строки в CSV с заголовком; NULL — пустое поле."""
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    total = 0
+    for row in rows:
+        writer.writerow([row[name] for name in columns])
+        total += 1
+    return total
+
+
+def _write_jsonl(f, rows, columns: list[str]) -> int:
+    """Пишет строки по одному объекту JSON на строку."""
+    dumps = json.dumps
+    total = 0
+    for row in rows:
+        f.write(dumps({name: row[name] for name in columns},
+                      ensure_ascii=False))
+        f.write("\n")
+        total += 1
+    return total
+
+
+def export_format(path, fmt: str | None = None) -> tuple[str, bool]:
+    """
+    Формат выгрузки и нужно ли сжатие: файл *.gz сжимается gzip,
+    а без явного формата он определяется по расширению файла.
+    """
+    path = Path(path)
+    compressed = path.suffix.lower() == GZIP_SUFFIX
+    if fmt is None:
+        name = path.with_suffix("") if compressed else path
+        fmt = BULK_FORMATS.get(name.suffix.lower())
+        if fmt is None:
+            raise ValueError(
+                f"Не удалось определить формат по имени файла {path.name}. "
+                f"Укажите format {'|'.join(EXPORT_FORMATS)}."
+            )
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Некорректный формат выгрузки: {fmt}. "
+            f"Допустимые: {', '.join(EXPORT_FORMATS)}"
+        )
+    return fmt, compressed
+
+
+def export_rows(tables, table_name: str, path, where=None,
+                fmt: str | None = None) -> int:
+    """
+    Выгружает строки таблицы (по условию where) в файл CSV/JSONL.
+    Строки идут потоком из хранилища через фильтр прямо в буфер записи,
+    без списка результата, поэтому память не зависит от числа строк.
+    Файл пишется через временный и подменяет целевой только целиком.
+    Возвращает число строк.
+    """
+    metadata = tables.metadata
+    if table_name not in metadata:
+        raise KeyError(table_name)
+    columns = [name for name, _ in metadata[table_name]]
+    fmt, compressed = export_format(path, fmt)
+    write = _write_csv if fmt == "csv" else _write_jsonl
+
+    start = time.monotonic()
+    data = tables.get(table_name, where=where)
+    rows = select_stream(data, where, table_name)
+    with atomic_write(path, "wb") as raw:
+        if compressed:
+            import gzip
+
+            stream = gzip.GzipFile(fileobj=raw, mode="wb")
+        else:
+            stream = raw
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        total = write(text, rows, columns)
+        # detach, а не close: файл закрывает atomic_write после fsync.
+        text.detach()
+        if compressed:
+            stream.close()
+
+    duration = time.monotonic() - start
+    rate = total / duration if duration else float(total)
+    print(
+        f'Выгружено записей: {total} из таблицы "{table_name}" в {path} '
+        f"за {duration:.3f} секунд ({rate:.0f} строк/с)."
+    )
+    return total
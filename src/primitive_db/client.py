@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Клиенты сервера primitive_db (см. server.py): соединение Client,
+пул соединений ClientPool для многопоточных программ и консольный
+клиент run_client для --connect.
+"""
+
+import queue
+import socket
+import sys
+from contextlib import contextmanager
+
+from src.constants import SERVER_THREADS
+
+from .engine import script_commands
+
+
+def parse_address(address: str) -> tuple:
+    """
+    Адрес сервера: путь к Unix-сокету (содержит "/" или оканчивается
+    на .sock) или host:port. Возвращает ("unix", path)
+    или ("tcp", host, port).
+    """
+    if "/" in address or address.endswith(".sock"):
+        return ("unix", address)
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"Некорректный адрес сервера: {address}")
+    return ("tcp", host or "127.0.0.1", int(port))
+
+
+class ServerError(Exception):
+    """Команда завершилась ошибкой на сервере; текст — вывод команды."""
+
+
+class Client:
+    """Одно постоянное соединение с сервером."""
+
+    def __init__(self, address: str, timeout: float | None = None):
+        kind, *location = parse_address(address)
+        if kind == "unix":
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(location[0])
+        else:
+            self.sock = socket.create_connection(tuple(location), timeout)
+            # Короткие запросы не должны ждать алгоритма Нейгла.
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def execute(self, command: str) -> str:
+        """
+        Выполняет команду и возвращает её вывод.
+        Если команда завершилась ошибкой, бросает ServerError.
+        """
+        if "\n" in command or "\r" in command:
+            raise ValueError("Команда должна занимать одну строку.")
+        self.sock.sendall(command.encode("utf-8") + b"\n")
+        header = self.reader.readline()
+        if not header:
+            raise ConnectionError("Сервер закрыл соединение.")
+        status, _, length = header.decode("ascii").partition(" ")
+        output = self.reader.read(int(length)).decode("utf-8")
+        if status != "OK":
+            raise ServerError(output.strip())
+        return output
+
+    def close(self) -> None:
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ClientPool:
+    """
+    Пул соединений для нескольких потоков: каждая команда берёт
+    свободное соединение и возвращает его. Соединения открываются
+    по мере надобности, не больше size.
+    """
+
+    def __init__(self, address: str, size: int = SERVER_THREADS,
+                 timeout: float | None = None):
+        self.address = address
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = queue.Queue()
+        for _ in range(max(1, size)):
+            self._slots.put(None)
+
+    @contextmanager
+    def connection(self):
+        """Соединение пула на время блока with."""
+        self._slots.get()
+        try:
+            client = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                client = Client(self.address, self.timeout)
+            except BaseException:
+                self._slots.put(None)
+                raise
+        try:
+            yield client
+        except (ConnectionError, OSError):
+            # Оборванное соединение в пул не возвращается.
+            client.close()
+            client = None
+            raise
+        finally:
+            if client is not None:
+                self._idle.put(client)
+            self._slots.put(None)
+
+    def execute(self, command: str) -> str:
+        """Выполняет команду на свободном соединении пула."""
+        with self.connection() as client:
+            return client.execute(command)
+
+    def close(self) -> None:
+        """Закрывает свободные соединения."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_client(address: str, lines=None) -> int:
+    """
+    Консольный клиент: команды из lines (скрипт или конвейер)
+    либо интерактивно. Возвращает число команд с ошибкой.
+    """
+    errors = 0
+    interactive = lines is None
+    if interactive:
+        lines = iter(lambda: input("Введите команду: "), None)
+    with Client(address) as client:
+        try:
+            for number, command in script_commands(lines):
+                try:
+                    sys.stdout.write(client.execute(command))
+                except ServerError as e:
+                    errors += 1
+                    prefix = "" if interactive else f"Строка {number}: "
+                    print(f"{prefix}{e}")
+                if command.lower() == "exit":
+                    break
+        except EOFError:
+            pass
+    return errors
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Столбцовое представление таблицы на типизированных массивах."""
+
+import sys
+from array import array
+from itertools import compress
+
+from .utils import normalize_value
+
+# Коды типов array для числовых столбцов.
+ARRAY_TYPECODES = {"int": "q", "bool": "b"}
+# Код типа для векторов выбора (позиций строк).
+SELECTION_TYPECODE = "q"
+
+
+def _coerce(col_type: str, value):
+    """Приводит значение к типу столбца перед записью в массив."""
+    if col_type == "str":
+        return value
+    if col_type == "bool":
+        value = normalize_value(value)
+    if not isinstance(value, (int, bool)):
+        raise ValueError(f"Значение {value} не соответствует типу {col_type}")
+    return int(value)
+
+
+class StrColumn:
+    """Строковый столбец со словарным кодированием: коды + словарь значений."""
+
+    def __init__(self):
+        self.codes = array("I")
+        self.dictionary: list = []
+        self._lookup: dict = {}
+
+    def encode(self, value) -> int:
+        """Возвращает код значения, добавляя его в словарь при необходимости."""
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            self.dictionary.append(value)
+            self._lookup[value] = code
+        return code
+
+    def append(self, value) -> None:
+        self.codes.append(self.encode(value))
+
+    def extend(self, values) -> None:
+        self.codes.extend(map(self.encode, values))
+
+    def __getitem__(self, pos: int):
+        return self.dictionary[self.codes[pos]]
+
+    def __setitem__(self, pos: int, value) -> None:
+        self.codes[pos] = self.encode(value)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self):
+        return map(self.dictionary.__getitem__, self.codes)
+
+    def keep(self, mask) -> None:
+        """Оставляет только позиции, для которых mask истинна."""
+        self.codes = array("I", compress(self.codes, mask))
+
+    def snapshot(self) -> "StrColumn":
+        """Копия кодов; словарь только растёт, поэтому он общий."""
+        column = StrColumn.__new__(StrColumn)
+        column.codes = array("I", self.codes)
+        column.dictionary = self.dictionary
+        column._lookup = self._lookup
+        return column
+
+    def memory_usage(self) -> int:
+        size = self.codes.buffer_info()[1] * self.codes.itemsize
+        size += sys.getsizeof(self.dictionary) + sys.getsizeof(self._lookup)
+        return size + sum(sys.getsizeof(v) for v in self.dictionary)
+
+
+class ColumnarTable:
+    """
+    Таблица, хранящая каждый столбец отдельно по схеме из db_meta.json:
+    int и bool — в массивах модуля array, str — словарным кодированием.
+    Поддерживает чтение как последовательность строк-словарей,
+    поэтому выводится и сохраняется так же, как list[dict].
+    """
+
+    def __init__(self, schema):
+        self.schema = [(name, col_type) for name, col_type in schema]
+        self.columns = {}
+        for name, col_type in self.schema:
+            if col_type == "str":
+                self.columns[name] = StrColumn()
+            else:
+                self.columns[name] = array(ARRAY_TYPECODES[col_type])
+
+    @classmethod
+    def from_rows(cls, schema, rows: list[dict]) -> "ColumnarTable":
+        """Строит столбцовую таблицу из списка строк."""
+        table = cls(schema)
+        for name, col_type in table.schema:
+            table.columns[name].extend(
+                _coerce(col_type, row[name]) for row in rows)
+        return table
+
+    def to_rows(self) -> list[dict]:
+        """Возвращает таблицу в виде списка строк."""
+        return list(self)
+
+    def snapshot(self) -> "ColumnarTable":
+        """Неизменяемая копия для фоновой записи (копируются массивы)."""
+        table = ColumnarTable.__new__(ColumnarTable)
+        table.schema = self.schema
+        table.columns = {
+            name: (column.snapshot() if isinstance(column, StrColumn)
+                   else array(column.typecode, column))
+            for name, column in self.columns.items()
+        }
+        return table
+
+    def values(self, column: str):
+        """Итератор значений столбца в исходных типах Python."""
+        values = self.columns[column]
+        if self._type(column) == "bool":
+            return map(bool, values)
+        return iter(values)
+
+    def _type(self, column: str) -> str:
+        for name, col_type in self.schema:
+            if name == column:
+                return col_type
+        raise KeyError(column)
+
+    def __len__(self) -> int:
+        return len(self.columns[self.schema[0][0]])
+
+    def __getitem__(self, pos: int) -> dict:
+        return {
+            name: (bool(self.columns[name][pos]) if col_type == "bool"
+                   else self.columns[name][pos])
+            for name, col_type in self.schema
+        }
+
+    def __iter__(self):
+        names = [name for name, _ in self.schema]
+        for values in zip(*(self.values(name) for name in names)):
+            yield dict(zip(names, values))
+
+    def append(self, row: dict) -> None:
+        """Добавляет строку в конец таблицы."""
+        for name, col_type in self.schema:
+            self.columns[name].append(_coerce(col_type, row[name]))
+
+    def update_row(self, pos: int, values: dict) -> None:
+        """Записывает новые значения столбцов строки pos."""
+        for name, value in values.items():
+            self.columns[name][pos] = _coerce(self._type(name), value)
+
+    def delete_positions(self, positions) -> None:
+        """Удаляет строки с указанными позициями."""
+        mask = [True] * len(self)
+        for pos in positions:
+            mask[pos] = False
+        for name, col_type in self.schema:
+            column = self.columns[name]
+            if col_type == "str":
+                column.keep(mask)
+            else:
+                self.columns[name] = array(
+                    column.typecode, compress(column, mask))
+
+    def filter_by(self, column: str, test) -> array:
+        """
+        Пакетно сканирует столбец и возвращает вектор выбора — позиции
+        строк, для значений которых test(value) истинна. Для строковых
+        столбцов test вызывается один раз на значение словаря.
+        """
+        data = self.columns[column]
+        positions = range(len(data))
+        if isinstance(data, StrColumn):
+            codes = {code for code, v in enumerate(data.dictionary) if test(v)}
+            mask = map(codes.__contains__, data.codes)
+        else:
+            mask = map(test, self.values(column))
+        return array(SELECTION_TYPECODE, compress(positions, mask))
+
+    def memory_usage(self) -> int:
+        """Примерный объём памяти, занятый данными столбцов, в байтах."""
+        size = 0
+        for column in self.columns.values():
+            if isinstance(column, StrColumn):
+                size += column.memory_usage()
+            else:
+                size += column.buffer_info()[1] * column.itemsize
+        return size
+
+
+def column_values(table_data, column: str):
+    """Значения столбца для списка строк, столбцовой или бинарной таблицы."""
+    if isinstance(table_data, list):
+        return (row.get(column) for row in table_data)
+    return table_data.values(column)
@@ -1,35 +1,67 @@
 #!/usr/bin/env python3
 """Основная логика управления таблицами и CRUD с декораторами."""
 
+from itertools import islice
+
 from src.constants import VALID_TYPES
 from src.decorators import confirm_action, create_cacher, handle_db_errors, log_time
+from src.metrics import registry
+
+from .columnar import ColumnarTable, column_values
+from .index import TEXT_INDEX_KINDS, IndexManager
+from .planner import plan_query
+from .predicates import compile_predicate, from_dict, normalized_key
+from .sorting import sort_rows, value_key
+from .stats import StatsManager, distinct
+from .utils import delete_table_data, normalize_value
 
 cache_result = create_cacher()
+indexes = IndexManager()
+table_stats = StatsManager()
+registry.register_gauge("select_cache", cache_result.stats)
 
+# Подписчики на изменения строк: callable(table_name, record).
+change_listeners = []
 
-def normalize_value(value):
-    """Приводит значение к единому виду для корректного сравнения."""
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, str):
-        low = value.lower()
-        if low in ("true", "1"):
-            return True
-        if low in ("false", "0"):
-            return False
-        # Числа
-        if value.isdigit():
-            return int(value)
-    return value
 
+def _notify(table_name: str | None, record: dict) -> None:
+    """Сообщает подписчикам об изменении строк таблицы."""
+    if table_name is None:
+        return
+    for listener in change_listeners:
+        listener(table_name, record)
 
-@handle_db_errors
-def create_table(metadata: dict, table_name: str, columns: list[str]) -> dict:
-    """Создаёт таблицу с указанными столбцами."""
-    if table_name in metadata:
-        raise KeyError(table_name)
 
-    table_columns = [("ID", "int")]
+def _as_predicate(where):
+    """Приводит условие к дереву (словарь {col: value} — к равенствам)."""
+    if isinstance(where, dict):
+        return from_dict(where)
+    return where
+
+
+def _row_ids(table_data: list[dict], positions) -> list[int]:
+    """Возвращает ID строк по их позициям."""
+    if isinstance(table_data, ColumnarTable):
+        ids = table_data.columns["ID"]
+        return [ids[pos] for pos in positions]
+    return [table_data[pos]["ID"] for pos in positions]
+
+
+def _match_positions(table_data: list[dict], where,
+                     table_name: str | None):
+    """
+    Возвращает позиции строк, подходящих под условие.
+    План (индекс, диапазон по индексу или полный просмотр)
+    выбирает планировщик; без имени таблицы индексы не используются.
+    """
+    predicate = _as_predicate(where)
+    return plan_query(table_data, predicate, table_name, indexes,
+                      table_stats.get(table_name)).positions()
+
+
+def parse_columns(columns: list[str]) -> list[tuple[str, str]]:
+    """Разбирает описания столбцов <имя>:<тип> в список (имя, тип)."""
+    parsed = []
     for col in columns:
         if ":" not in col:
             raise ValueError(f"Некорректный формат столбца: {col}")
@@ -39,9 +71,19 @@ def create_table(metadata: dict, table_name: str, columns: list[str]) -> dict:
                 f"Некорректный тип: {col_type}. "
                 f"Допустимые: {', '.join(VALID_TYPES)}"
             )
-        table_columns.append((name, col_type))
+        parsed.append((name, col_type))
+    return parsed
+
+
+@handle_db_errors
+def create_table(metadata: dict, table_name: str, columns: list[str]) -> dict:
+    """Создаёт таблицу с указанными столбцами."""
+    if table_name in metadata:
+        raise KeyError(table_name)
 
+    table_columns = [("ID", "int")] + parse_columns(columns)
     metadata[table_name] = table_columns
+    table_stats.init(table_name, table_columns)
     print(
         f'Таблица "{table_name}" успешно создана со столбцами: '
         + ", ".join(f"{n}:{t}" for n, t in table_columns)
@@ -53,20 +95,14 @@ def create_table(metadata: dict, table_name: str, columns: list[str]) -> dict:
 @confirm_action("удаление таблицы")
 def drop_table(metadata: dict, table_name: str) -> dict:
     """Удаляет таблицу и её данные, если она существует."""
-    import os
-
-    from src.constants import DATA_DIR
-
     if table_name not in metadata:
         raise KeyError(table_name)
 
     del metadata[table_name]
+    delete_table_data(table_name)
 
-    table_file = DATA_DIR / f"{table_name}.json"
-    if table_file.exists():
-        os.remove(table_file)
-
-    cache_result.invalidate()
+    indexes.drop(table_name)
+    cache_result.invalidate(table_name)
 
     print(f'Таблица "{table_name}" и её данные успешно удалены.')
     return metadata
@@ -83,79 +119,375 @@ def list_tables(metadata: dict) -> None:
 
 
 @handle_db_errors
-@log_time
-def insert(metadata: dict, table_name: str, values: list,
-           table_data: list[dict]) -> list[dict]:
-    """Добавляет запись в таблицу."""
+def create_index(metadata: dict, table_name: str, column: str, kind: str,
+                 table_data: list[dict]) -> None:
+    """Создаёт текстовый индекс (trigram или prefix) по столбцу str."""
+    if kind not in TEXT_INDEX_KINDS:
+        raise ValueError(
+            f"Некорректный вид индекса: {kind}. "
+            f"Допустимые: {', '.join(TEXT_INDEX_KINDS)}"
+        )
+    types = dict(metadata[table_name])
+    if column not in types:
+        raise KeyError(column)
+    if types[column] != "str":
+        raise ValueError("Текстовый индекс строится только по столбцу str.")
+    indexes.create_text_index(table_name, table_data, column, kind)
+    print(f'Индекс {kind} по столбцу {column} таблицы "{table_name}" создан.')
+
+
+def _build_record(columns: list, values: list) -> dict:
+    """Проверяет значения по схеме и собирает запись без ID."""
+    if len(values) != len(columns):
+        raise ValueError(
+            "Количество значений не совпадает с количеством столбцов.")
+
+    return {col_name: _convert(col_type, value)
+            for (col_name, col_type), value in zip(columns, values)}
+
+
+def _convert(col_type: str, value):
+    """Приводит значение к типу столбца или бросает ValueError."""
+    py_type = VALID_TYPES[col_type]
+    if col_type == "bool" and isinstance(value, str):
+        val_lower = value.lower()
+        if val_lower in ("true", "1"):
+            return True
+        if val_lower in ("false", "0"):
+            return False
+        raise ValueError(f"Некорректное значение для bool: {value}")
+    try:
+        return py_type(value)
+    except Exception:
+        raise ValueError(
+            f"Значение {value} не соответствует типу {col_type}")
+
+
+def append_rows(metadata: dict, table_name: str, rows_values: list[list],
+                table_data: list[dict], reserve_ids=None) -> list[dict]:
+    """
+    Проверяет пакет строк и добавляет его в таблицу одной операцией.
+    reserve_ids(table_name, table_data, count) выдаёт первый ID
+    из сохраняемого счётчика; без него ID считается по максимуму.
+    Возвращает добавленные строки.
+    """
     if table_name not in metadata:
         raise KeyError(table_name)
 
     columns = metadata[table_name][1:]
-    if len(values) != len(columns):
-        raise ValueError(
-            "Количество значений не совпадает с количеством столбцов.")
+    records = [_build_record(columns, values) for values in rows_values]
+    if not records:
+        return []
 
-    record = {}
-    for (col_name, col_type), value in zip(columns, values):
-        py_type = VALID_TYPES[col_type]
-        if col_type == "bool" and isinstance(value, str):
-            val_lower = value.lower()
-            if val_lower in ("true", "1"):
-                value = True
-            elif val_lower in ("false", "0"):
-                value = False
-            else:
-                raise ValueError(f"Некорректное значение для bool: {value}")
-        try:
-            record[col_name] = py_type(value)
-        except Exception:
-            raise ValueError(
-                f"Значение {value} не соответствует типу {col_type}")
+    if reserve_ids is not None:
+        first_id = reserve_ids(table_name, table_data, len(records))
+    else:
+        first_id = max(column_values(table_data, "ID"), default=0) + 1
+    rows = [{"ID": row_id, **record}
+            for row_id, record in enumerate(records, first_id)]
+    for row in rows:
+        table_data.append(row)
+    indexes.on_insert(table_name, table_data, len(rows))
+    table_stats.on_insert(table_name, rows)
+    if len(rows) == 1:
+        _notify(table_name, {"op": "insert", "row": rows[0]})
+    else:
+        _notify(table_name, {"op": "insert_many", "rows": rows})
+    cache_result.invalidate(table_name)
+    return rows
 
-    new_id = max([row["ID"] for row in table_data], default=0) + 1
-    row = {"ID": new_id, **record}
-    table_data.append(row)
-    cache_result.invalidate()
-    print(f'Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".')
+
+@handle_db_errors
+@log_time
+def insert(metadata: dict, table_name: str, values: list,
+           table_data: list[dict], reserve_ids=None) -> list[dict]:
+    """Добавляет запись в таблицу."""
+    row, = append_rows(metadata, table_name, [values], table_data, reserve_ids)
+    print(f'Запись с ID={row["ID"]} успешно добавлена в таблицу "{table_name}".')
     return table_data
 
 
 @handle_db_errors
 @log_time
-def select(table_data: list[dict], where: dict | None = None) -> list[dict]:
-    """Выбирает записи с кэшированием."""
+def insert_many(metadata: dict, table_name: str, rows_values: list[list],
+                table_data: list[dict], reserve_ids=None) -> list[dict]:
+    """Добавляет несколько записей в таблицу."""
+    rows = append_rows(
+        metadata, table_name, rows_values, table_data, reserve_ids)
+    if rows:
+        print(
+            f"Добавлено записей: {len(rows)} (ID {rows[0]['ID']}–"
+            f"{rows[-1]['ID']}) в таблицу \"{table_name}\"."
+        )
+    return table_data
 
-    cache_key = str(where) if where else "all"
+
+@handle_db_errors
+@log_time
+def select(table_data: list[dict], where=None,
+           table_name: str | None = None) -> list[dict]:
+    """Выбирает записи с кэшированием."""
 
     def compute():
         if not where:
+            registry.incr("rows_scanned", len(table_data))
             return table_data
-        key, val = next(iter(where.items()))
-        norm_val = normalize_value(val)
-        return [row for row in table_data if
-                normalize_value(row.get(key)) == norm_val]
+        positions = _match_positions(table_data, where, table_name)
+        return [table_data[pos] for pos in positions]
+
+    if table_name is None:
+        return compute()
+    key = normalized_key(_as_predicate(where))
+    return cache_result(key, compute, table=table_name)
+
+
+def select_stream(table_data: list[dict], where=None,
+                  table_name: str | None = None, limit: int | None = None,
+                  offset: int = 0):
+    """
+    Лениво выдаёт записи по условию, пропуская первые offset
+    и останавливая сканирование после limit записей.
+    """
+    stop = None if limit is None else offset + limit
+    if where:
+        positions = _match_positions(table_data, where, table_name)
+    else:
+        end = len(table_data) if stop is None else min(stop, len(table_data))
+        positions = range(end)
+        registry.incr("rows_scanned", end)
+    for pos in islice(positions, offset, stop):
+        yield table_data[pos]
+
+
+def _index_order(table_data, table_name: str, column: str, col_type: str,
+                 descending: bool):
+    """
+    Позиции строк в порядке столбца по уже построенному хеш-индексу
+    или созданному префиксному индексу; None, если такого индекса нет.
+    """
+    index = indexes.peek(table_name, table_data, column)
+    if index is None and col_type == "str":
+        index = indexes.text_index(table_name, table_data, column, "prefix")
+    if index is None:
+        return None
+    return index.ordered_positions(
+        "str" if col_type == "str" else "num", descending)
+
+
+def _scan_in_order(table_data, positions, predicate):
+    """Строки в порядке positions, подходящие под условие."""
+    test = compile_predicate(predicate) if predicate is not None else None
+    scanned = 0
+    try:
+        for pos in positions:
+            scanned += 1
+            row = table_data[pos]
+            if test is None or test(row):
+                yield row
+    finally:
+        registry.incr("rows_scanned", scanned)
+
+
+def select_sorted(table_data: list[dict], order_by: tuple, where=None,
+                  table_name: str | None = None, col_type: str | None = None,
+                  limit: int | None = None, offset: int = 0):
+    """
+    Лениво выдаёт записи по условию в порядке order_by —
+    (столбец, по убыванию). Если по столбцу есть индекс, а условие
+    всё равно проверяется полным просмотром, строки читаются в порядке
+    ключей индекса без сортировки. Иначе подходящие строки сортируются:
+    с limit — ограниченной кучей, большие результаты — внешней
+    сортировкой (см. sorting.py).
+    """
+    column, descending = order_by
+    stop = None if limit is None else offset + limit
+    predicate = _as_predicate(where)
+    ordered = None
+    if table_name is not None and col_type is not None:
+        ordered = _index_order(
+            table_data, table_name, column, col_type, descending)
+    if ordered is not None and predicate is not None:
+        plan = plan_query(table_data, predicate, table_name, indexes,
+                          table_stats.get(table_name))
+        if plan.kind != "full_scan":
+            ordered = None
+    if ordered is not None:
+        rows = _scan_in_order(table_data, ordered, predicate)
+    else:
+        rows = sort_rows(select_stream(table_data, where, table_name),
+                         column, descending, limit=stop)
+    yield from islice(rows, offset, stop)
+
+
+def _label(func: str | None, column: str) -> str:
+    """Имя столбца результата: count(*), sum(age) или просто столбец."""
+    return column if func is None else f"{func}({column})"
+
+
+def _apply(func: str, values: list):
+    """
+    Вычисляет агрегатную функцию по значениям (NULL пропускаются).
+    sum и avg считают только числа: значения другого типа, оставшиеся
+    в столбце от старых данных, пропускаются, как NULL; min и max
+    сравнивают значения разных типов по value_key.
+    """
+    if func == "count":
+        return len(values)
+    if func in ("sum", "avg"):
+        present = [v for v in values if isinstance(v, (int, float))]
+    else:
+        present = [v for v in values if v is not None]
+    if not present:
+        return None
+    if func == "sum":
+        return sum(present)
+    if func == "avg":
+        return sum(present) / len(present)
+    pick = min if func == "min" else max
+    return pick(present, key=value_key)
+
+
+def stats_aggregate(stats: dict | None, projection: list) -> list[dict] | None:
+    """
+    Отвечает на агрегаты без условия и группировки по статистике таблицы,
+    не читая строк. None — если статистики для ответа недостаточно.
+    """
+    if stats is None:
+        return None
+    result = {}
+    for func, column in projection:
+        if column == "*":
+            result[_label(func, column)] = stats["rows"]
+            continue
+        col_stats = stats["columns"].get(column)
+        if col_stats is None or func is None:
+            return None
+        present = stats["rows"] - col_stats["nulls"]
+        if func == "count":
+            value = present
+        elif func in ("min", "max"):
+            if not col_stats["exact"]:
+                return None
+            value = col_stats[func]
+        elif col_stats["sum"] is None:
+            return None
+        elif func == "sum":
+            value = col_stats["sum"] if present else None
+        else:
+            value = col_stats["sum"] / present if present else None
+        result[_label(func, column)] = value
+    return [result]
+
+
+@handle_db_errors
+@log_time
+def aggregate(table_data: list[dict], projection: list, where=None,
+              group_by: str | None = None,
+              table_name: str | None = None) -> list[dict]:
+    """
+    Считает агрегаты count/sum/min/max/avg по подходящим строкам.
+    projection — список (функция, столбец); функция None означает
+    столбец группировки. Группы собираются в словаре по значению
+    group_by в порядке первого появления.
+    """
+    predicate = _as_predicate(where)
 
-    return cache_result(cache_key, compute)
+    def compute():
+        positions = None
+        if predicate is not None:
+            positions = list(_match_positions(table_data, predicate, table_name))
+        else:
+            registry.incr("rows_scanned", len(table_data))
+        columns = {column for _, column in projection if column != "*"}
+        if group_by is not None:
+            columns.add(group_by)
+        values = {}
+        for column in columns:
+            full = list(column_values(table_data, column))
+            values[column] = (full if positions is None
+                              else [full[pos] for pos in positions])
+        count = len(table_data) if positions is None else len(positions)
+
+        if group_by is None:
+            groups = {None: range(count)}
+        else:
+            groups = {}
+            for i, key in enumerate(values[group_by]):
+                groups.setdefault(key, []).append(i)
+            if not groups:
+                return []
+
+        rows = []
+        for key, members in groups.items():
+            row = {} if group_by is None else {group_by: key}
+            for func, column in projection:
+                if func is None:
+                    continue
+                if column == "*":
+                    row[_label(func, column)] = len(members)
+                else:
+                    data = values[column]
+                    row[_label(func, column)] = _apply(
+                        func, [data[i] for i in members])
+            rows.append(row)
+        return rows
+
+    if table_name is None:
+        return compute()
+    key = ("aggregate", tuple(projection), group_by, normalized_key(predicate))
+    return cache_result(key, compute, table=table_name)
 
 
 @handle_db_errors
 def update(
-        table_data: list[dict], set_clause: dict, where: dict) -> list[dict]:
-    """Обновляет записи по условию."""
+        table_data: list[dict], set_clause: dict, where,
+        table_name: str | None = None,
+        schema: list | None = None) -> list[dict]:
+    """
+    Обновляет записи по условию. Со схемой таблицы значения SET
+    проверяются и приводятся к типам столбцов до записи в журнал:
+    отклонённое обновление не оставляет следов.
+    """
     if not where:
         raise ValueError("Условие WHERE обязательно.")
+    if "ID" in set_clause:
+        # По ID строится журнал и раскладка строк по сегментам.
+        raise ValueError("Столбец ID изменять нельзя.")
 
-    key, val = next(iter(where.items()))
-    norm_val = normalize_value(val)
-
-    updated = 0
-    for row in table_data:
-        if normalize_value(row.get(key)) == norm_val:
-            for set_key, set_val in set_clause.items():
-                row[set_key] = normalize_value(set_val)
-            updated += 1
-
-    cache_result.invalidate()
+    if schema is None:
+        new_values = {k: normalize_value(v) for k, v in set_clause.items()}
+    else:
+        types = dict(schema)
+        new_values = {}
+        for column, value in set_clause.items():
+            if column not in types:
+                raise KeyError(column)
+            new_values[column] = _convert(types[column], value)
+    positions = list(_match_positions(table_data, where, table_name))
+    if positions:
+        _notify(table_name, {
+            "op": "update",
+            "ids": _row_ids(table_data, positions),
+            "set": new_values,
+        })
+    columnar = isinstance(table_data, ColumnarTable)
+    replaced = []
+    for pos in positions:
+        row = table_data[pos]
+        old_values = {set_key: row.get(set_key) for set_key in new_values}
+        replaced.append(old_values)
+        if columnar:
+            table_data.update_row(pos, new_values)
+        else:
+            # Строка заменяется новой, а не меняется на месте: снимки
+            # таблицы для фоновой записи делят строки с таблицей.
+            table_data[pos] = {**row, **new_values}
+        if table_name is not None:
+            indexes.on_update(table_name, table_data, pos, old_values)
+    updated = len(positions)
+    table_stats.on_update(table_name, replaced, new_values)
+
+    cache_result.invalidate(table_name)
 
     if updated:
         print(f"Обновлено записей: {updated}")
@@ -166,35 +498,67 @@ def update(
 
 @handle_db_errors
 @confirm_action("удаление записей")
-def delete(table_data: list[dict], where: dict) -> list[dict]:
+def delete(table_data: list[dict], where,
+           table_name: str | None = None) -> list[dict]:
     """Удаляет записи по условию."""
     if not where:
         raise ValueError("Условие WHERE обязательно.")
 
-    key, val = next(iter(where.items()))
-    norm_val = normalize_value(val)
-
-    before = len(table_data)
-    table_data = [row for row in table_data if
-                  normalize_value(row.get(key)) != norm_val]
-    after = len(table_data)
-
-    cache_result.invalidate()
-
-    if before == after:
+    removed = set(_match_positions(table_data, where, table_name))
+    if removed:
+        _notify(table_name, {
+            "op": "delete",
+            "ids": _row_ids(table_data, sorted(removed)),
+        })
+        if table_stats.get(table_name) is not None:
+            table_stats.on_delete(
+                table_name, [table_data[pos] for pos in removed])
+        if isinstance(table_data, ColumnarTable):
+            table_data.delete_positions(removed)
+        else:
+            table_data[:] = [row for pos, row in enumerate(table_data)
+                             if pos not in removed]
+        if table_name is not None:
+            indexes.on_delete(table_name, table_data, removed)
+
+    cache_result.invalidate(table_name)
+
+    if not removed:
         print("Записей для удаления не найдено.")
     else:
-        print(f"Удалено записей: {before - after}")
+        print(f"Удалено записей: {len(removed)}")
     return table_data
 
 
 @handle_db_errors
-def info(metadata: dict, table_name: str, table_data: list[dict]) -> None:
-    """Выводит структуру и статистику таблицы."""
+def explain(table_data: list[dict], where=None,
+            table_name: str | None = None) -> None:
+    """Печатает план поиска строк и сравнивает оценку с фактом."""
+    plan = plan_query(table_data, _as_predicate(where), table_name, indexes,
+                      table_stats.get(table_name))
+    for line in plan.explain():
+        print(line)
+    found = sum(1 for _ in plan.positions())
+    print(
+        f"Оценка строк к просмотру: {plan.estimate:.0f}, "
+        f"фактически просмотрено: {plan.scanned}, найдено: {found}"
+    )
+
+
+@handle_db_errors
+def info(metadata: dict, table_name: str, stats: dict) -> None:
+    """Выводит структуру и статистику таблицы (без чтения строк)."""
     if table_name not in metadata:
         raise KeyError(table_name)
 
     cols = ", ".join(f"{n}:{t}" for n, t in metadata[table_name])
     print(f"Таблица: {table_name}")
     print(f"Столбцы: {cols}")
-    print(f"Количество записей: {len(table_data)}")
+    print(f"Количество записей: {stats['rows']}")
+    for name, column in stats["columns"].items():
+        bounds = "" if column["exact"] else " (оценка)"
+        print(
+            f"  {name}: min={column['min']}, max={column['max']}{bounds}, "
+            f"различных≈{distinct(column, stats['rows'])}, "
+            f"NULL={column['nulls']}"
+        )
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Надёжная запись файлов БД. Файл целиком пишется во временный рядом
+с целевым, сбрасывается на диск (fsync) и атомарно подменяет целевой:
+при сбое на диске остаётся либо старая, либо новая версия.
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.constants import SYNC_WRITES
+from src.metrics import registry
+
+TMP_SUFFIX = ".tmp"
+
+
+def sync(f) -> None:
+    """Сбрасывает открытый файл на диск."""
+    f.flush()
+    if SYNC_WRITES:
+        os.fsync(f.fileno())
+        registry.incr("fsyncs")
+
+
+def sync_dir(path) -> None:
+    """Сбрасывает на диск каталог: создание и переименование файлов в нём."""
+    if not SYNC_WRITES or os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path, mode: str = "w"):
+    """
+    Открывает временный файл для записи вместо path; после выхода
+    из блока файл сбрасывается на диск и заменяет path.
+    При ошибке временный файл удаляется, path не меняется.
+    Недостающий каталог (например, data/) создаётся.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + TMP_SUFFIX)
+    encoding = None if "b" in mode else "utf-8"
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+            sync(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    sync_dir(path.parent)
@@ -1,30 +1,77 @@
 #!/usr/bin/env python3
 """Игровой цикл"""
 
+import json
 import shlex
+import sys
+import time
+from itertools import islice
+
+from src.constants import (
+    COMMAND_CACHE_MAX_ENTRIES,
+    GROUP_COMMIT_WINDOW,
+    HELP_TEXT,
+    SELECT_PAGE_SIZE,
+)
+from src.decorators import create_cacher
+from src.metrics import registry
 
-import prompt
-from prettytable import PrettyTable
-
-from src.constants import HELP_TEXT, META_FILE
-
+from .bulk import EXPORT_FORMATS, bulk_load, export_rows
 from .core import (
+    aggregate,
+    cache_result,
+    change_listeners,
+    create_index,
     create_table,
     delete,
     drop_table,
+    explain,
+    indexes,
     info,
     insert,
+    insert_many,
     list_tables,
     select,
+    select_sorted,
+    select_stream,
+    stats_aggregate,
+    table_stats,
     update,
 )
-from .parser import parse_insert, parse_set_where
-from .utils import (
-    load_metadata,
-    load_table_data,
-    save_metadata,
-    save_table_data,
+from .join import JOIN_SYNTAX, bind_join, explain_join, select_join
+from .parser import (
+    is_keyword,
+    parse_assignments,
+    parse_insert_rows,
+    parse_projection,
+    parse_select,
+    parse_where,
+    split_clauses,
+    tokenize,
+)
+from .predicates import bind
+from .sorting import sort_rows
+from .tables import TableManager
+
+QUERY_COMMANDS = ("select", "update", "delete", "explain")
+KNOWN_COMMANDS = (
+    *QUERY_COMMANDS, "create_table", "drop_table", "list_tables",
+    "create_index", "insert", "load", "export", "info", "convert", "commit", "sync",
+    "stats", "profile", "help", "exit",
 )
+# Число строк в отчёте команды profile.
+PROFILE_TOP = 15
+SELECT_SYNTAX = ("Синтаксис: select [агрегаты] from <table> [where ...] "
+                 "[group by <col>] [order by <col> [asc|desc]] [limit N] "
+                 "[offset M] [format table|tsv|jsonl]")
+UPDATE_SYNTAX = "Синтаксис: update <table> set <col>=<val> [, ...] where <условие>"
+DELETE_SYNTAX = "Синтаксис: delete from <table> where <условие>"
+EXPORT_SYNTAX = ("Синтаксис: export <table> [where <условие>] to <файл> "
+                 f"[format {'|'.join(EXPORT_FORMATS)}]")
+
+# Разобранные и связанные со схемой команды (LRU).
+command_cache = create_cacher(COMMAND_CACHE_MAX_ENTRIES)
+registry.register_gauge("command_cache", command_cache.stats)
 
 
 def print_help() -> None:
@@ -32,6 +79,48 @@ def print_help() -> None:
     print(HELP_TEXT)
 
 
+def print_rows(rows, fmt: str = "table",
+               page_size: int = SELECT_PAGE_SIZE) -> int:
+    """
+    Выводит строки по мере поступления: таблицами по page_size строк
+    или построчно в формате tsv/jsonl. Возвращает число строк.
+    """
+    with registry.phase("render"):
+        count = _print_rows(rows, fmt, page_size)
+    registry.incr("rows_returned", count)
+    return count
+
+
+def _print_rows(rows, fmt: str, page_size: int) -> int:
+    count = 0
+    if fmt == "table":
+        from prettytable import PrettyTable
+
+        page = None
+        for row in rows:
+            if page is None:
+                page = PrettyTable()
+                page.field_names = list(row.keys())
+            page.add_row(list(row.values()))
+            count += 1
+            if count % page_size == 0:
+                print(page)
+                page = None
+        if page is not None:
+            print(page)
+        return count
+
+    for row in rows:
+        if fmt == "jsonl":
+            print(json.dumps(row, ensure_ascii=False))
+        else:
+            if not count:
+                print("\t".join(row.keys()))
+            print("\t".join(str(value) for value in row.values()))
+        count += 1
+    return count
+
+
 def check_args(args: list[str], min_len: int, command_name: str) -> bool:
     """Проверяет минимальное количество аргументов для команды."""
     if len(args) < min_len:
@@ -40,153 +129,553 @@ def check_args(args: list[str], min_len: int, command_name: str) -> bool:
     return True
 
 
-def find_keyword_index(args: list[str], keyword: str) -> int:
-    """Возвращает индекс ключевого слова в args или -1, если не найдено."""
-    keyword_lower = keyword.lower()
-    for i, arg in enumerate(args):
-        if arg.lower() == keyword_lower:
-            return i
-    return -1
-
-
-def run() -> None:
+def parse_query(tokens: list) -> dict:
+    """
+    Разбирает команду select, update, delete или explain в словарь
+    с ключами command, table, where и параметрами команды
+    (у select с join — ещё join: таблица и столбцы условия ON).
+    Синтаксическая ошибка возвращается в ключе error.
+    """
+    command = tokens[0].lower()
+    if command == "select":
+        start = next((i for i, token in enumerate(tokens)
+                      if is_keyword(token, "from")), None)
+        if start is None or start + 1 >= len(tokens):
+            return {"error": SELECT_SYNTAX}
+        projection = parse_projection(tokens[1:start]) if start > 1 else None
+        rest = start + 2
+        join = None
+        if is_keyword(tokens[rest] if rest < len(tokens) else None, "join"):
+            if (len(tokens) < rest + 6 or not is_keyword(tokens[rest + 2], "on")
+                    or tokens[rest + 4] != "="):
+                return {"error": JOIN_SYNTAX}
+            join = {"table": tokens[rest + 1],
+                    "on": (str(tokens[rest + 3]), str(tokens[rest + 5]))}
+            rest += 6
+        query = {
+            "table": tokens[start + 1],
+            "projection": projection,
+            "join": join,
+            **parse_select(tokens[rest:]),
+        }
+        if projection is None and query["group_by"] is not None:
+            return {"error": "GROUP BY используется только с агрегатами."}
+        # У соединения список вывода может состоять из одних столбцов.
+        columns_only = (join is not None and projection is not None
+                        and query["group_by"] is None
+                        and all(func is None for func, _ in projection))
+        if projection is not None and not columns_only:
+            plain = {column for func, column in projection if func is None}
+            if plain - {query["group_by"]}:
+                return {"error": "Без агрегата можно выводить только "
+                                 "столбец из GROUP BY."}
+            if len(plain) == len(projection):
+                return {"error": "Укажите хотя бы один агрегат: "
+                                 "count, sum, min, max, avg."}
+    elif command == "update":
+        if len(tokens) < 3 or not is_keyword(tokens[2], "set"):
+            return {"error": UPDATE_SYNTAX}
+        clauses = split_clauses(tokens[2:], ("set", "where"))
+        if "where" not in clauses:
+            return {"error": "Отсутствует условие WHERE."}
+        query = {
+            "table": tokens[1],
+            "set": parse_assignments(clauses["set"]),
+            "where": parse_where(clauses["where"]),
+        }
+    elif command == "delete":
+        if (
+                len(tokens) < 4
+                or not is_keyword(tokens[1], "from")
+                or not is_keyword(tokens[3], "where")
+        ):
+            return {"error": DELETE_SYNTAX}
+        query = {"table": tokens[2], "where": parse_where(tokens[4:])}
+    else:
+        if len(tokens) < 2 or not any(
+                is_keyword(tokens[1], kw) for kw in ("select", "update", "delete")):
+            return {"error": "Синтаксис: explain <select|update|delete ...>"}
+        query = parse_query(tokens[1:])
+        if "error" in query:
+            return query
+    query["command"] = command
+    return query
+
+
+def compile_query(user_input: str, metadata: dict) -> dict:
+    """
+    Разбирает команду и связывает условие WHERE со схемой таблицы,
+    чтобы литералы приводились к типам столбцов один раз.
+    """
+    query = parse_query(tokenize(user_input))
+    if "error" not in query:
+        if query.get("join") is not None:
+            types = bind_join(query, metadata)
+        else:
+            types = dict(metadata.get(query["table"], ()))
+            query["where"] = bind(query.get("where"), types)
+        if types and query.get("projection"):
+            check_projection(query["projection"], query["group_by"], types)
+        if query.get("order_by") is not None:
+            query["order_by"] = check_order(query, types)
+    return query
+
+
+def check_projection(projection: list, group_by: str | None,
+                     types: dict) -> None:
+    """Проверяет, что столбцы агрегатов есть в схеме и подходят по типу."""
+    for func, column in [*projection, (None, group_by)]:
+        if column is None or column == "*":
+            continue
+        if column not in types:
+            raise ValueError(f"Столбец {column} не найден.")
+        if func in ("sum", "avg") and types[column] == "str":
+            raise ValueError(f"{func} применим только к столбцам int и bool.")
+
+
+def check_order(query: dict, types: dict) -> tuple[str, bool]:
+    """
+    Проверяет order by и возвращает (столбец результата, по убыванию).
+    С агрегатами сортируются строки результата, без них — строки таблицы.
+    """
+    func, column, descending = query["order_by"]
+    label = column if func is None else f"{func}({column})"
+    projection = query["projection"] or ()
+    if any(item_func is not None for item_func, _ in projection):
+        labels = {item if item_func is None else f"{item_func}({item})"
+                  for item_func, item in projection}
+        if label not in labels | {query["group_by"]}:
+            raise ValueError(f"Столбца {label} нет в результате для ORDER BY.")
+    elif func is not None:
+        raise ValueError("ORDER BY по агрегату используется только с агрегатами.")
+    elif types and column not in types:
+        raise ValueError(f"Столбец {column} не найден.")
+    return label, descending
+
+
+def connect(tables: TableManager) -> None:
+    """
+    Подключает журнал изменений и статистику таблиц к TableManager.
+    Кэши команд и результатов общие для процесса, а версия схемы своя
+    у каждого TableManager, поэтому при подключении они очищаются.
+    """
+    command_cache.invalidate()
+    cache_result.invalidate()
+    change_listeners.append(tables.record_change)
+    table_stats.attach(tables.stats, tables.touch_stats)
+    indexes.attach(tables)
+
+
+def disconnect(tables: TableManager) -> None:
+    """
+    Отключает TableManager и сохраняет несохранённые изменения,
+    а затем изменившиеся текстовые индексы.
+    """
+    change_listeners.remove(tables.record_change)
+    table_stats.attach({})
+    try:
+        tables.close()
+        indexes.persist()
+    finally:
+        indexes.attach()
+
+
+def run(tables: TableManager | None = None) -> None:
     """Основной цикл программы."""
-    print_help()
+    tables = tables or TableManager(flush_policy="background")
+    connect(tables)
+    print("Введите help для списка команд, exit — для выхода.")
+    try:
+        loop(tables)
+    finally:
+        disconnect(tables)
+
+
+def run_query(tables: TableManager, user_input: str) -> None:
+    """
+    Выполняет select, update, delete или explain.
+    Разобранные команды берутся из кэша по тексту и версии схемы.
+    """
+    with registry.phase("parse"):
+        query = command_cache(
+            (user_input, tables.schema_version),
+            lambda: compile_query(user_input, tables.metadata))
+    if "error" in query:
+        print(query["error"])
+        return
+
+    command = query["command"]
+    table_name = query["table"]
+    where_clause = query["where"]
+
+    if query.get("join") is not None:
+        if command == "explain":
+            explain_join(tables, query)
+            return
+        stop = None if query["limit"] is None else query["offset"] + query["limit"]
+        rows = select_join(tables, query, stop)
+        if not print_rows(islice(rows, query["offset"], stop), query["format"]):
+            print("Нет данных.")
+
+    elif command == "select" and query["projection"]:
+        rows = None
+        if where_clause is None and query["group_by"] is None:
+            rows = stats_aggregate(
+                table_stats.get(table_name), query["projection"])
+        if rows is None:
+            rows = aggregate(
+                tables.get(table_name, where=where_clause),
+                query["projection"], where_clause,
+                group_by=query["group_by"], table_name=table_name)
+        stop = None if query["limit"] is None else query["offset"] + query["limit"]
+        if query["order_by"] is not None:
+            rows = sort_rows(rows, *query["order_by"], limit=stop)
+        if not print_rows(islice(rows, query["offset"], stop), query["format"]):
+            print("Нет данных.")
+
+    elif command == "select":
+        data = tables.get(table_name, where=where_clause)
+        if query["order_by"] is not None:
+            column = query["order_by"][0]
+            col_type = dict(tables.metadata.get(table_name, ())).get(column)
+            rows = select_sorted(
+                data, query["order_by"], where_clause, table_name=table_name,
+                col_type=col_type, limit=query["limit"],
+                offset=query["offset"])
+        elif query["limit"] is None and not query["offset"]:
+            rows = select(data, where_clause, table_name=table_name)
+        else:
+            rows = select_stream(
+                data, where_clause, table_name=table_name,
+                limit=query["limit"], offset=query["offset"])
+        if not print_rows(rows, query["format"]):
+            print("Нет данных.")
+
+    elif command == "update":
+        data = tables.get(table_name, writable=True)
+        data = update(data, query["set"], where_clause,
+                      table_name=table_name,
+                      schema=tables.metadata.get(table_name))
+        tables.put(table_name, data)
+
+    elif command == "delete":
+        data = tables.get(table_name, writable=True)
+        result = delete(data, where_clause, table_name=table_name)
+        if result is not None:
+            tables.put(table_name, result)
+
+    else:
+        explain(tables.get(table_name, where=where_clause), where_clause,
+                table_name=table_name)
+
+
+def loop(tables: TableManager) -> None:
+    """Читает и выполняет команды до команды exit."""
+    import prompt
 
     while True:
-        metadata = load_metadata(META_FILE)
         try:
             user_input = prompt.string("Введите команду: ")
+        except EOFError:
+            break
         except Exception as e:
             print(f"Ошибка ввода: {e}")
             continue
 
         try:
-            args = shlex.split(user_input)
-        except ValueError:
-            print("Ошибка разбора команды. Попробуйте снова.")
-            continue
-
-        if not args:
-            continue
-
-        args_lower = [a.lower() for a in args]
-        command = args_lower[0]
-
-        try:
-            if command == "create_table":
-                if not check_args(args, 2, "create_table"):
-                    continue
-                metadata = create_table(metadata, args[1], args[2:])
-                save_metadata(META_FILE, metadata)
-
-            elif command == "drop_table":
-                if not check_args(args, 2, "drop_table"):
-                    continue
-                result = drop_table(metadata, args[1])
-                if result is not None:
-                    metadata = result
-                    save_metadata(META_FILE, metadata)
-
-            elif command == "list_tables":
-                list_tables(metadata)
-
-            elif command == "insert":
-                if (
-                        len(args) < 4
-                        or args_lower[1] != "into"
-                        or args_lower[3] != "values"
-                ):
-                    print("Синтаксис: insert into <table> values (...)")
-                    continue
-
-                table_name = args[2]
-                values_index = user_input.lower().find("values")
-                values_str = user_input[values_index + len("values"):]
-                values = parse_insert(values_str)
-
-                data = load_table_data(table_name)
-                data = insert(metadata, table_name, values, data)
-                save_table_data(table_name, data)
-
-            elif command == "select":
-                if len(args) < 3 or args_lower[1] != "from":
-                    print("Синтаксис: select from <table> [where ...]")
-                    continue
-
-                table_name = args[2]
-                data = load_table_data(table_name)
-
-                where_clause = None
-                if len(args) > 3 and args_lower[3] == "where":
-                    where_clause = parse_set_where(args[4:])
-
-                rows = select(data, where_clause)
-                if not rows:
-                    print("Нет данных.")
-                    continue
-
-                table = PrettyTable()
-                table.field_names = rows[0].keys()
-                for row in rows:
-                    table.add_row(row.values())
-                print(table)
-
-            elif command == "update":
-                if len(args) < 5 or args_lower[2] != "set":
-                    print(
-                        "Синтаксис: update <table> set <col>=<val> "
-                        "where <col>=<val>"
-                    )
-                    continue
-
-                table_name = args[1]
-                where_index = find_keyword_index(args, "where")
-                if where_index == -1:
-                    print("Отсутствует условие WHERE.")
-                    continue
-
-                set_clause = parse_set_where(args[3:where_index])
-                where_clause = parse_set_where(args[where_index + 1:])
-                data = load_table_data(table_name)
-                data = update(data, set_clause, where_clause)
-                save_table_data(table_name, data)
-
-            elif command == "delete":
-                if (
-                        len(args) < 4
-                        or args_lower[1] != "from"
-                        or args_lower[3] != "where"
-                ):
-                    print(
-                        "Синтаксис: delete from <table> "
-                        "where <col>=<val>"
-                    )
-                    continue
-
-                table_name = args[2]
-                where_clause = parse_set_where(args[4:])
-                data = load_table_data(table_name)
-                result = delete(data, where_clause)
-                if result is not None:
-                    save_table_data(table_name, result)
-
-            elif command == "info":
-                if not check_args(args, 2, "info"):
-                    continue
-                table_name = args[1]
-                data = load_table_data(table_name)
-                info(metadata, table_name, data)
-
-            elif command == "help":
-                print_help()
-
-            elif command == "exit":
+            if not execute(tables, user_input):
                 break
-
-            else:
-                print(f"Функции {command} нет. Попробуйте снова.")
-
         except Exception as e:
             print(f"Произошла ошибка: {e}")
+        finally:
+            tables.end_command()
+
+
+def run_command(user_input: str, tables: TableManager | None = None) -> int:
+    """
+    Выполняет одну команду и сохраняет изменения (project -c).
+    Возвращает 1, если команда завершилась ошибкой, иначе 0.
+    """
+    tables = tables or TableManager()
+    connect(tables)
+    try:
+        execute(tables, user_input)
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        return 1
+    finally:
+        disconnect(tables)
+    return 0
+
+
+def script_commands(lines):
+    """
+    Команды из строк скрипта: пустые строки и комментарии (# или --)
+    пропускаются, завершающая точка с запятой отбрасывается.
+    Возвращает пары (номер строки, команда).
+    """
+    for number, line in enumerate(lines, 1):
+        command = line.strip()
+        if not command or command.startswith(("#", "--")):
             continue
+        yield number, command.removesuffix(";").rstrip()
+
+
+def run_script(lines, tables: TableManager | None = None,
+               commit_every: int = 0,
+               commit_window: float = GROUP_COMMIT_WINDOW) -> int:
+    """
+    Пакетный режим: выполняет команды подряд без приглашений.
+    Изменения сохраняются каждые commit_every команд, а без него —
+    групповой фиксацией раз в commit_window секунд.
+    Возвращает число команд, завершившихся ошибкой.
+    """
+    tables = tables or TableManager(
+        flush_policy="exit" if commit_every else "group",
+        commit_window=commit_window)
+    connect(tables)
+    start = time.monotonic()
+    executed = 0
+    errors = 0
+    try:
+        for number, command in script_commands(lines):
+            executed += 1
+            try:
+                if not execute(tables, command):
+                    break
+            except Exception as e:
+                errors += 1
+                print(f"Строка {number}: ошибка: {e}")
+            if commit_every and executed % commit_every == 0:
+                tables.flush()
+            else:
+                tables.end_command()
+    finally:
+        disconnect(tables)
+
+    duration = time.monotonic() - start
+    rate = executed / duration if duration else float(executed)
+    print(
+        f"Выполнено команд: {executed} (ошибок: {errors}) "
+        f"за {duration:.3f} секунд ({rate:.0f} команд/с)."
+    )
+    return errors
+
+
+def execute(tables: TableManager, user_input: str) -> bool:
+    """
+    Выполняет одну команду, замеряя её время для команды stats.
+    Возвращает False, если введена команда exit.
+    """
+    first = user_input.split(maxsplit=1)
+    if not first:
+        return True
+    name = first[0].lower()
+    with registry.command(name if name in KNOWN_COMMANDS else "unknown"):
+        if name in QUERY_COMMANDS:
+            run_query(tables, user_input)
+            return True
+        return execute_command(tables, user_input)
+
+
+def print_stats(args: list[str]) -> None:
+    """
+    Команда stats: сводка метрик, stats json [файл] — выгрузка в JSON,
+    stats reset — обнуление.
+    """
+    if args and args[0].lower() == "reset":
+        registry.reset()
+        print("Метрики обнулены.")
+        return
+    snapshot = registry.snapshot()
+    if args and args[0].lower() == "json":
+        text = json.dumps(snapshot, ensure_ascii=False, indent=2)
+        if len(args) > 1:
+            with open(args[1], "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+            print(f"Метрики сохранены в {args[1]}.")
+        else:
+            print(text)
+        return
+
+    from prettytable import PrettyTable
+
+    latency = PrettyTable()
+    latency.field_names = ["метрика", "вызовов", "p50, мс", "p95, мс",
+                           "p99, мс", "max, мс"]
+    for name, summary in snapshot["latency"].items():
+        latency.add_row([name, summary["count"]] + [
+            f"{summary[key] * 1000:.3f}" for key in ("p50", "p95", "p99", "max")])
+    print(latency)
+
+    total = sum(snapshot["phases"].values()) or 1.0
+    print("Время по фазам: " + ", ".join(
+        f"{name} {seconds:.3f} с ({seconds / total:.0%})"
+        for name, seconds in snapshot["phases"].items()))
+    print("Счётчики: " + (", ".join(
+        f"{name}={value}" for name, value in snapshot["counters"].items())
+        or "нет"))
+    for name, cache in snapshot["gauges"].items():
+        lookups = cache["hits"] + cache["misses"]
+        rate = cache["hits"] / lookups if lookups else 0.0
+        print(f"Кэш {name}: попаданий {cache['hits']} из {lookups} "
+              f"({rate:.0%}), записей {cache['size']}/{cache['max_entries']}")
+
+
+def profile(tables: TableManager, user_input: str) -> None:
+    """Команда profile: выполняет команду под cProfile и печатает горячие точки."""
+    if not user_input.strip():
+        print("Синтаксис: profile <команда>")
+        return
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        execute(tables, user_input)
+    finally:
+        profiler.disable()
+    print(f"Самые затратные функции (топ {PROFILE_TOP}):")
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats(
+        "cumulative").print_stats(PROFILE_TOP)
+
+
+def execute_command(tables: TableManager, user_input: str) -> bool:
+    """Выполняет команду, не относящуюся к запросам select/update/delete."""
+    metadata = tables.metadata
+    try:
+        with registry.phase("parse"):
+            args = shlex.split(user_input)
+    except ValueError:
+        print("Ошибка разбора команды. Попробуйте снова.")
+        return True
+
+    if not args:
+        return True
+
+    args_lower = [a.lower() for a in args]
+    command = args_lower[0]
+
+    if command == "create_table":
+        if not check_args(args, 2, "create_table"):
+            return True
+        metadata = create_table(metadata, args[1], args[2:])
+        tables.save_metadata(metadata)
+
+    elif command == "drop_table":
+        if not check_args(args, 2, "drop_table"):
+            return True
+        result = drop_table(metadata, args[1])
+        if result is not None:
+            tables.forget(args[1])
+            tables.save_metadata(result)
+
+    elif command == "list_tables":
+        list_tables(metadata)
+
+    elif command == "create_index":
+        if len(args) != 5 or args_lower[3] != "using":
+            print("Синтаксис: create_index <table> <col> using trigram|prefix")
+            return True
+        # Индекс сохраняется с отпечатком файлов таблицы, поэтому
+        # изменения сначала записываются. Данные берутся для изменения,
+        # чтобы следующие insert/update/delete поддерживали тот же индекс.
+        tables.flush()
+        create_index(metadata, args[1], args[2], args_lower[4],
+                     tables.get(args[1], writable=True))
+        tables.flush()
+        indexes.persist()
+
+    elif command == "insert":
+        if (
+                len(args) < 4
+                or args_lower[1] != "into"
+                or args_lower[3] != "values"
+        ):
+            print("Синтаксис: insert into <table> values (...)")
+            return True
+
+        table_name = args[2]
+        values_index = user_input.lower().find("values")
+        values_str = user_input[values_index + len("values"):]
+        rows_values = parse_insert_rows(values_str)
+
+        data = tables.get(table_name, writable=True)
+        if len(rows_values) == 1:
+            data = insert(metadata, table_name, rows_values[0], data,
+                          reserve_ids=tables.reserve_ids)
+        else:
+            data = insert_many(metadata, table_name, rows_values, data,
+                               reserve_ids=tables.reserve_ids)
+        tables.put(table_name, data)
+
+    elif command == "load":
+        if len(args) < 4 or args_lower[2] != "from":
+            print("Синтаксис: load <table> from <file.csv|file.jsonl>")
+            return True
+        bulk_load(tables, args[1], args[3])
+
+    elif command == "export":
+        tokens = tokenize(user_input)
+        clauses = split_clauses(tokens[2:], ("where", "to", "format"))
+        if (len(tokens) < 2 or clauses[""]
+                or len(clauses.get("to", ())) != 1
+                or len(clauses.get("format", [None])) != 1):
+            print(EXPORT_SYNTAX)
+            return True
+        table_name = str(tokens[1])
+        where = None
+        if "where" in clauses:
+            where = bind(parse_where(clauses["where"]),
+                         dict(metadata.get(table_name, ())))
+        fmt = clauses.get("format", [None])[0]
+        export_rows(tables, table_name, str(clauses["to"][0]), where,
+                    fmt.lower() if fmt is not None else None)
+
+    elif command == "info":
+        if not check_args(args, 2, "info"):
+            return True
+        table_name = args[1]
+        stats = table_stats.get(table_name)
+        if stats is None and table_name in metadata:
+            stats = table_stats.ensure(
+                table_name, metadata[table_name], tables.get(table_name))
+        info(metadata, table_name, stats)
+
+    elif command == "convert":
+        if len(args) < 3:
+            print("Синтаксис: convert <table> <json|binary|segments>")
+            return True
+        tables.convert(args[1], args_lower[2])
+        print(f'Таблица "{args[1]}" сохранена в формате {args_lower[2]}.')
+
+    elif command == "commit":
+        tables.commit()
+        if tables.flush_policy == "background":
+            print("Изменения поставлены в очередь на запись "
+                  "(sync — дождаться записи на диск).")
+        else:
+            print("Изменения сохранены.")
+
+    elif command == "sync":
+        tables.flush()
+        print("Все изменения записаны на диск.")
+
+    elif command == "stats":
+        print_stats(args[1:])
+
+    elif command == "profile":
+        profile(tables, user_input.split(maxsplit=1)[1]
+                if len(args) > 1 else "")
+
+    elif command == "help":
+        print_help()
+
+    elif command == "exit":
+        return False
+
+    else:
+        print(f"Функции {command} нет. Попробуйте снова.")
+
+    return True
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Индексы по столбцам таблиц: хеш-индексы, которые строятся
+автоматически, и текстовые индексы (триграммный и префиксный),
+которые создаёт команда create_index.
+
+Текстовые индексы сохраняются в data/<таблица>.<столбец>.<вид>.idx:
+строка JSON-заголовка (ключи, длины списков позиций, отпечаток файлов
+таблицы) и затем все списки позиций подряд как массив array.
+Файл используется, только пока отпечаток совпадает с файлами таблицы.
+"""
+
+import json
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from itertools import chain
+
+from src.metrics import registry
+
+from .columnar import column_values
+from .durable import atomic_write
+from .predicates import Contains, Like, like_parts, like_prefix, prefix_end
+from .utils import index_file, normalize_value, table_fingerprint
+
+TEXT_INDEX_KINDS = ("trigram", "prefix")
+# Код типа array для списков позиций текстовых индексов.
+POSITION_TYPECODE = "I"
+
+
+def key_kind(value) -> str | None:
+    """Вид ключа для диапазонных запросов: "num", "str" или None."""
+    if isinstance(value, int):
+        return "num"
+    if isinstance(value, str):
+        return "str"
+    return None
+
+
+class HashIndex:
+    """
+    Хеш-индекс одного столбца:
+    нормализованное значение -> отсортированный список позиций строк.
+    """
+
+    key = staticmethod(normalize_value)
+
+    def __init__(self, column: str):
+        self.column = column
+        self.buckets: dict = {}
+        # Отсортированные ключи по видам ("num"/"str"), строятся по запросу.
+        self._sorted: dict | None = None
+
+    def build(self, table_data: list[dict]) -> None:
+        """Строит индекс по всем строкам таблицы."""
+        buckets = {}
+        values = column_values(table_data, self.column)
+        to_key = self.key
+        for pos, value in enumerate(values):
+            key = to_key(value)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [pos]
+            else:
+                bucket.append(pos)
+        self.buckets = buckets
+        self._sorted = None
+
+    def add(self, value, position: int) -> None:
+        """Добавляет позицию строки в корзину значения."""
+        key = self.key(value)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = []
+            self._sorted = None
+        if not bucket or bucket[-1] < position:
+            bucket.append(position)
+        else:
+            insort(bucket, position)
+
+    def remove(self, value, position: int) -> None:
+        """Убирает позицию строки из корзины значения."""
+        key = self.key(value)
+        bucket = self.buckets.get(key)
+        if not bucket:
+            return
+        i = bisect_left(bucket, position)
+        if i < len(bucket) and bucket[i] == position:
+            del bucket[i]
+        if not bucket:
+            del self.buckets[key]
+            self._sorted = None
+
+    def lookup(self, value) -> list[int]:
+        """Возвращает позиции строк с указанным значением."""
+        return self.buckets.get(self.key(value), [])
+
+    def __len__(self) -> int:
+        """Число различных значений в индексе."""
+        return len(self.buckets)
+
+    def present_keys(self, values) -> list:
+        """Нормализованные значения, которые есть в индексе."""
+        keys = {self.key(value) for value in values}
+        return [key for key in keys if key in self.buckets]
+
+    def sorted_keys(self, kind: str) -> list:
+        """Отсортированные ключи одного вида: "num" (int/bool) или "str"."""
+        if self._sorted is None:
+            nums = sorted(k for k in self.buckets if isinstance(k, int))
+            strs = sorted(k for k in self.buckets if isinstance(k, str))
+            self._sorted = {"num": nums, "str": strs}
+        return self._sorted[kind]
+
+    def range_keys(self, low=None, high=None, low_inclusive: bool = True,
+                   high_inclusive: bool = True) -> list:
+        """
+        Ключи в диапазоне [low, high] (границы могут отсутствовать).
+        Значения разных видов (числа и строки) несравнимы и не попадают
+        в диапазон.
+        """
+        low = None if low is None else normalize_value(low)
+        high = None if high is None else normalize_value(high)
+        kinds = {key_kind(v) for v in (low, high) if v is not None}
+        if len(kinds) != 1 or None in kinds:
+            return []
+        keys = self.sorted_keys(kinds.pop())
+        start = 0
+        if low is not None:
+            start = (bisect_left if low_inclusive else bisect_right)(keys, low)
+        end = len(keys)
+        if high is not None:
+            end = (bisect_right if high_inclusive else bisect_left)(keys, high)
+        return keys[start:end]
+
+    def ordered_positions(self, kind: str, descending: bool = False):
+        """
+        Позиции строк в порядке значений столбца (NULL — первыми,
+        при descending — последними; равные — по возрастанию позиций).
+        kind — вид значений столбца: "num" или "str". None, если в индексе
+        есть ключи другого вида: нормализация изменила значения, и порядок
+        ключей не совпадает с порядком значений.
+        """
+        keys = self.sorted_keys(kind)
+        nulls = self.buckets.get(None)
+        if len(keys) + (nulls is not None) != len(self.buckets):
+            return None
+        buckets = [self.buckets[key] for key in keys]
+        if descending:
+            buckets.reverse()
+        if nulls is not None:
+            buckets.insert(len(buckets) if descending else 0, nulls)
+        return chain.from_iterable(buckets)
+
+    def positions_for_keys(self, keys):
+        """Позиции строк для набора ключей, по возрастанию."""
+        buckets = [self.buckets[key] for key in keys]
+        if len(buckets) == 1:
+            return iter(buckets[0])
+        return merge(*buckets)
+
+    def remove_positions(self, removed: list[int]) -> None:
+        """Убирает удалённые строки и сдвигает позиции остальных."""
+        buckets = {}
+        for key, bucket in self.buckets.items():
+            bucket = shift_positions(bucket, removed)
+            if bucket:
+                buckets[key] = bucket
+        if len(buckets) != len(self.buckets):
+            self._sorted = None
+        self.buckets = buckets
+
+
+def shift_positions(positions, removed: list[int]) -> list[int]:
+    """
+    Позиции после удаления строк removed (по возрастанию):
+    удалённые выпадают, остальные сдвигаются к началу.
+    """
+    result = []
+    skipped = 0
+    for pos in positions:
+        while skipped < len(removed) and removed[skipped] < pos:
+            skipped += 1
+        if skipped < len(removed) and removed[skipped] == pos:
+            continue
+        result.append(pos - skipped)
+    return result
+
+
+def trigrams(text: str) -> set[str]:
+    """Все подстроки text длиной 3."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PrefixIndex(HashIndex):
+    """
+    Префиксный индекс str-столбца: значение как есть -> позиции строк.
+    Для like 'abc%' берутся отсортированные значения от 'abc'
+    до первого, которое с 'abc' не начинается.
+    """
+
+    kind = "prefix"
+    fingerprint = None
+    key = staticmethod(lambda value: value)
+
+    def usable(self, node) -> bool:
+        """Может ли индекс отобрать строки для условия."""
+        return isinstance(node, Like) and bool(like_prefix(node.pattern))
+
+    def _keys(self, node) -> list:
+        prefix = like_prefix(node.pattern)
+        keys = self.sorted_keys("str")
+        start = bisect_left(keys, prefix)
+        end = prefix_end(prefix)
+        stop = len(keys) if end is None else bisect_left(keys, end, start)
+        return keys[start:stop]
+
+    def estimate(self, node) -> int:
+        """Число строк-кандидатов для условия."""
+        return sum(len(self.buckets[key]) for key in self._keys(node))
+
+    def candidates(self, node):
+        """Позиции строк, значения которых начинаются с префикса шаблона."""
+        return self.positions_for_keys(self._keys(node))
+
+    def postings(self) -> dict:
+        return self.buckets
+
+    def restore(self, postings: dict) -> None:
+        self.buckets = {key: positions.tolist()
+                        for key, positions in postings.items()}
+        self._sorted = None
+
+
+class TrigramIndex:
+    """
+    Триграммный индекс str-столбца: триграмма -> отсортированный массив
+    позиций строк, в значениях которых она встречается. Кандидаты для
+    contains и like — пересечение списков триграмм фрагментов длиной
+    от 3 символов; точное условие проверяется по кандидатам.
+    """
+
+    kind = "trigram"
+
+    def __init__(self, column: str):
+        self.column = column
+        self.grams: dict[str, array] = {}
+        # Отпечаток файлов таблицы, с которым индекс лежит на диске.
+        self.fingerprint = None
+
+    def build(self, table_data) -> None:
+        """Строит индекс по всем строкам таблицы."""
+        grams = {}
+        seen = {}
+        for pos, value in enumerate(column_values(table_data, self.column)):
+            if not isinstance(value, str):
+                continue
+            parts = seen.get(value)
+            if parts is None:
+                parts = seen[value] = trigrams(value)
+            for gram in parts:
+                positions = grams.get(gram)
+                if positions is None:
+                    grams[gram] = array(POSITION_TYPECODE, (pos,))
+                else:
+                    positions.append(pos)
+        self.grams = grams
+
+    def add(self, value, position: int) -> None:
+        """Добавляет позицию строки в списки триграмм значения."""
+        if not isinstance(value, str):
+            return
+        for gram in trigrams(value):
+            positions = self.grams.get(gram)
+            if positions is None:
+                self.grams[gram] = array(POSITION_TYPECODE, (position,))
+            elif positions[-1] < position:
+                positions.append(position)
+            else:
+                positions.insert(bisect_left(positions, position), position)
+
+    def remove(self, value, position: int) -> None:
+        """Убирает позицию строки из списков триграмм значения."""
+        if not isinstance(value, str):
+            return
+        for gram in trigrams(value):
+            positions = self.grams.get(gram)
+            if positions is None:
+                continue
+            i = bisect_left(positions, position)
+            if i < len(positions) and positions[i] == position:
+                del positions[i]
+            if not positions:
+                del self.grams[gram]
+
+    def remove_positions(self, removed: list[int]) -> None:
+        """Убирает удалённые строки и сдвигает позиции остальных."""
+        grams = {}
+        for gram, positions in self.grams.items():
+            positions = shift_positions(positions, removed)
+            if positions:
+                grams[gram] = array(POSITION_TYPECODE, positions)
+        self.grams = grams
+
+    def _query(self, node) -> set[str]:
+        fragments = ((node.value,) if isinstance(node, Contains)
+                     else like_parts(node.pattern))
+        return set().union(*(trigrams(part) for part in fragments))
+
+    def usable(self, node) -> bool:
+        """Может ли индекс отобрать строки: нужен фрагмент от 3 символов."""
+        return isinstance(node, (Like, Contains)) and bool(self._query(node))
+
+    def _lists(self, node) -> list:
+        empty = array(POSITION_TYPECODE)
+        return sorted((self.grams.get(gram, empty)
+                       for gram in self._query(node)), key=len)
+
+    def estimate(self, node) -> int:
+        """Оценка сверху числа кандидатов: самый короткий список."""
+        return len(self._lists(node)[0])
+
+    def candidates(self, node) -> list[int]:
+        """Позиции строк, содержащих все триграммы условия, по возрастанию."""
+        shortest, *rest = self._lists(node)
+        if not shortest or not rest:
+            return shortest
+        if len(shortest) * len(rest) * 16 < sum(map(len, rest)):
+            # Мало кандидатов: двоичный поиск в длинных списках дешевле.
+            def present(positions, pos):
+                i = bisect_left(positions, pos)
+                return i < len(positions) and positions[i] == pos
+            return [pos for pos in shortest
+                    if all(present(positions, pos) for positions in rest)]
+        found = set(shortest)
+        for positions in rest:
+            found.intersection_update(positions)
+        return sorted(found)
+
+    def postings(self) -> dict:
+        return self.grams
+
+    def restore(self, postings: dict) -> None:
+        self.grams = postings
+
+
+TEXT_INDEXES = {"trigram": TrigramIndex, "prefix": PrefixIndex}
+
+
+def write_text_index(table_name: str, index, fingerprint: list,
+                     rows: int) -> None:
+    """Сохраняет текстовый индекс с отпечатком файлов таблицы (атомарно)."""
+    postings = index.postings()
+    header = {
+        "column": index.column,
+        "kind": index.kind,
+        "rows": rows,
+        "fingerprint": fingerprint,
+        "typecode": POSITION_TYPECODE,
+        "byteorder": sys.byteorder,
+        "keys": list(postings),
+        "counts": [len(positions) for positions in postings.values()],
+    }
+    flat = array(POSITION_TYPECODE)
+    for positions in postings.values():
+        flat.extend(positions)
+    with atomic_write(index_file(table_name, index.column, index.kind),
+                      "wb") as f:
+        f.write(json.dumps(header, ensure_ascii=False).encode() + b"\n")
+        flat.tofile(f)
+        registry.incr("bytes_written", f.tell())
+    index.fingerprint = fingerprint
+
+
+def read_text_index(table_name: str, column: str, kind: str, rows: int):
+    """
+    Читает текстовый индекс из файла. Возвращает None, если файла нет
+    или он не соответствует файлам таблицы и числу строк rows.
+    """
+    try:
+        with open(index_file(table_name, column, kind), "rb") as f:
+            header = json.loads(f.readline())
+            fingerprint = table_fingerprint(table_name)
+            if header["fingerprint"] != fingerprint or header["rows"] != rows:
+                return None
+            flat = array(header["typecode"])
+            flat.frombytes(f.read())
+            registry.incr("bytes_read", f.tell())
+    except FileNotFoundError:
+        return None
+    if header["byteorder"] != sys.byteorder:
+        flat.byteswap()
+    postings = {}
+    start = 0
+    for key, count in zip(header["keys"], header["counts"]):
+        postings[key] = flat[start:start + count]
+        start += count
+    index = TEXT_INDEXES[kind](column)
+    index.restore(postings)
+    index.fingerprint = fingerprint
+    return index
+
+
+class IndexManager:
+    """
+    Реестр индексов: по одному хеш-индексу на столбец таблицы.
+    Индексы строятся лениво при первом обращении и перестраиваются,
+    если им передали другой объект данных таблицы.
+
+    Текстовые индексы есть только у таблиц, для которых их создали
+    (список хранит подключённое хранилище — TableManager). Такой индекс
+    читается из файла, если данные таблицы в памяти совпадают
+    с сохранёнными, иначе строится заново.
+    """
+
+    def __init__(self):
+        # table_name -> (table_data, {column: HashIndex})
+        self._tables: dict[str, tuple[list[dict], dict[str, HashIndex]]] = {}
+        # table_name -> (table_data, {(column, kind): текстовый индекс})
+        self._text: dict[str, tuple] = {}
+        self._store = None
+
+    def attach(self, store=None) -> None:
+        """Подключает хранилище таблиц (None — отключает)."""
+        self._store = store
+        self._text.clear()
+
+    def _indexes(self, table_name: str, table_data: list[dict]) -> dict:
+        entry = self._tables.get(table_name)
+        if entry is None or entry[0] is not table_data:
+            entry = (table_data, {})
+            self._tables[table_name] = entry
+        return entry[1]
+
+    def get(self, table_name: str, table_data: list[dict],
+            column: str) -> HashIndex:
+        """Возвращает индекс столбца, при необходимости строит его."""
+        indexes = self._indexes(table_name, table_data)
+        index = indexes.get(column)
+        if index is None:
+            index = HashIndex(column)
+            index.build(table_data)
+            indexes[column] = index
+        return index
+
+    def peek(self, table_name: str, table_data: list[dict], column: str):
+        """Возвращает уже построенный индекс столбца или None."""
+        entry = self._tables.get(table_name)
+        if entry is None or entry[0] is not table_data:
+            return None
+        return entry[1].get(column)
+
+    def text_index(self, table_name: str, table_data: list[dict],
+                   column: str, kind: str):
+        """
+        Текстовый индекс kind столбца, если его создали, иначе None.
+        При первом обращении индекс читается из файла или строится.
+        """
+        if (self._store is None
+                or (column, kind) not in self._store.text_indexes(table_name)):
+            return None
+        indexes = self._text_indexes(table_name, table_data)
+        index = indexes.get((column, kind))
+        if index is None:
+            if (self._store.unchanged(table_name)
+                    and self._store.cached(table_name) is table_data):
+                index = read_text_index(
+                    table_name, column, kind, len(table_data))
+            if index is None:
+                index = TEXT_INDEXES[kind](column)
+                index.build(table_data)
+                registry.incr("text_index_builds")
+            indexes[(column, kind)] = index
+        return index
+
+    def create_text_index(self, table_name: str, table_data: list[dict],
+                          column: str, kind: str):
+        """Создаёт текстовый индекс: запоминает его в хранилище и строит."""
+        if self._store is None:
+            raise ValueError("Индекс создаётся только для подключённой БД.")
+        self._store.add_text_index(table_name, column, kind)
+        return self.text_index(table_name, table_data, column, kind)
+
+    def _text_indexes(self, table_name: str, table_data: list[dict]) -> dict:
+        entry = self._text.get(table_name)
+        if entry is None or entry[0] is not table_data:
+            entry = (table_data, {})
+            self._text[table_name] = entry
+        return entry[1]
+
+    def _open_text(self, table_name: str, table_data: list[dict]) -> dict:
+        """
+        Открытые текстовые индексы для изменения. Индексы другого объекта
+        данных забываются: их построят заново по уже изменённым данным.
+        """
+        entry = self._text.get(table_name)
+        if entry is None or entry[0] is not table_data:
+            self._text.pop(table_name, None)
+            return {}
+        return entry[1]
+
+    def persist(self) -> None:
+        """
+        Записывает текстовые индексы, устаревшие на диске. Вызывается
+        после сохранения таблиц, когда данные в памяти и на диске совпадают.
+        """
+        if self._store is None:
+            return
+        for table_name, (table_data, indexes) in self._text.items():
+            if not indexes or self._store.cached(table_name) is not table_data:
+                continue
+            fingerprint = table_fingerprint(table_name)
+            for index in indexes.values():
+                if index.fingerprint != fingerprint:
+                    write_text_index(table_name, index, fingerprint,
+                                     len(table_data))
+
+    def on_insert(self, table_name: str, table_data: list[dict],
+                  count: int = 1) -> None:
+        """Добавляет в построенные индексы последние count вставленных строк."""
+        indexes = {**self._indexes(table_name, table_data),
+                   **self._open_text(table_name, table_data)}
+        if not indexes:
+            return
+        for position in range(len(table_data) - count, len(table_data)):
+            row = table_data[position]
+            for index in indexes.values():
+                index.add(row.get(index.column), position)
+
+    def on_update(self, table_name: str, table_data: list[dict],
+                  position: int, old_values: dict) -> None:
+        """Переносит строку между корзинами для изменённых столбцов."""
+        row = table_data[position]
+        indexes = self._indexes(table_name, table_data)
+        text = self._open_text(table_name, table_data)
+        for column, old in old_values.items():
+            changed = [indexes.get(column)] + [
+                index for (name, _), index in text.items() if name == column]
+            for index in changed:
+                if index is not None:
+                    index.remove(old, position)
+                    index.add(row.get(column), position)
+
+    def on_delete(self, table_name: str, table_data: list[dict],
+                  removed=None) -> None:
+        """
+        Перестраивает построенные хеш-индексы после сдвига позиций.
+        В текстовых индексах удалённые позиции removed убираются,
+        а остальные сдвигаются.
+        """
+        for index in self._indexes(table_name, table_data).values():
+            index.build(table_data)
+        text = self._open_text(table_name, table_data)
+        if removed is None:
+            text.clear()
+            return
+        removed = sorted(removed)
+        for index in text.values():
+            index.remove_positions(removed)
+
+    def drop(self, table_name: str) -> None:
+        """Удаляет все индексы таблицы."""
+        self._tables.pop(table_name, None)
+        self._text.pop(table_name, None)
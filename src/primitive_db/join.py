@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Соединение двух таблиц по равенству столбцов (hash join):
+select from a join b on a.col = b.col [where ...].
+
+Хеш-таблица позиций строк строится по меньшей стороне (по оценке
+планировщика после условий WHERE), вторая сторона читается потоком,
+поэтому память ограничена размером меньшей таблицы.
+"""
+
+from src.metrics import registry
+
+from .core import aggregate, indexes, table_stats
+from .planner import Planner
+from .predicates import (
+    And,
+    Or,
+    bind,
+    columns,
+    compile_predicate,
+    conjuncts,
+    describe,
+)
+from .sorting import sort_rows
+from .utils import normalize_value
+
+JOIN_SYNTAX = ("Синтаксис: select ... from <a> join <b> on <a.col> = <b.col> "
+               "[where ...] [order by <col> [asc|desc]] [limit N] [offset M] "
+               "[format table|tsv|jsonl]")
+
+
+def resolve_column(name: str, schemas: dict) -> tuple[str, str]:
+    """
+    Находит столбец "таблица.столбец" или просто "столбец"
+    в схемах {таблица: {столбец: тип}}. Возвращает (таблица, столбец).
+    """
+    table, dot, column = name.partition(".")
+    if dot and table in schemas:
+        if column not in schemas[table]:
+            raise ValueError(f"Столбец {name} не найден.")
+        return table, column
+    owners = [table for table, types in schemas.items() if name in types]
+    if not owners:
+        raise ValueError(f"Столбец {name} не найден.")
+    if len(owners) > 1:
+        raise ValueError(f"Столбец {name} есть в обеих таблицах, "
+                         f"укажите таблицу: <таблица>.{name}.")
+    return owners[0], name
+
+
+def _rename(node, rename):
+    """Копия условия с переименованными столбцами."""
+    if isinstance(node, (And, Or)):
+        return type(node)(tuple(_rename(item, rename) for item in node.items))
+    return node._replace(column=rename(node.column))
+
+
+def _combine(parts: list):
+    """Соединяет части условия через AND (None — условия нет)."""
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else And(tuple(parts))
+
+
+def bind_join(query: dict, metadata: dict) -> dict:
+    """
+    Связывает select с join со схемами таблиц. Части WHERE, которые
+    касаются одной таблицы, переносятся в условие этой таблицы (их
+    проверяет её планировщик, с индексами), остальные проверяются
+    на соединённых строках. Столбцы результата и списка вывода
+    называются "таблица.столбец". Возвращает {столбец результата: тип}.
+    """
+    join = query["join"]
+    left, right = query["table"], join["table"]
+    for name in (left, right):
+        if name not in metadata:
+            raise ValueError(f'Таблица "{name}" не существует.')
+    if left == right:
+        raise ValueError("Соединение таблицы с самой собой не поддерживается.")
+    schemas = {name: dict(metadata[name]) for name in (left, right)}
+
+    keys = dict(resolve_column(name, schemas) for name in join["on"])
+    if len(keys) != 2:
+        raise ValueError("Условие ON должно связывать столбцы обеих таблиц.")
+    join["keys"] = keys
+
+    def qualified(name: str) -> str:
+        return ".".join(resolve_column(name, schemas))
+
+    pushed = {left: [], right: []}
+    residual = []
+    where = query["where"]
+    for part in conjuncts(where) if where is not None else ():
+        owners = {resolve_column(name, schemas)[0] for name in columns(part)}
+        if len(owners) == 1:
+            pushed[owners.pop()].append(
+                _rename(part, lambda name: resolve_column(name, schemas)[1]))
+        else:
+            residual.append(_rename(part, qualified))
+
+    types = {f"{table}.{column}": col_type
+             for table, schema in schemas.items()
+             for column, col_type in schema.items()}
+    join["where"] = {table: bind(_combine(parts), schemas[table])
+                     for table, parts in pushed.items()}
+    query["where"] = bind(_combine(residual), types)
+
+    projection = query["projection"]
+    if projection == [(None, "*")]:
+        projection = None
+    elif projection is not None:
+        projection = [(func, column if column == "*" else qualified(column))
+                      for func, column in projection]
+    query["projection"] = projection
+    if query["group_by"] is not None:
+        query["group_by"] = qualified(query["group_by"])
+    if query["order_by"] is not None:
+        func, column, descending = query["order_by"]
+        if column != "*":
+            column = qualified(column)
+        query["order_by"] = (func, column, descending)
+    return types
+
+
+class JoinPlan:
+    """
+    План соединения. Строящая сторона (build) — таблица с меньшей
+    оценкой числа строк: по её столбцу соединения собирается хеш-таблица
+    нормализованное значение -> позиции строк. Если условия на эту
+    таблицу нет и хеш-индекс столбца уже построен, берётся он.
+    Вторая сторона (probe) читается потоком по своему плану.
+    NULL в столбце соединения пары не образует.
+    """
+
+    def __init__(self, tables, query: dict):
+        join = query["join"]
+        self.names = (query["table"], join["table"])
+        self.keys = join["keys"]
+        self.residual = query["where"]
+        self.sides = {}
+        sizes = {}
+        for name in self.names:
+            where = join["where"][name]
+            data = tables.get(name, where=where)
+            planner = Planner(data, name, indexes, table_stats.get(name))
+            self.sides[name] = (data, planner.plan(where), where)
+            sizes[name] = (len(data) if where is None
+                           else planner.estimate(where))
+        left, right = self.names
+        # При равных оценках строится правая сторона: порядок
+        # результата совпадает с порядком строк левой таблицы.
+        if sizes[left] < sizes[right]:
+            self.build, self.probe = left, right
+        else:
+            self.build, self.probe = right, left
+        data, _, where = self.sides[self.build]
+        self.index = None
+        if where is None:
+            self.index = indexes.peek(self.build, data, self.keys[self.build])
+        self.labels = {
+            name: [(f"{name}.{column}", column)
+                   for column, _ in tables.metadata[name]]
+            for name in self.names
+        }
+        self.scanned = 0
+
+    def explain(self) -> list[str]:
+        """Строки с описанием плана для команды explain."""
+        left, right = self.names
+        source = ("готовый индекс" if self.index is not None
+                  else "строится по строкам")
+        lines = [
+            f"hash_join [{left}.{self.keys[left]} = "
+            f"{right}.{self.keys[right]}]",
+            f"  build: {self.build} (хеш-таблица: {source})",
+        ]
+        lines.extend(self.sides[self.build][1].explain(2))
+        lines.append(f"  probe: {self.probe}")
+        lines.extend(self.sides[self.probe][1].explain(2))
+        if self.residual is not None:
+            lines.append(f"  фильтр соединения: {describe(self.residual)}")
+        return lines
+
+    def _hash_table(self) -> dict:
+        """Хеш-таблица строящей стороны: значение -> позиции строк."""
+        if self.index is not None:
+            return self.index.buckets
+        data, plan, _ = self.sides[self.build]
+        column = self.keys[self.build]
+        table = {}
+        count = 0
+        for pos in plan.positions():
+            key = normalize_value(data[pos].get(column))
+            if key is None:
+                continue
+            bucket = table.get(key)
+            if bucket is None:
+                table[key] = [pos]
+            else:
+                bucket.append(pos)
+            count += 1
+        registry.incr("join_build_rows", count)
+        return table
+
+    def rows(self):
+        """Выполняет соединение и лениво выдаёт соединённые строки."""
+        table = self._hash_table()
+        build_data = self.sides[self.build][0]
+        probe_data, probe_plan, _ = self.sides[self.probe]
+        column = self.keys[self.probe]
+        build_labels = self.labels[self.build]
+        probe_labels = self.labels[self.probe]
+        probe_first = self.probe == self.names[0]
+        test = (compile_predicate(self.residual)
+                if self.residual is not None else None)
+        try:
+            for pos in probe_plan.positions():
+                row = probe_data[pos]
+                key = normalize_value(row.get(column))
+                matches = table.get(key) if key is not None else None
+                if not matches:
+                    continue
+                probe_part = {label: row.get(name)
+                              for label, name in probe_labels}
+                for match in matches:
+                    other = build_data[match]
+                    build_part = {label: other.get(name)
+                                  for label, name in build_labels}
+                    joined = ({**probe_part, **build_part} if probe_first
+                              else {**build_part, **probe_part})
+                    if test is None or test(joined):
+                        yield joined
+        finally:
+            self.scanned = sum(plan.scanned for _, plan, _ in
+                               self.sides.values())
+
+
+def select_join(tables, query: dict, limit: int | None = None):
+    """
+    Выполняет select с join: лениво выдаёт соединённые строки,
+    выбранные столбцы или (для агрегатов) строки агрегатов.
+    Для order by limit — сколько первых строк нужно.
+    """
+    rows = JoinPlan(tables, query).rows()
+    projection = query["projection"]
+    order_by = query["order_by"]
+    if projection is not None and any(func is not None
+                                      for func, _ in projection):
+        rows = aggregate(list(rows), projection, group_by=query["group_by"])
+        if order_by is not None:
+            rows = sort_rows(rows, *order_by, limit=limit)
+        return rows
+    if order_by is not None:
+        rows = sort_rows(rows, *order_by, limit=limit)
+    if projection is None:
+        return rows
+    labels = [column for _, column in projection]
+    return ({label: row[label] for label in labels} for row in rows)
+
+
+def explain_join(tables, query: dict) -> None:
+    """Печатает план соединения и выполняет его для подсчёта строк."""
+    plan = JoinPlan(tables, query)
+    for line in plan.explain():
+        print(line)
+    found = sum(1 for _ in plan.rows())
+    print(f"Фактически просмотрено строк: {plan.scanned}, найдено: {found}")
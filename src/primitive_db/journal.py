@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Журнал изменений таблиц: дозапись мутаций в data/<table>.log."""
+
+import json
+import os
+
+from src.constants import DATA_DIR
+from src.metrics import registry
+
+from .durable import sync, sync_dir
+
+LOG_SUFFIX = ".log"
+COMPACTING_SUFFIX = ".log.compacting"
+
+
+def log_path(table_name: str, suffix: str = LOG_SUFFIX):
+    """Путь к файлу журнала таблицы."""
+    return DATA_DIR / f"{table_name}{suffix}"
+
+
+def append_records(table_name: str, records: list[dict]) -> int:
+    """
+    Дописывает записи об изменениях в конец журнала (JSON Lines)
+    и сбрасывает журнал на диск. Возвращает размер журнала в байтах.
+    """
+    lines = "".join(
+        json.dumps(record, ensure_ascii=False) + "\n" for record in records
+    )
+    data = lines.encode()
+    registry.incr("bytes_written", len(data))
+    path = log_path(table_name)
+    created = not path.exists()
+    if created:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "ab") as f:
+        f.write(data)
+        sync(f)
+        size = f.tell()
+    if created:
+        sync_dir(path.parent)
+    return size
+
+
+def read_records(table_name: str):
+    """
+    Читает записи журнала: сначала файл незавершённой компакции,
+    затем текущий журнал. Оборванная последняя строка пропускается.
+    """
+    for suffix in (COMPACTING_SUFFIX, LOG_SUFFIX):
+        try:
+            with open(log_path(table_name, suffix), "r", encoding="utf-8") as f:
+                registry.incr("bytes_read", os.fstat(f.fileno()).st_size)
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+        except FileNotFoundError:
+            continue
+
+
+def replay(rows: list[dict], records) -> list[dict]:
+    """
+    Применяет записи журнала к снимку таблицы.
+    Записи идемпотентны, поэтому повторное применение безопасно.
+    """
+    by_id = {row["ID"]: row for row in rows}
+    replayed = False
+    for record in records:
+        replayed = True
+        op = record["op"]
+        if op == "insert":
+            row = record["row"]
+            by_id[row["ID"]] = row
+        elif op == "insert_many":
+            for row in record["rows"]:
+                by_id[row["ID"]] = row
+        elif op == "update":
+            for row_id in record["ids"]:
+                row = by_id.get(row_id)
+                if row is not None:
+                    row.update(record["set"])
+        elif op == "delete":
+            for row_id in record["ids"]:
+                by_id.pop(row_id, None)
+    return list(by_id.values()) if replayed else rows
+
+
+def rotate_log(table_name: str) -> bool:
+    """
+    Переименовывает текущий журнал для фоновой компакции.
+    Новые изменения после этого пишутся в свежий журнал.
+    """
+    target = log_path(table_name, COMPACTING_SUFFIX)
+    if target.exists():
+        return False
+    try:
+        os.replace(log_path(table_name), target)
+    except FileNotFoundError:
+        return False
+    sync_dir(target.parent)
+    return True
+
+
+def remove_logs(table_name: str, suffixes=(COMPACTING_SUFFIX, LOG_SUFFIX)) -> None:
+    """Удаляет файлы журнала таблицы."""
+    for suffix in suffixes:
+        try:
+            os.remove(log_path(table_name, suffix))
+        except FileNotFoundError:
+            pass
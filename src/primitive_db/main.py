@@ -1,10 +1,94 @@
 #!/usr/bin/env python3
-from .engine import run
+import argparse
+import sys
 
+from src.constants import GROUP_COMMIT_WINDOW, SERVER_ADDRESS
+from src.decorators import set_confirm_mode
 
-def main() -> None:
+from . import parallel
+from .engine import run, run_command, run_script
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        prog="project", description="Примитивная база данных.")
+    parser.add_argument(
+        "-c", dest="command", metavar="COMMAND",
+        help="выполнить одну команду и выйти")
+    parser.add_argument(
+        "--script", metavar="FILE",
+        help="выполнить команды из файла (- — из stdin) и выйти")
+    parser.add_argument(
+        "-y", "--yes", action="store_true",
+        help="автоматически подтверждать удаление в пакетном режиме")
+    parser.add_argument(
+        "--commit-every", type=int, default=0, metavar="N",
+        help="сохранять изменения каждые N команд (по умолчанию — "
+             "групповой фиксацией, см. --commit-window)")
+    parser.add_argument(
+        "--commit-window", type=float, default=GROUP_COMMIT_WINDOW,
+        metavar="SECONDS",
+        help="окно групповой фиксации: изменения за это время сохраняются "
+             f"одной записью (по умолчанию {GROUP_COMMIT_WINDOW})")
+    parser.add_argument(
+        "--workers", type=int, metavar="N",
+        help="число процессов для просмотра больших таблиц (0 — выключено)")
+    parser.add_argument(
+        "--serve", nargs="?", const=SERVER_ADDRESS, metavar="ADDRESS",
+        help="запустить сервер (host:port или путь к Unix-сокету, "
+             f"по умолчанию {SERVER_ADDRESS})")
+    parser.add_argument(
+        "--connect", nargs="?", const=SERVER_ADDRESS, metavar="ADDRESS",
+        help="выполнять команды на сервере")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
     """Запускает цикл работы с базой данных."""
-    run()
+    args = parse_args(argv)
+    parallel.configure(workers=args.workers)
+    if args.serve is not None:
+        from .server import serve
+
+        # Удаление по команде клиента подтверждается флагом --yes.
+        set_confirm_mode("yes" if args.yes else "no")
+        serve(args.serve, commit_window=args.commit_window)
+        return
+    if args.connect is not None:
+        errors = connected(args)
+        sys.exit(1 if errors else 0)
+    if args.command is not None:
+        set_confirm_mode("yes" if args.yes else "no")
+        sys.exit(run_command(args.command))
+    if args.script is None and sys.stdin.isatty():
+        run()
+        return
+
+    # Пакетный режим: скрипт из файла или команды из конвейера.
+    set_confirm_mode("yes" if args.yes else "no")
+    if args.script in (None, "-"):
+        errors = run_script(sys.stdin, commit_every=args.commit_every,
+                            commit_window=args.commit_window)
+    else:
+        with open(args.script, "r", encoding="utf-8") as f:
+            errors = run_script(f, commit_every=args.commit_every,
+                                commit_window=args.commit_window)
+    sys.exit(1 if errors else 0)
+
+
+def connected(args: argparse.Namespace) -> int:
+    """Клиент сервера: интерактивно, из скрипта или из конвейера."""
+    from .client import run_client
+
+    if args.command is not None:
+        return run_client(args.connect, [args.command])
+    if args.script is None and sys.stdin.isatty():
+        return run_client(args.connect)
+    if args.script in (None, "-"):
+        return run_client(args.connect, sys.stdin)
+    with open(args.script, "r", encoding="utf-8") as f:
+        return run_client(args.connect, f)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Параллельный просмотр больших таблиц в нескольких процессах.
+
+Таблица делится на диапазоны строк, каждый диапазон проверяется
+в отдельном процессе ProcessPoolExecutor. Данные не передаются через
+pickle: бинарная таблица открывается рабочим процессом из своего файла
+через mmap, а нужные столбцы столбцовой таблицы один раз сбрасываются
+во временный файл, который процессы отображают в память.
+"""
+
+import atexit
+import os
+import threading
+from array import array
+from contextlib import contextmanager
+from itertools import compress
+from math import ceil
+from mmap import ACCESS_READ, mmap
+from typing import NamedTuple
+
+from src.constants import PARALLEL_MIN_ROWS, PARALLEL_WORKERS
+
+from .binary import BinaryTable
+from .columnar import ColumnarTable, StrColumn
+from .predicates import And, Or, columns, value_test
+
+# Число диапазонов на один процесс: мелкие диапазоны выравнивают нагрузку.
+CHUNKS_PER_WORKER = 4
+
+settings = {"workers": PARALLEL_WORKERS, "min_rows": PARALLEL_MIN_ROWS}
+_pool = {"executor": None, "workers": 0}
+_pool_lock = threading.Lock()
+
+
+class CodeSet(NamedTuple):
+    """
+    Условие по строковому столбцу, заранее вычисленное по словарю:
+    подходят коды из codes (или все, кроме них, если negate).
+    """
+    column: str
+    codes: frozenset
+    negate: bool
+
+
+def configure(workers: int | None = None, min_rows: int | None = None) -> None:
+    """Меняет число процессов и порог размера таблицы."""
+    if workers is not None:
+        if workers < 0:
+            raise ValueError(f"Некорректное число процессов: {workers}")
+        settings["workers"] = workers
+    if min_rows is not None:
+        settings["min_rows"] = min_rows
+
+
+def enabled(table_data) -> bool:
+    """Стоит ли просматривать таблицу параллельно."""
+    return (
+        settings["workers"] > 1
+        and isinstance(table_data, (ColumnarTable, BinaryTable))
+        and len(table_data) >= settings["min_rows"]
+    )
+
+
+def _executor():
+    # multiprocessing и concurrent.futures импортируются только при первом
+    # параллельном просмотре: обычный запуск их не загружает.
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_all_start_methods, get_context
+
+    workers = settings["workers"]
+    with _pool_lock:
+        if _pool["executor"] is None or _pool["workers"] != workers:
+            _shutdown()
+            # fork небезопасен при работающем потоке компакции журнала.
+            method = ("forkserver" if "forkserver" in get_all_start_methods()
+                      else "spawn")
+            _pool["executor"] = ProcessPoolExecutor(
+                workers, mp_context=get_context(method))
+            _pool["workers"] = workers
+        return _pool["executor"]
+
+
+def shutdown() -> None:
+    """Останавливает рабочие процессы."""
+    with _pool_lock:
+        _shutdown()
+
+
+def _shutdown() -> None:
+    if _pool["executor"] is not None:
+        _pool["executor"].shutdown()
+        _pool["executor"] = None
+        _pool["workers"] = 0
+
+
+atexit.register(shutdown)
+
+
+def chunk_ranges(count: int, chunks: int) -> list[range]:
+    """Делит позиции 0..count на не больше chunks соседних диапазонов."""
+    size = max(1, ceil(count / max(1, chunks)))
+    return [range(start, min(start + size, count))
+            for start in range(0, count, size)]
+
+
+def _encode_strings(table: ColumnarTable, node):
+    """Заменяет условия по строковым столбцам проверкой кодов словаря."""
+    if isinstance(node, (And, Or)):
+        return type(node)(
+            tuple(_encode_strings(table, item) for item in node.items))
+    data = table.columns[node.column]
+    if not isinstance(data, StrColumn):
+        return node
+    test = value_test(node)
+    matched = {code for code, value in enumerate(data.dictionary)
+               if test(value)}
+    if len(matched) * 2 > len(data.dictionary):
+        rest = frozenset(range(len(data.dictionary))) - matched
+        return CodeSet(node.column, rest, True)
+    return CodeSet(node.column, frozenset(matched), False)
+
+
+def _spill(table: ColumnarTable, node) -> tuple:
+    """
+    Сбрасывает нужные условию столбцы во временный файл.
+    Возвращает описание источника для рабочих процессов.
+    """
+    import tempfile
+
+    layout = {}
+    with tempfile.NamedTemporaryFile(
+            "wb", suffix=".cols", prefix="primitive_db_", delete=False) as f:
+        for name in sorted(columns(node)):
+            data = table.columns[name]
+            if isinstance(data, StrColumn):
+                data = data.codes
+            f.write(b"\0" * (-f.tell() % 8))
+            layout[name] = (f.tell(), data.typecode, len(data))
+            data.tofile(f)
+    return ("columns", f.name, layout)
+
+
+@contextmanager
+def _open_columns(source):
+    """Открывает источник в рабочем процессе: функция имя -> столбец."""
+    if source[0] == "binary":
+        table = BinaryTable(source[1])
+        try:
+            yield table.column
+        finally:
+            table.close()
+        return
+
+    _, path, layout = source
+    with open(path, "rb") as f:
+        mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+    view = memoryview(mm)
+    opened = {}
+
+    def column(name: str):
+        if name not in opened:
+            offset, typecode, count = layout[name]
+            size = array(typecode).itemsize
+            opened[name] = view[offset:offset + count * size].cast(typecode)
+        return opened[name]
+
+    try:
+        yield column
+    finally:
+        for data in opened.values():
+            data.release()
+        view.release()
+        mm.close()
+
+
+def _evaluate(node, column, candidates):
+    """Позиции из candidates, для которых условие истинно."""
+    if isinstance(node, And):
+        for item in node.items:
+            if not candidates:
+                break
+            candidates = _evaluate(item, column, candidates)
+        return candidates
+    if isinstance(node, Or):
+        matched = set()
+        for item in node.items:
+            matched.update(_evaluate(item, column, candidates))
+        return sorted(matched)
+
+    if isinstance(node, CodeSet):
+        codes = node.codes
+        if node.negate:
+            def test(code):
+                return code not in codes
+        else:
+            test = codes.__contains__
+    else:
+        test = value_test(node)
+    data = column(node.column)
+    if isinstance(candidates, range) and isinstance(data, memoryview):
+        values = data[candidates.start:candidates.stop]
+        return list(compress(candidates, map(test, values)))
+    return [pos for pos in candidates if test(data[pos])]
+
+
+def _scan_chunk(source, node, start: int, stop: int) -> list[int]:
+    """Выполняется в рабочем процессе: проверяет строки start..stop."""
+    with _open_columns(source) as column:
+        return _evaluate(node, column, range(start, stop))
+
+
+def parallel_positions(table_data, node) -> list[int]:
+    """
+    Позиции строк, подходящих под условие, вычисленные несколькими
+    процессами. Результаты диапазонов склеиваются по порядку, поэтому
+    позиции (и ID) идут по возрастанию, как при обычном просмотре.
+    """
+    spilled = None
+    if isinstance(table_data, BinaryTable):
+        source = ("binary", os.fspath(table_data.path))
+    else:
+        node = _encode_strings(table_data, node)
+        source = spilled = _spill(table_data, node)
+    try:
+        executor = _executor()
+        ranges = chunk_ranges(
+            len(table_data), settings["workers"] * CHUNKS_PER_WORKER)
+        futures = [
+            executor.submit(_scan_chunk, source, node, r.start, r.stop)
+            for r in ranges
+        ]
+        positions = []
+        for future in futures:
+            positions.extend(future.result())
+        return positions
+    finally:
+        if spilled is not None:
+            os.remove(spilled[1])
@@ -1,20 +1,285 @@
 #!/usr/bin/env python3
 """Парсеры сложных функций."""
 
+import re
 import shlex
 
+from .predicates import COMPARE_OPS, And, Between, Compare, Contains, In, Like, Or
 
-def parse_set_where(tokens: list[str]) -> dict:
+# Форматы вывода результатов select.
+SELECT_FORMATS = ("table", "tsv", "jsonl")
+
+# Агрегатные функции select.
+AGGREGATE_FUNCS = ("count", "sum", "min", "max", "avg")
+
+# Служебные символы, которые не могут быть значением без кавычек.
+SYMBOLS = {"(", ")", ",", *COMPARE_OPS}
+
+# Токены команды: строка в кавычках, оператор/скобка/запятая, слово.
+TOKEN_RE = re.compile(
+    r'"((?:[^"\\]|\\.)*)"'
+    r"|'((?:[^'\\]|\\.)*)'"
+    r"|(<=|>=|!=|<>|[=<>(),])"
+    r"|([^\s<>=!(),\"']+)"
+    r"|(\S)"
+)
+
+
+class Quoted(str):
+    """Значение в кавычках: не считается ключевым словом или оператором."""
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Разбивает команду на токены. Операторы можно писать слитно
+    (age>=18), значения в кавычках возвращаются как Quoted.
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer(text):
+        double, single, op, word, bad = match.groups()
+        if double is not None or single is not None:
+            raw = double if double is not None else single
+            tokens.append(Quoted(re.sub(r"\\(.)", r"\1", raw)))
+        elif op:
+            tokens.append("!=" if op == "<>" else op)
+        elif word:
+            tokens.append(word)
+        elif bad in "\"'":
+            raise ValueError("Незакрытая кавычка.")
+        else:
+            raise ValueError(f"Неожиданный символ: {bad}")
+    return tokens
+
+
+def is_keyword(token, keyword: str) -> bool:
+    """Проверяет, что токен — ключевое слово (не в кавычках)."""
+    return (token is not None and not isinstance(token, Quoted)
+            and token.lower() == keyword)
+
+
+class _WhereParser:
+    """
+    Рекурсивный спуск по грамматике:
+        expr    := and_expr (OR and_expr)*
+        and_expr:= atom (AND atom)*
+        atom    := "(" expr ")" | col op value
+                 | col BETWEEN value AND value | col IN "(" value, ... ")"
+                 | col LIKE value | col CONTAINS value
+    """
+
+    def __init__(self, tokens: list[str]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError("Условие WHERE оборвано.")
+        self.pos += 1
+        return token
+
+    def expect(self, symbol: str) -> None:
+        token = self.take()
+        if isinstance(token, Quoted) or token.lower() != symbol:
+            raise ValueError(f"Ожидалось {symbol!r}, получено {token!r}.")
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Пустое условие WHERE.")
+        node = self.expr()
+        if self.peek() is not None:
+            raise ValueError(f"Неожиданный токен в WHERE: {self.peek()!r}.")
+        return node
+
+    def expr(self):
+        items = [self.and_expr()]
+        while is_keyword(self.peek(), "or"):
+            self.take()
+            items.append(self.and_expr())
+        return items[0] if len(items) == 1 else Or(tuple(items))
+
+    def and_expr(self):
+        items = [self.atom()]
+        while is_keyword(self.peek(), "and"):
+            self.take()
+            items.append(self.atom())
+        return items[0] if len(items) == 1 else And(tuple(items))
+
+    def value(self) -> str:
+        token = self.take()
+        if not isinstance(token, Quoted) and token in SYMBOLS:
+            raise ValueError(f"Ожидалось значение, получено {token!r}.")
+        return str(token)
+
+    def atom(self):
+        if is_keyword(self.peek(), "("):
+            self.take()
+            node = self.expr()
+            self.expect(")")
+            return node
+
+        column = self.value()
+        if is_keyword(self.peek(), "between"):
+            self.take()
+            low = self.value()
+            self.expect("and")
+            return Between(column, low, self.value())
+        if is_keyword(self.peek(), "in"):
+            self.take()
+            self.expect("(")
+            values = [self.value()]
+            while is_keyword(self.peek(), ","):
+                self.take()
+                values.append(self.value())
+            self.expect(")")
+            return In(column, tuple(values))
+        if is_keyword(self.peek(), "like"):
+            self.take()
+            return Like(column, self.value())
+        if is_keyword(self.peek(), "contains"):
+            self.take()
+            return Contains(column, self.value())
+
+        op = self.take()
+        if isinstance(op, Quoted) or op not in COMPARE_OPS:
+            raise ValueError(f"Неизвестный оператор сравнения: {op!r}.")
+        return Compare(column, op, self.value())
+
+
+def parse_where(tokens: list[str]):
+    """
+    Разбирает условие WHERE с операторами =, !=, <, <=, >, >=,
+    between ... and ..., in (...), like, contains, а также AND/OR
+    и скобками.
+    Возвращает дерево условия (см. predicates.py).
+    """
+    return _WhereParser(tokens).parse()
+
+
+def parse_assignments(tokens: list[str]) -> dict:
+    """Разбирает SET в формате col = value [, col = value ...]."""
+    assignments = {}
+    pos = 0
+    while pos < len(tokens):
+        if len(tokens) - pos < 3 or tokens[pos + 1] != "=":
+            raise ValueError("Некорректный синтаксис SET.")
+        assignments[str(tokens[pos])] = str(tokens[pos + 2])
+        pos += 3
+        if pos < len(tokens):
+            if not is_keyword(tokens[pos], ","):
+                raise ValueError("Присваивания в SET разделяются запятой.")
+            pos += 1
+    if not assignments:
+        raise ValueError("Некорректный синтаксис SET.")
+    return assignments
+
+
+def split_clauses(tokens: list[str], keywords) -> dict:
     """
-    Парсит условие SET/WHERE
-    в формате col = value.
+    Делит токены по ключевым словам (без учёта регистра).
+    Возвращает {ключевое_слово: токены_после_него}; токены
+    до первого ключевого слова лежат под ключом "".
     """
-    if len(tokens) < 3 or tokens[1] != "=":
-        print("Некорректный синтаксис SET.")
-        return {}
-    col, _, val = tokens
-    val = val.strip('"') if val.startswith('"') and val.endswith('"') else val
-    return {col: val}
+    keywords = {kw.lower() for kw in keywords}
+    clauses = {"": []}
+    current = ""
+    for token in tokens:
+        low = token.lower()
+        if (low in keywords and low not in clauses
+                and not isinstance(token, Quoted)):
+            current = low
+            clauses[current] = []
+        else:
+            clauses[current].append(token)
+    return clauses
+
+
+def parse_projection(tokens: list[str]) -> list[tuple]:
+    """
+    Разбирает список вывода select между select и from:
+    агрегаты func(столбец) или count(*) и столбцы группировки через запятую.
+    Возвращает [(функция, столбец)]; для столбца функция — None.
+    """
+    items = []
+    groups = [[]]
+    for token in tokens:
+        if token == "," and not isinstance(token, Quoted):
+            groups.append([])
+        else:
+            groups[-1].append(token)
+    for group in groups:
+        if (len(group) == 4 and group[1] == "(" and group[3] == ")"
+                and group[0].lower() in AGGREGATE_FUNCS):
+            func = group[0].lower()
+            if group[2] == "*" and func != "count":
+                raise ValueError(f"{func}(*) не поддерживается, укажите столбец.")
+            items.append((func, str(group[2])))
+        elif len(group) == 1 and group[0] not in SYMBOLS:
+            items.append((None, str(group[0])))
+        else:
+            raise ValueError(
+                f"Некорректное выражение в select: {' '.join(group) or ','}")
+    return items
+
+
+def parse_select(tokens: list[str]) -> dict:
+    """
+    Разбирает хвост команды select после имени таблицы:
+    [where <условие>] [group by <столбец>]
+    [order by <столбец>|<агрегат> [asc|desc]] [limit N] [offset M]
+    [format table|tsv|jsonl].
+    order_by — (функция, столбец, по убыванию); функция None — столбец.
+    """
+    clauses = split_clauses(
+        tokens, ("where", "group", "order", "limit", "offset", "format"))
+    if clauses[""]:
+        raise ValueError(f"Неожиданные токены: {' '.join(clauses[''])}")
+
+    group_by = None
+    if "group" in clauses:
+        group = clauses["group"]
+        if len(group) != 2 or not is_keyword(group[0], "by"):
+            raise ValueError("Синтаксис: group by <столбец>")
+        group_by = str(group[1])
+
+    order_by = None
+    if "order" in clauses:
+        order = clauses["order"]
+        descending = False
+        if order and (is_keyword(order[-1], "asc")
+                      or is_keyword(order[-1], "desc")):
+            descending = order[-1].lower() == "desc"
+            order = order[:-1]
+        if len(order) < 2 or not is_keyword(order[0], "by"):
+            raise ValueError("Синтаксис: order by <столбец> [asc|desc]")
+        items = parse_projection(order[1:])
+        if len(items) != 1 or items[0] == (None, "*"):
+            raise ValueError("ORDER BY сортирует по одному столбцу.")
+        order_by = (*items[0], descending)
+
+    def number(keyword: str):
+        if keyword not in clauses:
+            return None
+        value = clauses[keyword]
+        if len(value) != 1 or not value[0].isdigit():
+            raise ValueError(f"{keyword.upper()} ожидает неотрицательное число.")
+        return int(value[0])
+
+    fmt = clauses.get("format", ["table"])
+    if len(fmt) != 1 or fmt[0].lower() not in SELECT_FORMATS:
+        raise ValueError(
+            f"Формат вывода: {', '.join(SELECT_FORMATS)}")
+    return {
+        "where": parse_where(clauses["where"]) if "where" in clauses else None,
+        "group_by": group_by,
+        "order_by": order_by,
+        "limit": number("limit"),
+        "offset": number("offset") or 0,
+        "format": fmt[0].lower(),
+    }
 
 
 def parse_insert(values_str: str) -> list:
@@ -32,3 +297,56 @@ def parse_insert(values_str: str) -> list:
     # убираем лишние запятые, которые могли остаться после split
     values = [tok.rstrip(',') for tok in raw_values if tok != ","]
     return values
+
+
+def parse_insert_rows(values_str: str) -> list[list]:
+    """
+    Разбирает строку вида '(v1, v2), (v3, v4), ...'
+    и возвращает список строк значений.
+    Запятые, скобки и пробелы внутри кавычек сохраняются.
+    """
+    if not values_str.strip().startswith("("):
+        return [parse_insert(values_str)]
+
+    rows = []
+    current = None
+    token = []
+    has_token = False
+    quote = None
+
+    def finish_token():
+        nonlocal token, has_token
+        if has_token:
+            current.append("".join(token))
+        token = []
+        has_token = False
+
+    for ch in values_str:
+        if quote:
+            if ch == quote:
+                quote = None
+            else:
+                token.append(ch)
+        elif current is None:
+            if ch == "(":
+                current = []
+            elif not (ch.isspace() or ch == ","):
+                raise ValueError("Значения строки должны быть в скобках.")
+        elif ch in "\"'":
+            quote = ch
+            has_token = True
+        elif ch == ")":
+            finish_token()
+            rows.append(current)
+            current = None
+        elif ch == "," or ch.isspace():
+            finish_token()
+        elif ch == "(":
+            raise ValueError("Вложенные скобки не поддерживаются.")
+        else:
+            token.append(ch)
+            has_token = True
+
+    if quote or current is not None:
+        raise ValueError("Незакрытая кавычка или скобка в values.")
+    return rows
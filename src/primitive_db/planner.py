@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Планировщик запросов: выбор способа поиска строк по условию WHERE."""
+
+from heapq import merge
+
+from src.metrics import registry
+
+from . import parallel
+from .columnar import ColumnarTable
+from .predicates import (
+    RANGE_OPS,
+    TEXT_NODES,
+    And,
+    Between,
+    Compare,
+    Contains,
+    In,
+    Or,
+    compile_predicate,
+    conjuncts,
+    describe,
+    value_test,
+)
+from .stats import distinct
+from .utils import normalize_value
+
+# Доля строк, которую по умолчанию отбирает условие, пока нет индекса.
+DEFAULT_SELECTIVITY = {"lookup": 0.05, "range": 0.33, "text": 0.1,
+                       "!=": 0.95}
+# Текстовые индексы, которые может использовать условие, по предпочтению.
+TEXT_INDEX_ORDER = {"like": ("prefix", "trigram"), "contains": ("trigram",)}
+
+
+def range_bounds(node) -> tuple:
+    """Границы диапазона: (low, high, low_inclusive, high_inclusive)."""
+    if isinstance(node, Between):
+        return node.low, node.high, True, True
+    if node.op in (">", ">="):
+        return node.value, None, node.op == ">=", True
+    return None, node.value, True, node.op == "<="
+
+
+def access_kind(node) -> str | None:
+    """
+    Как условие может использовать индекс: "lookup", "range",
+    "text" (текстовый индекс) или никак.
+    """
+    if isinstance(node, TEXT_NODES):
+        return "text"
+    if isinstance(node, In) or (isinstance(node, Compare) and node.op == "="):
+        return "lookup"
+    if isinstance(node, Between) or (
+            isinstance(node, Compare) and node.op in RANGE_OPS):
+        return "range"
+    return None
+
+
+class Plan:
+    """
+    План выполнения условия.
+    kind — способ доступа: index_lookup, index_range, index_text,
+    index_union или full_scan; residual — остаточные условия
+    в порядке проверки.
+    После выполнения в scanned лежит число реально просмотренных строк.
+    """
+
+    def __init__(self, kind: str, estimate: float, table_data, access=None,
+                 index=None, residual=(), children=()):
+        self.kind = kind
+        self.estimate = estimate
+        self.table_data = table_data
+        self.access = access
+        self.index = index
+        self.residual = list(residual)
+        self.children = list(children)
+        self.scanned = 0
+
+    def explain(self, indent: int = 0) -> list[str]:
+        """Строки с описанием плана для команды explain."""
+        pad = "  " * indent
+        title = self.kind
+        if self.access is not None:
+            title += f" [{describe(self.access)}]"
+        lines = [f"{pad}{title} (оценка строк к просмотру: {self.estimate:.0f})"]
+        if self.residual:
+            lines.append(
+                f"{pad}  фильтр: "
+                + " -> ".join(describe(node) for node in self.residual))
+        for child in self.children:
+            lines.extend(child.explain(indent + 1))
+        return lines
+
+    def positions(self):
+        """Выполняет план и лениво выдаёт позиции подходящих строк."""
+        if self.kind == "index_union":
+            yield from self._union()
+            return
+
+        residual = self.residual
+        scanned = self.scanned
+        if self.kind == "index_lookup":
+            values = (self.access.values if isinstance(self.access, In)
+                      else (self.access.value,))
+            candidates = self.index.positions_for_keys(
+                self.index.present_keys(values))
+        elif self.kind == "index_range":
+            candidates = self.index.positions_for_keys(
+                self.index.range_keys(*range_bounds(self.access)))
+        elif self.kind == "index_text":
+            candidates = self.index.candidates(self.access)
+        else:
+            candidates, residual = self._scan()
+
+        table_data = self.table_data
+        try:
+            if not residual:
+                for pos in candidates:
+                    self.scanned += 1
+                    yield pos
+                return
+            test = compile_predicate(
+                residual[0] if len(residual) == 1 else And(tuple(residual)))
+            for pos in candidates:
+                self.scanned += 1
+                if test(table_data[pos]):
+                    yield pos
+        finally:
+            registry.incr("rows_scanned", self.scanned - scanned)
+
+    def _union(self):
+        """Объединение позиций из планов веток OR без повторов."""
+        seen = set()
+        try:
+            for pos in merge(*(child.positions() for child in self.children)):
+                if pos not in seen:
+                    seen.add(pos)
+                    yield pos
+        finally:
+            self.scanned = sum(child.scanned for child in self.children)
+
+    def _scan(self):
+        """
+        Полный просмотр. Большие столбцовые и бинарные таблицы
+        просматриваются параллельно (см. parallel.py). У столбцовой
+        таблицы первое условие по одному столбцу проверяется пакетно,
+        остальные — по отобранным строкам.
+        """
+        table_data = self.table_data
+        residual = self.residual
+        if residual and parallel.enabled(table_data):
+            node = residual[0] if len(residual) == 1 else And(tuple(residual))
+            selected = parallel.parallel_positions(table_data, node)
+            self.scanned += len(table_data) - len(selected)
+            return iter(selected), []
+        if (isinstance(table_data, ColumnarTable) and residual
+                and isinstance(residual[0], (Compare, Between, In,
+                                             *TEXT_NODES))):
+            first = residual[0]
+            selected = table_data.filter_by(first.column, value_test(first))
+            # Пакетное сканирование столбца просматривает все строки.
+            self.scanned += len(table_data) - len(selected)
+            return iter(selected), residual[1:]
+        return iter(range(len(table_data))), residual
+
+
+class Planner:
+    """
+    Выбирает план по оценкам стоимости: поиск по индексу,
+    диапазонный просмотр отсортированных ключей индекса, отбор
+    кандидатов текстовым индексом (если его создали) или полный
+    просмотр с самым избирательным условием первым. Пока индекс
+    не построен, оценки берутся из статистики таблицы (stats.py).
+    Без имени таблицы индексы не используются.
+    """
+
+    def __init__(self, table_data, table_name: str | None = None,
+                 indexes=None, stats: dict | None = None):
+        self.table_data = table_data
+        self.table_name = table_name
+        self.indexes = indexes if table_name is not None else None
+        self.rows = len(table_data)
+        self.columns = stats["columns"] if stats is not None else {}
+
+    def _built_index(self, column: str):
+        if self.indexes is None:
+            return None
+        return self.indexes.peek(self.table_name, self.table_data, column)
+
+    def _index(self, column: str):
+        return self.indexes.get(self.table_name, self.table_data, column)
+
+    def _text_index(self, node):
+        """Созданный текстовый индекс, который может отобрать строки node."""
+        if self.indexes is None:
+            return None
+        kinds = TEXT_INDEX_ORDER[
+            "contains" if isinstance(node, Contains) else "like"]
+        for kind in kinds:
+            index = self.indexes.text_index(
+                self.table_name, self.table_data, node.column, kind)
+            if index is not None and index.usable(node):
+                return index
+        return None
+
+    def estimate(self, node) -> float:
+        """Оценка числа строк, удовлетворяющих условию."""
+        if isinstance(node, And):
+            selectivity = 1.0
+            for item in node.items:
+                selectivity *= self.estimate(item) / max(self.rows, 1)
+            return selectivity * self.rows
+        if isinstance(node, Or):
+            return min(self.rows, sum(self.estimate(i) for i in node.items))
+
+        kind = access_kind(node)
+        if kind == "text":
+            index = self._text_index(node)
+            if index is not None:
+                return index.estimate(node)
+            return self.rows * DEFAULT_SELECTIVITY["text"]
+        index = self._built_index(node.column)
+        if kind is None:
+            # column != value
+            if index is not None:
+                return self.rows - len(index.lookup(node.value))
+            estimate = self._stats_estimate(node, kind)
+            if estimate is not None:
+                return estimate
+            return self.rows * DEFAULT_SELECTIVITY["!="]
+        if index is None:
+            estimate = self._stats_estimate(node, kind)
+            if estimate is not None:
+                return estimate
+            factor = DEFAULT_SELECTIVITY[kind]
+            if isinstance(node, In):
+                factor = min(1.0, factor * len(node.values))
+            return self.rows * factor
+        if kind == "lookup":
+            values = node.values if isinstance(node, In) else (node.value,)
+            keys = index.present_keys(values)
+        else:
+            keys = index.range_keys(*range_bounds(node))
+        return sum(len(index.buckets[key]) for key in keys)
+
+    def _stats_estimate(self, node, kind: str | None) -> float | None:
+        """
+        Оценка по статистике столбца: равенство — rows / число различных
+        значений, диапазон по числам — доля пересечения с [min, max].
+        """
+        column = self.columns.get(node.column)
+        if column is None or not self.rows:
+            return None
+        per_value = self.rows / max(1, distinct(column, self.rows))
+        if kind is None:
+            return self.rows - per_value
+        if kind == "lookup":
+            count = len(node.values) if isinstance(node, In) else 1
+            return min(self.rows, count * per_value)
+
+        low, high = column["min"], column["max"]
+        lo, hi, _, _ = range_bounds(node)
+        lo = low if lo is None else normalize_value(lo)
+        hi = high if hi is None else normalize_value(hi)
+        if not all(isinstance(v, int) and not isinstance(v, bool)
+                   for v in (low, high, lo, hi)):
+            return None
+        lo, hi = max(lo, low), min(hi, high)
+        if hi < lo:
+            return 0.0
+        return self.rows * (hi - lo + 1) / (high - low + 1)
+
+    def plan(self, node) -> Plan:
+        """Строит план для условия node (None — все строки)."""
+        if node is None:
+            return Plan("full_scan", self.rows, self.table_data)
+        parts = conjuncts(node)
+        estimates = {id(part): self.estimate(part) for part in parts}
+
+        def by_selectivity(items):
+            return sorted(items, key=lambda item: estimates[id(item)])
+
+        if self.indexes is not None:
+            if isinstance(node, Or):
+                children = [self.plan(item) for item in node.items]
+                if all(child.kind != "full_scan" for child in children):
+                    return Plan(
+                        "index_union",
+                        sum(child.estimate for child in children),
+                        self.table_data, children=children)
+
+            sargable = [part for part in parts if access_kind(part)
+                        and (access_kind(part) != "text"
+                             or self._text_index(part) is not None)]
+            if sargable:
+                best = min(sargable, key=lambda part: estimates[id(part)])
+                if estimates[id(best)] < self.rows or self.rows == 0:
+                    access = access_kind(best)
+                    rest = by_selectivity(
+                        [part for part in parts if part is not best])
+                    if access == "text":
+                        # Кандидатов текстового индекса проверяет само условие.
+                        return Plan(
+                            "index_text", estimates[id(best)],
+                            self.table_data, access=best,
+                            index=self._text_index(best),
+                            residual=[best, *rest])
+                    kind = ("index_lookup" if access == "lookup"
+                            else "index_range")
+                    return Plan(
+                        kind, estimates[id(best)], self.table_data,
+                        access=best, index=self._index(best.column),
+                        residual=rest)
+
+        return Plan("full_scan", self.rows, self.table_data,
+                    residual=by_selectivity(parts))
+
+
+def plan_query(table_data, where, table_name: str | None = None,
+               indexes=None, stats: dict | None = None) -> Plan:
+    """Строит план поиска строк по дереву условия where."""
+    return Planner(table_data, table_name, indexes, stats).plan(where)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""Условия WHERE: узлы дерева условия и их вычисление."""
+
+import re
+import sys
+from functools import lru_cache, partial
+from operator import eq, ge, gt, le, lt, ne
+from typing import NamedTuple
+
+from src.constants import COMMAND_CACHE_MAX_ENTRIES
+
+from .utils import normalize_value
+
+COMPARE_OPS = {"=": eq, "!=": ne, "<": lt, "<=": le, ">": gt, ">=": ge}
+RANGE_OPS = ("<", "<=", ">", ">=")
+# Оператор с переставленными аргументами: value < t равно t > value.
+SWAPPED_OPS = {"=": eq, "!=": ne, "<": gt, "<=": ge, ">": lt, ">=": le}
+
+
+# col_type заполняется функцией bind: значение уже приведено
+# к типу столбца, и проверка строки — одно сравнение.
+class Compare(NamedTuple):
+    """column <op> value, где op — один из COMPARE_OPS."""
+    column: str
+    op: str
+    value: object
+    col_type: str | None = None
+
+
+class Between(NamedTuple):
+    """column between low and high (границы включаются)."""
+    column: str
+    low: object
+    high: object
+    col_type: str | None = None
+
+
+class In(NamedTuple):
+    """column in (value, ...)."""
+    column: str
+    values: tuple
+    col_type: str | None = None
+
+
+class Like(NamedTuple):
+    """
+    column like pattern: % — любая последовательность символов,
+    _ — один символ. Регистр учитывается.
+    """
+    column: str
+    pattern: str
+    col_type: str | None = None
+
+
+class Contains(NamedTuple):
+    """column contains value: значение содержит подстроку value."""
+    column: str
+    value: str
+    col_type: str | None = None
+
+
+# Условия поиска по тексту: проверяются только у строковых значений.
+TEXT_NODES = (Like, Contains)
+
+
+class And(NamedTuple):
+    """Все условия истинны."""
+    items: tuple
+
+
+class Or(NamedTuple):
+    """Хотя бы одно условие истинно."""
+    items: tuple
+
+
+def from_dict(where: dict | None):
+    """Переводит условие старого вида {col: value} в дерево."""
+    if not where:
+        return None
+    items = tuple(Compare(col, "=", val) for col, val in where.items())
+    return items[0] if len(items) == 1 else And(items)
+
+
+def conjuncts(node) -> list:
+    """Раскладывает условие на части, соединённые AND."""
+    if isinstance(node, And):
+        return [part for item in node.items for part in conjuncts(item)]
+    return [node]
+
+
+def columns(node) -> set[str]:
+    """Столбцы, упомянутые в условии."""
+    if isinstance(node, (And, Or)):
+        return set().union(*(columns(item) for item in node.items))
+    return {node.column}
+
+
+def like_parts(pattern: str) -> list[str]:
+    """Непустые фрагменты шаблона like между символами % и _."""
+    return [part for part in re.split(r"[%_]", pattern) if part]
+
+
+def like_prefix(pattern: str) -> str:
+    """Начало шаблона like до первого символа % или _."""
+    return re.split(r"[%_]", pattern, maxsplit=1)[0]
+
+
+def prefix_end(prefix: str) -> str | None:
+    """
+    Наименьшая строка больше всех строк, начинающихся с prefix
+    (None, если такой нет).
+    """
+    if not prefix or ord(prefix[-1]) == sys.maxunicode:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+@lru_cache(maxsize=COMMAND_CACHE_MAX_ENTRIES)
+def like_regex(pattern: str) -> re.Pattern:
+    """Регулярное выражение шаблона like (для fullmatch)."""
+    return re.compile("".join(
+        ".*" if ch == "%" else "." if ch == "_" else re.escape(ch)
+        for ch in pattern), re.DOTALL)
+
+
+def describe(node) -> str:
+    """Текстовое представление условия."""
+    if isinstance(node, Compare):
+        return f"{node.column} {node.op} {node.value!r}"
+    if isinstance(node, Between):
+        return f"{node.column} between {node.low!r} and {node.high!r}"
+    if isinstance(node, In):
+        return f"{node.column} in ({', '.join(map(repr, node.values))})"
+    if isinstance(node, Like):
+        return f"{node.column} like {node.pattern!r}"
+    if isinstance(node, Contains):
+        return f"{node.column} contains {node.value!r}"
+    glue = " and " if isinstance(node, And) else " or "
+    return "(" + glue.join(describe(item) for item in node.items) + ")"
+
+
+def normalized_key(node):
+    """Хешируемый ключ условия с нормализованными значениями (для кэша)."""
+    if node is None:
+        return ()
+    if isinstance(node, Compare):
+        return ("cmp", node.column, node.op, normalize_value(node.value))
+    if isinstance(node, Between):
+        return ("between", node.column, normalize_value(node.low),
+                normalize_value(node.high))
+    if isinstance(node, In):
+        return ("in", node.column,
+                frozenset(normalize_value(v) for v in node.values))
+    if isinstance(node, Like):
+        return ("like", node.column, node.pattern)
+    if isinstance(node, Contains):
+        return ("contains", node.column, node.value)
+    kind = "and" if isinstance(node, And) else "or"
+    return (kind, frozenset(normalized_key(item) for item in node.items))
+
+
+def coerce_literal(value, col_type: str):
+    """
+    Приводит значение из условия к типу столбца.
+    Для str значение возвращается, только если normalize_value
+    оставляет его строкой: тогда сравнение строк без нормализации
+    даёт тот же результат. Иначе — ValueError.
+    """
+    if col_type == "int":
+        if isinstance(value, (int, str)):
+            return int(value)
+        raise ValueError(value)
+    normalized = normalize_value(value)
+    if col_type == "bool" and isinstance(normalized, bool):
+        return normalized
+    if col_type == "str" and isinstance(normalized, str):
+        return value
+    raise ValueError(value)
+
+
+def bind(node, types: dict):
+    """
+    Связывает условие со схемой {столбец: тип}: литералы приводятся
+    к типу столбца один раз. Условия, которые нельзя привести без
+    изменения смысла (диапазоны по str, неподходящие литералы),
+    остаются с общей проверкой через normalize_value.
+    Столбец, которого нет в схеме, — ошибка ValueError при любом
+    представлении таблицы (пустая схема — таблица не найдена,
+    об этом сообщит сама команда).
+    """
+    if node is None:
+        return None
+    if isinstance(node, (And, Or)):
+        return type(node)(tuple(bind(item, types) for item in node.items))
+    col_type = types.get(node.column)
+    if col_type is None:
+        if types:
+            raise ValueError(f"Столбец {node.column} не найден.")
+        return node
+    if isinstance(node, TEXT_NODES):
+        return node._replace(col_type=col_type) if col_type == "str" else node
+    try:
+        if isinstance(node, In):
+            values = tuple(coerce_literal(v, col_type) for v in node.values)
+            return node._replace(values=values, col_type=col_type)
+        if col_type == "str" and (isinstance(node, Between)
+                                  or node.op in RANGE_OPS):
+            return node
+        if isinstance(node, Between):
+            return node._replace(low=coerce_literal(node.low, col_type),
+                                 high=coerce_literal(node.high, col_type),
+                                 col_type=col_type)
+        return node._replace(value=coerce_literal(node.value, col_type),
+                             col_type=col_type)
+    except ValueError:
+        return node
+
+
+def _safe(op, left, right) -> bool:
+    """Сравнение, которое для несравнимых типов даёт False (кроме !=)."""
+    try:
+        return op(left, right)
+    except TypeError:
+        return op is ne
+
+
+def value_test(node):
+    """
+    Для условия по одному столбцу возвращает функцию value -> bool.
+    Связанное условие сравнивает значение как есть, остальные —
+    после normalize_value. Поиск по тексту сравнивает строки как есть.
+    """
+    if isinstance(node, Contains):
+        fragment = node.value
+        return lambda value: isinstance(value, str) and fragment in value
+    if isinstance(node, Like):
+        match = like_regex(node.pattern).fullmatch
+        return lambda value: (isinstance(value, str)
+                              and match(value) is not None)
+    if node.col_type is not None:
+        # Значение другого типа (старые данные) не подходит, а не
+        # роняет запрос: так же его пропускает диапазон по индексу.
+        if isinstance(node, Compare):
+            if node.op in RANGE_OPS:
+                return _guarded(COMPARE_OPS[node.op], node.value)
+            return partial(SWAPPED_OPS[node.op], node.value)
+        if isinstance(node, Between):
+            low, high = node.low, node.high
+
+            def bound_between(value):
+                try:
+                    return low <= value <= high
+                except TypeError:
+                    return False
+            return bound_between
+        return frozenset(node.values).__contains__
+    if isinstance(node, Compare):
+        op = COMPARE_OPS[node.op]
+        target = normalize_value(node.value)
+        return lambda value: _safe(op, normalize_value(value), target)
+    if isinstance(node, Between):
+        low = normalize_value(node.low)
+        high = normalize_value(node.high)
+
+        def between(value):
+            value = normalize_value(value)
+            return _safe(le, low, value) and _safe(le, value, high)
+        return between
+    if isinstance(node, In):
+        targets = {normalize_value(v) for v in node.values}
+        return lambda value: normalize_value(value) in targets
+    raise ValueError(f"Условие не относится к одному столбцу: {describe(node)}")
+
+
+def _guarded(op, target):
+    """value -> op(value, target); для несравнимых типов — False."""
+    def test(value):
+        try:
+            return op(value, target)
+        except TypeError:
+            return False
+    return test
+
+
+def _range_row_test(op):
+    """Проверка строки для связанного <, <=, >, >= без TypeError."""
+    def factory(column, target):
+        def test(row):
+            try:
+                return op(row[column], target)
+            except TypeError:
+                return False
+        return test
+    return factory
+
+
+# Проверки строки для связанных сравнений: одно сравнение на строку.
+_ROW_TESTS = {
+    "=": lambda column, target: lambda row: row[column] == target,
+    "!=": lambda column, target: lambda row: row[column] != target,
+    "<": _range_row_test(lt),
+    "<=": _range_row_test(le),
+    ">": _range_row_test(gt),
+    ">=": _range_row_test(ge),
+}
+
+
+def _chain(tests: list, conjunction: bool):
+    """Соединяет проверки в цепочку and/or без генератора на каждую строку."""
+    first = tests[0]
+    if len(tests) == 1:
+        return first
+    rest = _chain(tests[1:], conjunction)
+    if conjunction:
+        return lambda row: first(row) and rest(row)
+    return lambda row: first(row) or rest(row)
+
+
+@lru_cache(maxsize=COMMAND_CACHE_MAX_ENTRIES)
+def compile_predicate(node):
+    """Компилирует условие в функцию row -> bool (с кэшированием)."""
+    if isinstance(node, (And, Or)):
+        tests = [compile_predicate(item) for item in node.items]
+        return _chain(tests, isinstance(node, And))
+    column = node.column
+    if isinstance(node, Compare) and node.col_type is not None:
+        return _ROW_TESTS[node.op](column, node.value)
+    test = value_test(node)
+    if node.col_type is not None:
+        return lambda row: test(row[column])
+    return lambda row: test(row.get(column))
+
+
+def may_match(node, zones: dict) -> bool:
+    """
+    Могут ли строки с зональной картой {столбец: [min, max]} подойти
+    под условие. Без карты столбца, для !=, contains и несвязанных
+    со схемой условий — да. Для like проверяется начало шаблона.
+    """
+    if node is None:
+        return True
+    if isinstance(node, And):
+        return all(may_match(item, zones) for item in node.items)
+    if isinstance(node, Or):
+        return any(may_match(item, zones) for item in node.items)
+    zone = zones.get(node.column)
+    if zone is None or node.col_type is None:
+        return True
+    low, high = zone
+    try:
+        if isinstance(node, Contains):
+            return True
+        if isinstance(node, Like):
+            prefix = like_prefix(node.pattern)
+            end = prefix_end(prefix)
+            return high >= prefix and (end is None or low < end)
+        if isinstance(node, In):
+            return any(low <= value <= high for value in node.values)
+        if isinstance(node, Between):
+            return node.low <= high and low <= node.high
+        op, value = node.op, node.value
+        if op == "=":
+            return low <= value <= high
+        if op in ("<", "<="):
+            return low < value or (op == "<=" and low == value)
+        if op in (">", ">="):
+            return high > value or (op == ">=" and high == value)
+    except TypeError:
+        pass
+    return True
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Сегментированный формат таблиц: каталог data/<table>.seg/.
+
+Строки делятся на сегменты по диапазонам ID: сегмент n хранит строки
+с ID от n * segment_rows + 1 до (n + 1) * segment_rows в файле <n>.json.
+Манифест manifest.json хранит размер сегмента и для каждого сегмента
+число строк и зональную карту — min/max значений каждого столбца.
+Изменения переписывают только затронутые сегменты, а select читает
+только сегменты, которые условие WHERE не исключает по зональным картам.
+
+Строки таблицы в памяти упорядочены по ID: ID выдаются по возрастанию,
+вставка дописывает строки в конец, а удаление сохраняет порядок.
+"""
+
+import json
+import os
+import shutil
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+from src.constants import DATA_DIR, SEGMENT_ROWS
+from src.metrics import registry
+
+from .durable import atomic_write, sync, sync_dir
+
+SEGMENTS_SUFFIX = ".seg"
+MANIFEST_FILE = "manifest.json"
+
+
+def segments_dir(table_name: str):
+    """Каталог сегментов таблицы."""
+    return DATA_DIR / f"{table_name}{SEGMENTS_SUFFIX}"
+
+
+def segment_path(table_name: str, number: int, directory=None):
+    """Путь к файлу сегмента number."""
+    return (directory or segments_dir(table_name)) / f"{number}.json"
+
+
+def read_manifest(table_name: str) -> dict:
+    """
+    Манифест таблицы: {"segment_rows": N, "segments": {n: {"rows", "zones"}}}.
+    Без файла манифеста возвращается пустой с размером SEGMENT_ROWS.
+    """
+    try:
+        with open(segments_dir(table_name) / MANIFEST_FILE, "r",
+                  encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {"segment_rows": SEGMENT_ROWS, "segments": {}}
+    manifest["segments"] = {int(number): entry for number, entry
+                            in manifest["segments"].items()}
+    return manifest
+
+
+def write_manifest(table_name: str, manifest: dict, directory=None) -> None:
+    """Сохраняет манифест (атомарно)."""
+    path = (directory or segments_dir(table_name)) / MANIFEST_FILE
+    with atomic_write(path) as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+        registry.incr("bytes_written", f.tell())
+
+
+def segment_numbers(table_name: str) -> list[int]:
+    """Номера сегментов, файлы которых лежат на диске, по возрастанию."""
+    try:
+        names = os.listdir(segments_dir(table_name))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-5]) for name in names
+                  if name.endswith(".json") and name[:-5].isdigit())
+
+
+def id_zone(number: int, size: int) -> list[int]:
+    """Диапазон ID сегмента number."""
+    return [number * size + 1, (number + 1) * size]
+
+
+def zone_map(rows: list[dict]) -> dict:
+    """
+    Зональная карта строк: {столбец: [min, max]} без учёта NULL.
+    Столбцы с несравнимыми значениями и ID (его диапазон задан
+    номером сегмента) в карту не попадают.
+    """
+    zones = {}
+    for name in rows[0] if rows else ():
+        if name == "ID":
+            continue
+        values = [row.get(name) for row in rows]
+        present = [v for v in values if v is not None]
+        if not present:
+            continue
+        try:
+            zones[name] = [min(present), max(present)]
+        except TypeError:
+            continue
+    return zones
+
+
+def segment_zones(table_name: str, manifest: dict) -> dict:
+    """
+    Зональные карты сегментов, лежащих на диске, вместе с диапазоном ID.
+    Для сегментов без записи в манифесте (сбой между записью файла
+    и манифеста) — None: их нужно читать всегда.
+    """
+    size = manifest["segment_rows"]
+    zones = {}
+    for number in segment_numbers(table_name):
+        entry = manifest["segments"].get(number)
+        zones[number] = None if entry is None else {
+            "ID": id_zone(number, size), **entry["zones"]}
+    return zones
+
+
+def read_segment(table_name: str, number: int) -> list[dict]:
+    """Читает строки сегмента (пустой список, если файла нет)."""
+    try:
+        with open(segment_path(table_name, number), "r",
+                  encoding="utf-8") as f:
+            registry.incr("bytes_read", os.fstat(f.fileno()).st_size)
+            rows = json.load(f)
+    except FileNotFoundError:
+        return []
+    registry.incr("segments_read")
+    return rows
+
+
+def load_segments(table_name: str, loaded: dict | None = None) -> list[dict]:
+    """Все строки таблицы; уже прочитанные сегменты берутся из loaded."""
+    loaded = loaded or {}
+    rows = []
+    for number in segment_numbers(table_name):
+        segment = loaded.get(number)
+        rows.extend(segment if segment is not None
+                    else read_segment(table_name, number))
+    return rows
+
+
+def segment_rows(table_data, number: int, size: int) -> list[dict]:
+    """Строки сегмента number из таблицы в памяти (двоичный поиск по ID)."""
+    low, high = id_zone(number, size)
+    if isinstance(table_data, list):
+        key = itemgetter("ID")
+        start = bisect_left(table_data, low, key=key)
+        end = bisect_right(table_data, high, key=key)
+        return table_data[start:end]
+    ids = table_data.columns["ID"]
+    start, end = bisect_left(ids, low), bisect_right(ids, high)
+    return [table_data[pos] for pos in range(start, end)]
+
+
+def touched_segments(records: list[dict], size: int) -> set[int]:
+    """Номера сегментов, строки которых меняют записи журнала."""
+    ids = []
+    for record in records:
+        if record["op"] == "insert":
+            ids.append(record["row"]["ID"])
+        elif record["op"] == "insert_many":
+            ids.extend(row["ID"] for row in record["rows"])
+        else:
+            ids.extend(record["ids"])
+    return {(row_id - 1) // size for row_id in ids}
+
+
+def _covers(old: dict | None, new: dict) -> bool:
+    """Покрывает ли зональная карта old значения карты new."""
+    if old is None:
+        return False
+    try:
+        return all(name in new and low <= new[name][0]
+                   and new[name][1] <= high
+                   for name, (low, high) in old.items())
+    except TypeError:
+        return False
+
+
+def _union(old: dict, new: dict) -> dict:
+    """Карта, покрывающая обе: общие столбцы с объединёнными границами."""
+    zones = {}
+    for name in old.keys() & new.keys():
+        try:
+            zones[name] = [min(old[name][0], new[name][0]),
+                           max(old[name][1], new[name][1])]
+        except TypeError:
+            continue
+    return zones
+
+
+def _write_segment(path, rows: list[dict]) -> None:
+    with atomic_write(path) as f:
+        json.dump(rows, f, ensure_ascii=False, indent=4)
+        registry.incr("bytes_written", f.tell())
+    registry.incr("segments_written")
+
+
+def save_segments(table_name: str, table_data, records: list[dict]) -> None:
+    """Переписывает сегменты, строки которых меняют записи records."""
+    manifest = read_manifest(table_name)
+    numbers = touched_segments(records, manifest["segment_rows"])
+    _rewrite(table_name, table_data, numbers, manifest)
+
+
+def _rewrite(table_name: str, table_data, numbers, manifest: dict) -> None:
+    """
+    Переписывает сегменты numbers и манифест. Если зональная карта
+    сегмента расширилась, манифест сначала сохраняется с объединёнными
+    границами: при сбое карта на диске покрывает обе версии сегмента.
+    """
+    size = manifest["segment_rows"]
+    entries = manifest["segments"]
+    changes = {}
+    for number in sorted(numbers):
+        rows = segment_rows(table_data, number, size)
+        changes[number] = (rows, zone_map(rows))
+
+    widened = {number: {"rows": entries[number]["rows"],
+                        "zones": _union(entries[number]["zones"], zones)}
+               for number, (rows, zones) in changes.items()
+               if number in entries and rows
+               and not _covers(entries[number]["zones"], zones)}
+    if widened:
+        entries.update(widened)
+        write_manifest(table_name, manifest)
+
+    for number, (rows, zones) in changes.items():
+        path = segment_path(table_name, number)
+        if rows:
+            _write_segment(path, rows)
+            entries[number] = {"rows": len(rows), "zones": zones}
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            entries.pop(number, None)
+    write_manifest(table_name, manifest)
+
+
+def write_all_segments(table_name: str, rows) -> None:
+    """
+    Записывает таблицу целиком. Новый каталог собирается рядом
+    и переименовывается, существующий переписывается посегментно.
+    """
+    if not isinstance(rows, list):
+        rows = list(rows)
+    directory = segments_dir(table_name)
+    if directory.exists():
+        manifest = read_manifest(table_name)
+        size = manifest["segment_rows"]
+        numbers = set(segment_numbers(table_name))
+        numbers.update((row["ID"] - 1) // size for row in rows)
+        _rewrite(table_name, rows, numbers, manifest)
+        return
+
+    tmp = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    segments = {}
+    for row in rows:
+        segments.setdefault((row["ID"] - 1) // SEGMENT_ROWS, []).append(row)
+    entries = {}
+    for number, segment in segments.items():
+        with open(segment_path(table_name, number, tmp), "w",
+                  encoding="utf-8") as f:
+            json.dump(segment, f, ensure_ascii=False, indent=4)
+            registry.incr("bytes_written", f.tell())
+            sync(f)
+        registry.incr("segments_written")
+        entries[number] = {"rows": len(segment), "zones": zone_map(segment)}
+    write_manifest(table_name, {"segment_rows": SEGMENT_ROWS,
+                                "segments": entries}, tmp)
+    os.replace(tmp, directory)
+    sync_dir(directory.parent)
+
+
+def remove_segments(table_name: str) -> None:
+    """Удаляет каталог сегментов таблицы."""
+    directory = segments_dir(table_name)
+    shutil.rmtree(directory.with_name(directory.name + ".tmp"),
+                  ignore_errors=True)
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Режим сервера: один процесс держит таблицы в памяти и выполняет
+команды клиентов, подключённых по Unix-сокету или TCP на localhost.
+
+Протокол строковый: клиент посылает команду одной строкой в UTF-8
+(та же грамматика, что и в REPL). Ответ — строка заголовка
+"OK <длина>" или "ERR <длина>" и затем <длина> байт вывода команды.
+После команды exit сервер закрывает соединение.
+
+Команды выполняются в пуле потоков. Запросы к одной таблице читают
+её одновременно, а изменения таблицы выполняются по одному.
+Команды, меняющие схему или затрагивающие все таблицы, выполняются
+монопольно. Изменения сохраняются на диск до ответа клиенту
+групповой фиксацией: сброс ждёт commit_window секунд и сохраняет
+одной записью все изменения, накопленные к его началу.
+"""
+
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from src.constants import GROUP_COMMIT_WINDOW, SERVER_LINE_LIMIT, SERVER_THREADS
+
+from .client import parse_address
+from .engine import connect, disconnect, execute
+from .parser import is_keyword, tokenize
+from .tables import TableManager
+
+# Команды, меняющие одну таблицу (select, explain и info её читают),
+# и команды, которые выполняются монопольно.
+WRITE_COMMANDS = ("insert", "update", "delete")
+EXCLUSIVE_COMMANDS = ("create_table", "drop_table", "create_index", "load",
+                      "convert", "commit", "sync", "profile")
+
+
+def command_target(user_input: str) -> tuple[tuple[str, ...], str]:
+    """
+    Таблицы команды и нужный доступ: "read", "write" или "exclusive".
+    Команды без таблицы (help, list_tables, stats) — "read" без таблиц,
+    select с join читает обе таблицы.
+    """
+    try:
+        tokens = tokenize(user_input)
+    except ValueError:
+        return (), "read"
+    if not tokens:
+        return (), "read"
+    command = tokens[0].lower()
+    if command == "explain":
+        tables, _ = command_target(user_input.split(maxsplit=1)[1]
+                                   if len(tokens) > 1 else "")
+        return tables, "read"
+    if command in EXCLUSIVE_COMMANDS:
+        return (), "exclusive"
+
+    position = {"update": 1, "insert": 2, "info": 1, "export": 1}.get(command)
+    if command in ("select", "delete"):
+        position = next((i + 1 for i, token in enumerate(tokens)
+                         if is_keyword(token, "from")), None)
+    if position is None or position >= len(tokens):
+        return (), "read"
+    mode = "write" if command in WRITE_COMMANDS else "read"
+    if (command == "select" and position + 2 < len(tokens)
+            and is_keyword(tokens[position + 1], "join")):
+        return (str(tokens[position]), str(tokens[position + 2])), mode
+    return (str(tokens[position]),), mode
+
+
+class RWLock:
+    """
+    Блокировка «читатели — писатель» для корутин.
+    Ожидающий писатель не пропускает новых читателей вперёд себя.
+    """
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @asynccontextmanager
+    async def read(self):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._condition:
+            self._waiting_writers += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: not self._writer and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class _Output(threading.local):
+    """
+    Подменяет sys.stdout: вывод команды, выполняемой в потоке сервера,
+    попадает в буфер этой команды, остальной — в исходный поток.
+    """
+
+    buffer = None
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        target = self.buffer if self.buffer is not None else self.stream
+        return target.write(text)
+
+    def flush(self) -> None:
+        if self.buffer is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Server:
+    """Общий движок для всех клиентов сервера."""
+
+    def __init__(self, tables: TableManager | None = None,
+                 threads: int = SERVER_THREADS):
+        self.tables = tables or TableManager(flush_policy="exit")
+        self.executor = ThreadPoolExecutor(
+            max(1, threads), thread_name_prefix="primitive_db")
+        # Общая блокировка: команды одной таблицы берут её на чтение,
+        # монопольные команды и сброс на диск — на запись.
+        self.lock = RWLock()
+        self.table_locks: dict[str, RWLock] = {}
+        self._flush_task = None
+        self._output = None
+
+    def _table_lock(self, table_name: str) -> RWLock:
+        lock = self.table_locks.get(table_name)
+        if lock is None:
+            lock = self.table_locks[table_name] = RWLock()
+        return lock
+
+    async def _locked(self, stack: AsyncExitStack, user_input: str) -> None:
+        tables, mode = command_target(user_input)
+        if mode == "exclusive":
+            await stack.enter_async_context(self.lock.write())
+            return
+        await stack.enter_async_context(self.lock.read())
+        # Блокировки таблиц берутся в одном порядке, чтобы не было взаимных.
+        for table_name in sorted(set(tables)):
+            table_lock = self._table_lock(table_name)
+            await stack.enter_async_context(
+                table_lock.write() if mode == "write" else table_lock.read())
+
+    def _execute(self, user_input: str) -> tuple[bool, bool, str]:
+        """Выполняется в потоке: (успех, продолжать ли сеанс, вывод)."""
+        buffer = io.StringIO()
+        self._output.buffer = buffer
+        ok, keep = True, True
+        try:
+            keep = execute(self.tables, user_input)
+        except Exception as e:
+            ok = False
+            print(f"Произошла ошибка: {e}")
+        finally:
+            self._output.buffer = None
+        return ok, keep, buffer.getvalue()
+
+    async def run(self, user_input: str) -> tuple[bool, bool, str]:
+        """Выполняет команду под блокировками и сохраняет изменения."""
+        loop = asyncio.get_running_loop()
+        async with AsyncExitStack() as stack:
+            await self._locked(stack, user_input)
+            result = await loop.run_in_executor(
+                self.executor, self._execute, user_input)
+        if self.tables.has_changes():
+            await self.commit()
+        return result
+
+    async def commit(self) -> None:
+        """Дожидается сброса изменений; ожидающие делят один сброс."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        await asyncio.shield(self._flush_task)
+
+    async def _flush(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.tables.commit_window:
+            await asyncio.sleep(self.tables.commit_window)
+        async with self.lock.write():
+            # Изменения, сделанные после этого момента, ждут нового сброса.
+            self._flush_task = None
+            await loop.run_in_executor(self.executor, self.tables.flush)
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        """Обслуживает одно соединение клиента."""
+        try:
+            while line := await reader.readline():
+                user_input = line.decode("utf-8").strip()
+                ok, keep, output = True, True, ""
+                if user_input:
+                    ok, keep, output = await self.run(user_input)
+                body = output.encode("utf-8")
+                status = "OK" if ok else "ERR"
+                writer.write(f"{status} {len(body)}\n".encode() + body)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, ValueError):
+            # Клиент отключился или прислал слишком длинную строку.
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, address: str, ready=None) -> None:
+        """Принимает соединения по адресу, пока задача не будет отменена."""
+        kind, *location = parse_address(address)
+        if kind == "unix":
+            if os.path.exists(location[0]):
+                os.remove(location[0])
+            server = await asyncio.start_unix_server(
+                self.handle, location[0], limit=SERVER_LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(
+                self.handle, *location, limit=SERVER_LINE_LIMIT)
+        self._output = _Output(sys.stdout)
+        sys.stdout = self._output
+        try:
+            async with server:
+                if ready is not None:
+                    ready()
+                await server.serve_forever()
+        finally:
+            sys.stdout = self._output.stream
+            if kind == "unix" and os.path.exists(location[0]):
+                os.remove(location[0])
+
+
+def serve(address: str, tables: TableManager | None = None,
+          threads: int = SERVER_THREADS,
+          commit_window: float = GROUP_COMMIT_WINDOW) -> None:
+    """Запускает сервер и работает до Ctrl+C."""
+    tables = tables or TableManager(
+        flush_policy="exit", commit_window=commit_window)
+    server = Server(tables, threads)
+    connect(server.tables)
+    try:
+        asyncio.run(server.serve(
+            address, ready=lambda: print(f"Сервер слушает {address}",
+                                         flush=True)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown()
+        disconnect(server.tables)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Сортировка результатов select (order by).
+
+С limit k строки отбираются ограниченной кучей за O(n log k).
+Результат до SORT_MEMORY_ROWS строк сортируется в памяти, больший —
+частями: каждая часть сортируется и сбрасывается во временный файл
+JSON Lines, а затем части сливаются k-путевым слиянием.
+Сортировка устойчива: равные значения идут в исходном порядке.
+NULL при возрастании идут первыми, при убывании — последними.
+"""
+
+from heapq import merge, nlargest, nsmallest
+from itertools import islice
+
+from src.constants import SORT_MEMORY_ROWS
+from src.metrics import registry
+
+
+def value_key(value) -> tuple:
+    """
+    Ключ сравнения значения: NULL меньше любого значения. Значения
+    разных типов не сравниваются между собой: числа идут перед
+    строками, прочее — после, по str().
+    """
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, str(value))
+
+
+def sort_key(column: str):
+    """Ключ сортировки строк по столбцу (см. value_key)."""
+    def key(row):
+        return value_key(row.get(column))
+    return key
+
+
+def sort_rows(rows, column: str, descending: bool = False,
+              limit: int | None = None,
+              memory_rows: int = SORT_MEMORY_ROWS):
+    """
+    Лениво выдаёт строки rows, отсортированные по столбцу column.
+    limit — сколько первых строк нужно (None — все).
+    """
+    key = sort_key(column)
+    if limit is not None and limit <= memory_rows:
+        pick = nlargest if descending else nsmallest
+        return iter(pick(limit, rows, key=key))
+
+    rows = iter(rows)
+    chunk = list(islice(rows, memory_rows + 1))
+    if len(chunk) <= memory_rows:
+        chunk.sort(key=key, reverse=descending)
+        return iter(chunk)
+    return _external_sort(chunk, rows, key, descending, memory_rows)
+
+
+def _spill(run: list):
+    """Записывает отсортированную часть во временный файл."""
+    import json
+    import tempfile
+
+    f = tempfile.TemporaryFile("w+", encoding="utf-8",
+                               prefix="primitive_db_sort_")
+    for row in run:
+        f.write(json.dumps(row, ensure_ascii=False))
+        f.write("\n")
+    f.seek(0)
+    registry.incr("sort_runs_spilled")
+    return f
+
+
+def _read_run(f):
+    import json
+
+    return map(json.loads, f)
+
+
+def _external_sort(first: list, rows, key, descending: bool,
+                   memory_rows: int):
+    """
+    Внешняя сортировка: части по memory_rows строк сортируются
+    и сбрасываются на диск, затем сливаются. Файлы удаляются,
+    когда результат прочитан (или генератор закрыт).
+    """
+    files = []
+    try:
+        run = first
+        while run:
+            run.sort(key=key, reverse=descending)
+            files.append(_spill(run))
+            run = list(islice(rows, memory_rows))
+        yield from merge(*(_read_run(f) for f in files),
+                         key=key, reverse=descending)
+    finally:
+        for f in files:
+            f.close()
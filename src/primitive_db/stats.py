@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Статистика таблиц: число строк и сводка по каждому столбцу —
+границы min/max, сумма числовых значений, число NULL и число
+различных значений (точное, пока их немного, затем оценка
+HyperLogLog). Статистика обновляется инкрементально при insert,
+update и delete.
+"""
+
+from math import log
+from zlib import crc32
+
+from .columnar import column_values
+
+# HyperLogLog: 2**HLL_BITS регистров, погрешность оценки около 13%.
+HLL_BITS = 6
+HLL_REGISTERS = 1 << HLL_BITS
+HLL_ALPHA = 0.709
+_RANK_BITS = 32 - HLL_BITS
+# Пока различных значений не больше стольких, для каждого хеша
+# значения хранится число строк с ним и число различных значений
+# точное (в том числе после update и delete): на малых числах
+# оценка по 64 регистрам ошибается из-за совпадения регистров.
+DISTINCT_EXACT_LIMIT = 256
+
+
+def _hash(value) -> int:
+    """32-битный хеш значения для HyperLogLog и точного подсчёта."""
+    return (crc32(str(value).encode()) * 0x9E3779B1) & 0xFFFFFFFF
+
+
+def _hll_add(registers: list[int], hashes) -> None:
+    """Добавляет хеши значений в регистры HyperLogLog."""
+    for h in hashes:
+        index = h >> _RANK_BITS
+        rank = _RANK_BITS - (h & ((1 << _RANK_BITS) - 1)).bit_length() + 1
+        if rank > registers[index]:
+            registers[index] = rank
+
+
+def hll_estimate(registers: list[int]) -> int:
+    """Оценка числа различных значений по регистрам."""
+    estimate = HLL_ALPHA * HLL_REGISTERS ** 2 / sum(
+        2.0 ** -r for r in registers)
+    zeros = registers.count(0)
+    if estimate <= 2.5 * HLL_REGISTERS and zeros:
+        estimate = HLL_REGISTERS * log(HLL_REGISTERS / zeros)
+    return round(estimate)
+
+
+def new_column_stats(name: str, col_type: str) -> dict:
+    """Пустая статистика столбца."""
+    return {
+        "min": None,
+        "max": None,
+        # False — после удаления граничного значения min/max стали
+        # лишь оценкой диапазона, а не точными значениями.
+        "exact": True,
+        "nulls": 0,
+        "sum": 0 if col_type in ("int", "bool") else None,
+        # ID уникален, различных значений столько же, сколько строк.
+        "hll": None if name == "ID" else [0] * HLL_REGISTERS,
+        # Хеш значения -> число строк с ним; None — различных значений
+        # больше DISTINCT_EXACT_LIMIT.
+        "counts": None if name == "ID" else {},
+    }
+
+
+def _add_values(stats: dict, values: list) -> None:
+    """Учитывает добавленные значения столбца."""
+    nulls = values.count(None)
+    present = [v for v in values if v is not None] if nulls else values
+    stats["nulls"] += nulls
+    if not present:
+        return
+    try:
+        if stats["sum"] is not None:
+            stats["sum"] += sum(present)
+        low, high = min(present), max(present)
+        if stats["min"] is None or low < stats["min"]:
+            stats["min"] = low
+        if stats["max"] is None or high > stats["max"]:
+            stats["max"] = high
+    except TypeError:
+        # Значение не того типа: сумма и границы больше не надёжны.
+        stats["sum"] = None
+        stats["exact"] = False
+    if stats["hll"] is not None:
+        hashes = [_hash(value) for value in present]
+        _hll_add(stats["hll"], set(hashes))
+        counts = stats.get("counts")
+        if counts is not None:
+            # Ключи — строки: так словарь одинаков в памяти и в JSON.
+            for key in map(str, hashes):
+                counts[key] = counts.get(key, 0) + 1
+            if len(counts) > DISTINCT_EXACT_LIMIT:
+                stats["counts"] = None
+
+
+def _remove_values(stats: dict, values: list) -> None:
+    """Учитывает удалённые значения столбца."""
+    nulls = values.count(None)
+    present = [v for v in values if v is not None] if nulls else values
+    stats["nulls"] -= nulls
+    if stats["sum"] is not None:
+        try:
+            stats["sum"] -= sum(present)
+        except TypeError:
+            stats["sum"] = None
+    if stats["min"] in present or stats["max"] in present:
+        stats["exact"] = False
+    counts = stats.get("counts")
+    if counts is not None:
+        for key in map(str, map(_hash, present)):
+            left = counts.get(key, 0) - 1
+            if left > 0:
+                counts[key] = left
+            else:
+                counts.pop(key, None)
+
+
+def distinct(stats: dict, rows: int) -> int:
+    """Оценка числа различных значений столбца."""
+    present = rows - stats["nulls"]
+    if stats["hll"] is None:
+        return present
+    if stats.get("counts") is not None:
+        return min(len(stats["counts"]), present)
+    return min(hll_estimate(stats["hll"]), present)
+
+
+class StatsManager:
+    """
+    Статистика таблиц в общем хранилище состояния таблиц:
+    store[table] = {"rows": ..., "columns": {столбец: {...}}}.
+    TableManager подключает сюда содержимое db_stats.json (attach),
+    без него статистика живёт только в памяти.
+    """
+
+    def __init__(self):
+        self.store: dict = {}
+        self.on_change = None
+
+    def attach(self, store: dict, on_change=None) -> None:
+        """Подключает хранилище и функцию, вызываемую при изменениях."""
+        self.store = store
+        self.on_change = on_change
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change()
+
+    def get(self, table_name: str) -> dict | None:
+        """Статистика таблицы или None, если она ещё не собрана."""
+        state = self.store.get(table_name)
+        if state is None or "columns" not in state:
+            return None
+        return state
+
+    def init(self, table_name: str, schema) -> dict:
+        """Пустая статистика новой таблицы."""
+        state = self.store.setdefault(table_name, {})
+        state["rows"] = 0
+        state["columns"] = {
+            name: new_column_stats(name, col_type) for name, col_type in schema
+        }
+        self._changed()
+        return state
+
+    def ensure(self, table_name: str, schema, table_data) -> dict:
+        """Возвращает статистику, при необходимости собирая её по данным."""
+        state = self.get(table_name)
+        if state is None:
+            state = self.init(table_name, schema)
+            state["rows"] = len(table_data)
+            for name, stats in state["columns"].items():
+                _add_values(stats, list(column_values(table_data, name)))
+        return state
+
+    def reset(self, table_name: str) -> None:
+        """Сбрасывает статистику (она будет собрана заново по данным)."""
+        state = self.store.get(table_name)
+        if state is not None and "columns" in state:
+            del state["rows"], state["columns"]
+            self._changed()
+
+    def on_insert(self, table_name: str, rows: list[dict]) -> None:
+        """Учитывает добавленные строки."""
+        state = self.get(table_name)
+        if state is None or not rows:
+            return
+        state["rows"] += len(rows)
+        for name, stats in state["columns"].items():
+            _add_values(stats, [row.get(name) for row in rows])
+        self._changed()
+
+    def on_update(self, table_name: str, old_values: list[dict],
+                  new_values: dict) -> None:
+        """Учитывает изменение столбцов new_values в строках со старыми old_values."""
+        state = self.get(table_name)
+        if state is None or not old_values:
+            return
+        for name, value in new_values.items():
+            stats = state["columns"].get(name)
+            if stats is None:
+                continue
+            _remove_values(stats, [old.get(name) for old in old_values])
+            _add_values(stats, [value] * len(old_values))
+        self._changed()
+
+    def on_delete(self, table_name: str, rows: list[dict]) -> None:
+        """Учитывает удалённые строки."""
+        state = self.get(table_name)
+        if state is None or not rows:
+            return
+        state["rows"] -= len(rows)
+        for name, stats in state["columns"].items():
+            if state["rows"] == 0:
+                state["columns"][name] = new_column_stats(
+                    name, "int" if stats["sum"] is not None else "str")
+            else:
+                _remove_values(stats, [row.get(name) for row in rows])
+        self._changed()
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""Менеджер таблиц: держит метаданные и данные в памяти между командами."""
+
+import copy
+import threading
+import time
+
+from src.constants import (
+    FLUSH_EVERY,
+    FLUSH_POLICY,
+    GROUP_COMMIT_WINDOW,
+    LOG_COMPACT_BYTES,
+    META_FILE,
+    STATS_FILE,
+    STORAGE_ENGINE,
+    TABLE_LAYOUT,
+)
+from src.metrics import registry
+
+from .binary import BinaryTable
+from .columnar import ColumnarTable, column_values
+from .journal import (
+    COMPACTING_SUFFIX,
+    append_records,
+    remove_logs,
+    rotate_log,
+)
+from .predicates import may_match
+from .segments import (
+    load_segments,
+    read_manifest,
+    read_segment,
+    save_segments,
+    segment_zones,
+)
+from .utils import (
+    convert_table_data,
+    delete_table_data,
+    load_metadata,
+    load_table_data,
+    save_metadata,
+    save_table_data,
+    snapshot_size,
+    table_format,
+    write_table_snapshot,
+)
+from .writer import BackgroundWriter
+
+FLUSH_POLICIES = ("command", "every_n", "group", "exit", "background")
+STORAGE_ENGINES = ("json", "log")
+TABLE_LAYOUTS = ("rows", "columnar")
+
+
+class TableManager:
+    """
+    Буферный пул таблиц.
+    Каждая таблица читается с диска один раз, дальше команды получают
+    тот же объект в памяти. Изменённые таблицы помечаются «грязными»
+    и сбрасываются на диск согласно политике flush_policy. С политикой
+    "group" изменения команд, пришедших за commit_window секунд,
+    сохраняются одной записью.
+
+    С движком "log" на диск дописываются только записи об изменениях,
+    а журнал, выросший больше compact_bytes, сворачивается в снимок
+    в фоновом потоке.
+
+    С представлением "columnar" таблицы из метаданных держатся в памяти
+    как ColumnarTable.
+
+    С политикой "background" изменения после каждой команды уходят
+    в очередь фонового потока записи (см. writer.py) вместе со снимком
+    таблицы, и команда не ждёт диска. Несколько сохранений одной
+    таблицы в очереди сливаются в одно; flush дожидается записи всей
+    очереди.
+
+    Сегментированные таблицы (формат "segments") при любом движке
+    сохраняются посегментно: переписываются только сегменты, строки
+    которых изменились. Пока такая таблица не прочитана целиком,
+    запросы с условием читают только сегменты, не исключённые
+    зональными картами.
+    """
+
+    def __init__(self, flush_policy: str = FLUSH_POLICY,
+                 flush_every: int = FLUSH_EVERY, meta_file=META_FILE,
+                 storage: str = STORAGE_ENGINE,
+                 compact_bytes: int = LOG_COMPACT_BYTES,
+                 layout: str = TABLE_LAYOUT, stats_file=STATS_FILE,
+                 commit_window: float = GROUP_COMMIT_WINDOW):
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(
+                f"Некорректная политика сброса: {flush_policy}. "
+                f"Допустимые: {', '.join(FLUSH_POLICIES)}"
+            )
+        if storage not in STORAGE_ENGINES:
+            raise ValueError(
+                f"Некорректный движок хранения: {storage}. "
+                f"Допустимые: {', '.join(STORAGE_ENGINES)}"
+            )
+        if layout not in TABLE_LAYOUTS:
+            raise ValueError(
+                f"Некорректное представление таблиц: {layout}. "
+                f"Допустимые: {', '.join(TABLE_LAYOUTS)}"
+            )
+        self.flush_policy = flush_policy
+        self.flush_every = max(1, flush_every)
+        self.meta_file = meta_file
+        self.storage = storage
+        self.compact_bytes = compact_bytes
+        self.layout = layout
+        self.stats_file = stats_file
+        self.commit_window = max(0.0, commit_window)
+        self._metadata: dict | None = None
+        # Растёт при каждом изменении схемы: ключ кэша разобранных команд.
+        self.schema_version = 0
+        self._stats: dict | None = None
+        self._stats_dirty = False
+        self._tables: dict[str, list[dict]] = {}
+        self._formats: dict[str, str] = {}
+        # Сегменты, прочитанные до полного чтения таблицы, манифесты
+        # и последняя выборка сегментов (номера, строки).
+        self._segments: dict[str, dict[int, list[dict]]] = {}
+        self._manifests: dict[str, dict] = {}
+        self._partials: dict[str, tuple] = {}
+        self._dirty: set[str] = set()
+        # Таблицы, изменённые после чтения с диска.
+        self._modified: set[str] = set()
+        self._records: dict[str, list[dict]] = {}
+        self._compactions: dict[str, threading.Thread] = {}
+        self._counted: set[str] = set()
+        self._pending = 0
+        # Время первого несохранённого изменения (для политики "group").
+        self._first_change = None
+        # Таблицы, журнал которых фоновая запись нашла слишком большим.
+        self._compact_due: set[str] = set()
+        self._writer = None
+        if flush_policy == "background":
+            self._writer = BackgroundWriter(
+                self._write_job, _merge_jobs, name="primitive_db-writer")
+
+    @property
+    def metadata(self) -> dict:
+        """Метаданные БД, загруженные один раз."""
+        if self._metadata is None:
+            self._metadata = load_metadata(self.meta_file)
+        return self._metadata
+
+    def save_metadata(self, metadata: dict) -> None:
+        """Запоминает и сразу сохраняет метаданные (изменения схемы)."""
+        self._metadata = metadata
+        self.schema_version += 1
+        save_metadata(self.meta_file, metadata)
+
+    @property
+    def stats(self) -> dict:
+        """
+        Служебное состояние таблиц (счётчики ID и статистика),
+        загруженное один раз.
+        """
+        if self._stats is None:
+            self._stats = load_metadata(self.stats_file)
+        return self._stats
+
+    def touch_stats(self) -> None:
+        """Помечает состояние таблиц изменённым (сохранится при сбросе)."""
+        self._stats_dirty = True
+
+    def reserve_ids(self, table_name: str, table_data: list[dict],
+                    count: int = 1) -> int:
+        """
+        Выдаёт count последовательных ID из сохраняемого счётчика таблицы
+        и возвращает первый из них. Удалённые ID повторно не выдаются.
+        """
+        state = self.stats.setdefault(table_name, {})
+        last_id = state.get("last_id")
+        if last_id is None or table_name not in self._counted:
+            # Журнал мог опередить счётчик при сбое — сверяемся с данными.
+            data_max = max(column_values(table_data, "ID"), default=0)
+            last_id = max(last_id or 0, data_max)
+            self._counted.add(table_name)
+        state["last_id"] = last_id + count
+        self._stats_dirty = True
+        return last_id + 1
+
+    def text_indexes(self, table_name: str) -> list[tuple[str, str]]:
+        """Созданные текстовые индексы таблицы: [(столбец, вид)]."""
+        state = self.stats.get(table_name, {})
+        return [tuple(item) for item in state.get("text_indexes", ())]
+
+    def add_text_index(self, table_name: str, column: str, kind: str) -> None:
+        """Запоминает текстовый индекс таблицы в служебном состоянии."""
+        created = self.stats.setdefault(table_name, {}).setdefault(
+            "text_indexes", [])
+        if [column, kind] not in created:
+            created.append([column, kind])
+            self._stats_dirty = True
+
+    def cached(self, table_name: str):
+        """Данные таблицы в памяти или None, если она ещё не прочитана."""
+        return self._tables.get(table_name)
+
+    def unchanged(self, table_name: str) -> bool:
+        """Совпадают ли данные таблицы в памяти с прочитанными с диска."""
+        return (table_name in self._tables
+                and table_name not in self._modified)
+
+    def table_format(self, table_name: str) -> str:
+        """Формат файла таблицы, определённый при первом обращении."""
+        fmt = self._formats.get(table_name)
+        if fmt is None:
+            fmt = self._formats[table_name] = table_format(table_name)
+        return fmt
+
+    def get(self, table_name: str, writable: bool = False,
+            where=None) -> list[dict]:
+        """
+        Возвращает данные таблицы, при первом обращении читает файл.
+        Бинарная таблица отдаётся для чтения лениво (BinaryTable),
+        а для изменения (writable=True) декодируется в список строк.
+        Для чтения по условию where из непрочитанной сегментированной
+        таблицы возвращаются только строки подходящих сегментов.
+        """
+        data = self._tables.get(table_name)
+        if data is None:
+            schema = self.metadata.get(table_name)
+            if schema is None:
+                # Неизвестную таблицу не кэшируем: её ещё могут создать.
+                return load_table_data(table_name)
+            segmented = self.table_format(table_name) == "segments"
+            if (segmented and where is not None and not writable
+                    and self.layout == "rows"):
+                return self._partial(table_name, where)
+            with registry.phase("load"):
+                if segmented:
+                    data = load_segments(
+                        table_name, self._segments.pop(table_name, None))
+                    self._manifests.pop(table_name, None)
+                    self._partials.pop(table_name, None)
+                else:
+                    data = load_table_data(table_name)
+                if self.layout == "columnar":
+                    data = ColumnarTable.from_rows(schema, data)
+            state = self.stats.get(table_name, {})
+            if state.get("rows", len(data)) != len(data):
+                # Статистика отстала от данных (сбой между сохранениями).
+                state.pop("rows")
+                state.pop("columns", None)
+                self._stats_dirty = True
+            self._tables[table_name] = data
+        if writable and isinstance(data, BinaryTable):
+            data = data.to_rows()
+            self._tables[table_name] = data
+        return data
+
+    def _partial(self, table_name: str, where) -> list[dict]:
+        """
+        Строки сегментов, которые условие where не исключает
+        по зональным картам. Прочитанные сегменты запоминаются
+        до полного чтения таблицы.
+        """
+        manifest = self._manifests.get(table_name)
+        if manifest is None:
+            manifest = self._manifests[table_name] = read_manifest(table_name)
+        zones = segment_zones(table_name, manifest)
+        numbers = tuple(number for number, zone in zones.items()
+                        if zone is None or may_match(where, zone))
+        registry.incr("segments_skipped", len(zones) - len(numbers))
+        cached = self._partials.get(table_name)
+        if cached is not None and cached[0] == numbers:
+            return cached[1]
+        segments = self._segments.setdefault(table_name, {})
+        rows = []
+        with registry.phase("load"):
+            for number in numbers:
+                segment = segments.get(number)
+                if segment is None:
+                    segment = segments[number] = read_segment(
+                        table_name, number)
+                rows.extend(segment)
+        # Тот же объект для тех же сегментов: индексы и кэш не теряются.
+        self._partials[table_name] = (numbers, rows)
+        return rows
+
+    def _drop_cached(self, table_name: str) -> None:
+        """Забывает данные таблицы в памяти и сведения о её файле."""
+        for cache in (self._tables, self._formats, self._segments,
+                      self._manifests, self._partials):
+            cache.pop(table_name, None)
+        self._modified.discard(table_name)
+
+    def put(self, table_name: str, data: list[dict]) -> None:
+        """Заменяет данные таблицы и помечает её изменённой."""
+        self._tables[table_name] = data
+        self.mark_dirty(table_name)
+
+    def mark_dirty(self, table_name: str) -> None:
+        """Помечает таблицу изменённой."""
+        self._dirty.add(table_name)
+        self._pending += 1
+        if self._first_change is None:
+            self._first_change = time.monotonic()
+
+    def record_change(self, table_name: str, record: dict) -> None:
+        """Запоминает запись об изменении строк для журнала."""
+        self._records.setdefault(table_name, []).append(record)
+        self._modified.add(table_name)
+
+    def is_dirty(self, table_name: str) -> bool:
+        """Проверяет, есть ли у таблицы несохранённые изменения."""
+        return table_name in self._dirty
+
+    def has_changes(self) -> bool:
+        """Есть ли несохранённые изменения таблиц или их состояния."""
+        return bool(self._dirty) or self._stats_dirty
+
+    def forget(self, table_name: str) -> None:
+        """Выбрасывает таблицу из памяти без сохранения (drop_table)."""
+        if self._writer is not None:
+            self._writer.cancel(table_name)
+            self._writer.wait()
+        self._compact_due.discard(table_name)
+        self.wait_compaction(table_name)
+        self._drop_cached(table_name)
+        self._records.pop(table_name, None)
+        self._dirty.discard(table_name)
+        self._counted.discard(table_name)
+        text_indexes = self.text_indexes(table_name)
+        if self.stats.pop(table_name, None) is not None:
+            self._stats_dirty = True
+        delete_table_data(table_name, text_indexes)
+
+    def end_command(self) -> None:
+        """Вызывается после каждой команды и сбрасывает данные по политике."""
+        if self.flush_policy == "command":
+            self.flush()
+        elif (self.flush_policy == "every_n"
+              and self._pending >= self.flush_every):
+            self.flush()
+        elif self.flush_policy == "group" and self._pending and (
+                self._pending >= self.flush_every
+                or time.monotonic() - self._first_change >= self.commit_window):
+            self.flush()
+        elif self.flush_policy == "background":
+            self._submit()
+            if self._compact_due:
+                self._writer.wait()
+                self._run_compactions()
+
+    def commit(self) -> None:
+        """
+        Фиксирует изменения (команда commit): с фоновой записью ставит
+        их в очередь, не дожидаясь диска, иначе сохраняет сразу.
+        """
+        if self._writer is None:
+            self.flush()
+        else:
+            self._submit()
+
+    def flush(self) -> None:
+        """Сохраняет все изменённые таблицы на диск."""
+        if self._writer is None:
+            with registry.phase("save"):
+                self._flush()
+            return
+        self._submit()
+        self._writer.wait()
+        self._run_compactions()
+
+    def _flush(self) -> None:
+        for table_name in sorted(self._dirty):
+            self._save_table(table_name, self._tables[table_name],
+                             self.metadata.get(table_name),
+                             self._records.pop(table_name, None))
+        self._dirty.clear()
+        if self._stats_dirty:
+            save_metadata(self.stats_file, self._stats)
+            self._stats_dirty = False
+        self._pending = 0
+        self._first_change = None
+        self._run_compactions()
+
+    def _save_table(self, table_name: str, data, schema,
+                    records: list[dict] | None) -> None:
+        """
+        Сохраняет одну таблицу: сегменты, файл целиком или записи журнала.
+        Журнал, выросший выше порога, помечается для компакции.
+        """
+        if self.table_format(table_name) == "segments":
+            if records:
+                save_segments(table_name, data, records)
+        elif self.storage == "json":
+            self.wait_compaction(table_name)
+            save_table_data(table_name, data, schema)
+        elif records:
+            log_size = append_records(table_name, records)
+            # Порог растёт вместе со снимком, чтобы при массовой
+            # загрузке суммарная стоимость компакций оставалась линейной.
+            threshold = max(self.compact_bytes, snapshot_size(table_name))
+            if log_size >= threshold:
+                self._compact_due.add(table_name)
+
+    def _run_compactions(self) -> None:
+        """Запускает компакцию журналов, помеченных при сохранении."""
+        while self._compact_due:
+            table_name = self._compact_due.pop()
+            if table_name in self._tables:
+                self.compact(table_name)
+
+    def _submit(self) -> None:
+        """
+        Ставит изменения в очередь фоновой записи. Задание таблицы
+        несёт её снимок: список строк копируется поверхностно (строки
+        при изменении заменяются, а не правятся), столбцовая таблица —
+        копией массивов. Для журнала снимок не нужен, только записи.
+        """
+        for table_name in sorted(self._dirty):
+            data = None
+            if (self.table_format(table_name) == "segments"
+                    or self.storage == "json"):
+                data = self._tables[table_name]
+                data = (list(data) if isinstance(data, list)
+                        else data.snapshot())
+            self._writer.submit(table_name, {
+                "data": data,
+                "schema": self.metadata.get(table_name),
+                "records": self._records.pop(table_name, []),
+            })
+        self._dirty.clear()
+        if self._stats_dirty:
+            self._writer.submit(None, {"data": copy.deepcopy(self._stats),
+                                       "records": []})
+            self._stats_dirty = False
+        self._pending = 0
+        self._first_change = None
+
+    def _write_job(self, table_name: str | None, job: dict) -> None:
+        """Выполняется в потоке записи."""
+        with registry.phase("save"):
+            if table_name is None:
+                save_metadata(self.stats_file, job["data"])
+            else:
+                self._save_table(table_name, job["data"], job["schema"],
+                                 job["records"])
+
+    def compact(self, table_name: str) -> None:
+        """
+        Сворачивает журнал таблицы в снимок.
+        Снимок пишется в фоне из копии строк, а новые изменения
+        тем временем дописываются в свежий журнал.
+        """
+        thread = self._compactions.get(table_name)
+        if thread is not None and thread.is_alive():
+            return
+        rows = [dict(row) for row in self._tables[table_name]]
+        schema = self.metadata.get(table_name)
+        if not rotate_log(table_name):
+            # Остался журнал прерванной компакции: сворачиваем синхронно,
+            # в памяти уже лежит результат применения обоих журналов.
+            save_table_data(table_name, rows, schema)
+            return
+
+        def run():
+            write_table_snapshot(table_name, rows, schema)
+            remove_logs(table_name, (COMPACTING_SUFFIX,))
+
+        thread = threading.Thread(
+            target=run, name=f"compact-{table_name}", daemon=True)
+        self._compactions[table_name] = thread
+        thread.start()
+
+    def convert(self, table_name: str, fmt: str) -> None:
+        """Переводит файл таблицы в формат fmt ("json" или "binary")."""
+        if table_name not in self.metadata:
+            raise KeyError(table_name)
+        self.flush()
+        self.wait_compaction(table_name)
+        self._drop_cached(table_name)
+        convert_table_data(table_name, fmt, self.metadata[table_name])
+
+    def wait_compaction(self, table_name: str | None = None) -> None:
+        """Дожидается окончания фоновой компакции таблицы (или всех)."""
+        names = [table_name] if table_name else list(self._compactions)
+        for name in names:
+            thread = self._compactions.pop(name, None)
+            if thread is not None:
+                thread.join()
+
+    def close(self) -> None:
+        """Сохраняет несохранённые изменения перед выходом."""
+        try:
+            self.flush()
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            self.wait_compaction()
+
+
+def _merge_jobs(old: dict, new: dict) -> dict:
+    """
+    Сливает два задания записи одной таблицы: снимок берётся новый,
+    записи журнала — из обоих по порядку.
+    """
+    return {**new, "data": new["data"] if new["data"] is not None
+            else old["data"], "records": old["records"] + new["records"]}
@@ -2,42 +2,209 @@
 """Вспомогательные функции для работы с метаданными и таблицами."""
 
 import json
+import os
 
-from src.constants import DATA_DIR
+from src.constants import DATA_DIR, TABLE_FORMAT
+from src.metrics import registry
 
-DATA_DIR.mkdir(exist_ok=True)
+from .binary import BinaryTable, write_binary_table
+from .durable import atomic_write
+from .journal import (
+    COMPACTING_SUFFIX,
+    log_path,
+    read_records,
+    remove_logs,
+    replay,
+)
+from .segments import (
+    MANIFEST_FILE,
+    SEGMENTS_SUFFIX,
+    load_segments,
+    remove_segments,
+    write_all_segments,
+)
+
+# Расширения файлов таблиц по форматам (у сегментированной — каталога).
+TABLE_SUFFIXES = {"json": ".json", "binary": ".tbl",
+                  "segments": SEGMENTS_SUFFIX}
+INDEX_SUFFIX = ".idx"
+
+
+def normalize_value(value):
+    """Приводит значение к единому виду для корректного сравнения."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        low = value.lower()
+        if low in ("true", "1"):
+            return True
+        if low in ("false", "0"):
+            return False
+        # Числа
+        if value.isdigit():
+            return int(value)
+    return value
 
 
 def load_metadata(filepath: str) -> dict:
     """Загружает метаданные из JSON файла."""
     try:
         with open(filepath, "r", encoding="utf-8") as f:
+            registry.incr("bytes_read", os.fstat(f.fileno()).st_size)
             return json.load(f)
     except FileNotFoundError:
         return {}
 
 
 def save_metadata(filepath: str, data: dict) -> None:
-    """Сохраняет метаданные в JSON файл."""
-    with open(filepath, "w", encoding="utf-8") as f:
+    """Сохраняет метаданные в JSON файл (атомарно, см. durable.py)."""
+    with atomic_write(filepath) as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
+        registry.incr("bytes_written", f.tell())
+
+
+def table_file(table_name: str, table_format: str = "json"):
+    """Путь к файлу данных таблицы в указанном формате."""
+    return DATA_DIR / f"{table_name}{TABLE_SUFFIXES[table_format]}"
+
+
+def table_format(table_name: str) -> str:
+    """
+    Определяет формат файла таблицы по тому, какой файл лежит на диске.
+    Для новой таблицы возвращает формат по умолчанию TABLE_FORMAT.
+    """
+    for fmt in TABLE_SUFFIXES:
+        if table_file(table_name, fmt).exists():
+            return fmt
+    return TABLE_FORMAT
+
+
+def index_file(table_name: str, column: str, kind: str):
+    """Путь к файлу текстового индекса столбца таблицы."""
+    return DATA_DIR / f"{table_name}.{column}.{kind}{INDEX_SUFFIX}"
+
+
+def table_fingerprint(table_name: str) -> list:
+    """
+    Размеры и время изменения файлов таблицы (снимка, журналов,
+    каталога и манифеста сегментов). Меняется при каждом сохранении
+    таблицы: по нему проверяется, что файл индекса не устарел.
+    """
+    fmt = table_format(table_name)
+    paths = [table_file(table_name, fmt), log_path(table_name),
+             log_path(table_name, COMPACTING_SUFFIX)]
+    if fmt == "segments":
+        paths.append(paths[0] / MANIFEST_FILE)
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            fingerprint.append(None)
+        else:
+            fingerprint.append([stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def snapshot_size(table_name: str) -> int:
+    """Размер файла снимка таблицы в байтах (0, если файла нет)."""
+    try:
+        return table_file(table_name, table_format(table_name)).stat().st_size
+    except FileNotFoundError:
+        return 0
 
 
 def load_table_data(table_name: str) -> list[dict]:
     """
-    Загружает данные таблицы из файла data/<table>.json.
-    Если файла нет, возвращает пустой список.
+    Загружает данные таблицы из файла data/<table>.json (или .tbl)
+    и применяет к ним журнал изменений data/<table>.log.
+    Бинарная таблица без журнала возвращается как BinaryTable
+    с ленивым чтением. Если файлов нет, возвращает пустой список.
     """
-    table_file = DATA_DIR / f"{table_name}.json"
+    fmt = table_format(table_name)
+    if fmt == "segments":
+        return replay(load_segments(table_name), read_records(table_name))
+    if fmt == "binary":
+        path = table_file(table_name, "binary")
+        table = BinaryTable(path)
+        registry.incr("bytes_read", path.stat().st_size)
+        records = list(read_records(table_name))
+        if not records:
+            return table
+        data = table.to_rows()
+        table.close()
+        return replay(data, records)
+
     try:
-        with open(table_file, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(table_file(table_name), "r", encoding="utf-8") as f:
+            registry.incr("bytes_read", os.fstat(f.fileno()).st_size)
+            data = json.load(f)
     except FileNotFoundError:
-        return []
+        data = []
+    return replay(data, read_records(table_name))
 
 
-def save_table_data(table_name: str, data: list[dict]) -> None:
-    """Сохраняет данные таблицы в файл data/<table>.json."""
-    table_file = DATA_DIR / f"{table_name}.json"
-    with open(table_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+def write_table_snapshot(table_name: str, data: list[dict],
+                         schema=None, fmt: str | None = None) -> None:
+    """
+    Записывает снимок таблицы в формате fmt (по умолчанию — в формате
+    существующего файла). Файл пишется во временный, сбрасывается
+    на диск и атомарно подменяется.
+    """
+    fmt = fmt or table_format(table_name)
+    target = table_file(table_name, fmt)
+    if fmt == "binary":
+        write_binary_table(target, data, schema)
+    elif fmt == "segments":
+        write_all_segments(table_name, data)
+        return
+    else:
+        if not isinstance(data, list):
+            data = data.to_rows()
+        with atomic_write(target) as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+    registry.incr("bytes_written", target.stat().st_size)
+
+
+def save_table_data(table_name: str, data: list[dict], schema=None) -> None:
+    """Сохраняет данные таблицы в файл data/<table>.json (или .tbl)."""
+    write_table_snapshot(table_name, data, schema)
+    remove_logs(table_name)
+
+
+def convert_table_data(table_name: str, fmt: str, schema=None) -> None:
+    """Переводит файл таблицы в формат fmt ("json" или "binary")."""
+    if fmt not in TABLE_SUFFIXES:
+        raise ValueError(
+            f"Некорректный формат: {fmt}. "
+            f"Допустимые: {', '.join(TABLE_SUFFIXES)}"
+        )
+    old_fmt = table_format(table_name)
+    data = load_table_data(table_name)
+    write_table_snapshot(table_name, data, schema, fmt)
+    if isinstance(data, BinaryTable):
+        data.close()
+    remove_logs(table_name)
+    if old_fmt != fmt:
+        remove_table_file(table_name, old_fmt)
+
+
+def remove_table_file(table_name: str, fmt: str) -> None:
+    """Удаляет файл (или каталог сегментов) таблицы в формате fmt."""
+    if fmt == "segments":
+        remove_segments(table_name)
+        return
+    path = table_file(table_name, fmt)
+    if path.exists():
+        os.remove(path)
+
+
+def delete_table_data(table_name: str, indexes=()) -> None:
+    """Удаляет файлы данных таблицы, её журнал и файлы индексов indexes."""
+    for fmt in TABLE_SUFFIXES:
+        remove_table_file(table_name, fmt)
+    remove_logs(table_name)
+    for column, kind in indexes:
+        path = index_file(table_name, column, kind)
+        if path.exists():
+            os.remove(path)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Фоновая запись на диск: очередь заданий и поток, который их выполняет.
+
+Задания хранятся по ключу (имени таблицы). Новое задание для ключа,
+которое ещё ждёт записи, сливается со старым, поэтому несколько
+сохранений таблицы подряд дают одну запись.
+"""
+
+import threading
+
+from src.metrics import registry
+
+
+class BackgroundWriter:
+    """
+    Очередь записи с одним потоком-исполнителем.
+    write(key, job) выполняет задание, merge(old, new) сливает
+    задания одного ключа. Ошибка записи возвращает задание в очередь
+    и пробрасывается из следующего wait.
+    """
+
+    def __init__(self, write, merge, name: str = "writer"):
+        self._write = write
+        self._merge = merge
+        self._name = name
+        self._pending: dict = {}
+        self._busy = False
+        # После ошибки поток не повторяет запись, пока её не попросят.
+        self._blocked = False
+        self._error: BaseException | None = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def submit(self, key, job) -> None:
+        """Ставит задание в очередь, сливая его с ожидающим."""
+        with self._condition:
+            old = self._pending.pop(key, None)
+            if old is not None:
+                job = self._merge(old, job)
+                registry.incr("writes_coalesced")
+            self._pending[key] = job
+            self._start()
+            self._condition.notify_all()
+
+    def cancel(self, key) -> None:
+        """Убирает из очереди задание ключа, если его ещё не начали."""
+        with self._condition:
+            self._pending.pop(key, None)
+
+    def wait(self) -> None:
+        """Дожидается записи всех заданий; пробрасывает ошибку записи."""
+        with self._condition:
+            self._blocked = False
+            self._condition.notify_all()
+            self._condition.wait_for(
+                lambda: self._blocked or not (self._pending or self._busy))
+            error, self._error = self._error, None
+        if error is not None:
+            raise RuntimeError(f"Ошибка фоновой записи: {error}") from error
+
+    def close(self) -> None:
+        """Записывает оставшиеся задания и останавливает поток."""
+        try:
+            self.wait()
+        finally:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._closed = False
+            self._thread = threading.Thread(
+                target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed
+                    or (self._pending and not self._blocked))
+                if self._closed:
+                    return
+                jobs, self._pending = self._pending, {}
+                self._busy = True
+            failed = {}
+            for key, job in jobs.items():
+                try:
+                    self._write(key, job)
+                except Exception as e:
+                    failed[key] = job
+                    error = e
+            with self._condition:
+                self._busy = False
+                if failed:
+                    for key, job in failed.items():
+                        newer = self._pending.pop(key, None)
+                        self._pending[key] = (
+                            job if newer is None else self._merge(job, newer))
+                    self._error = error
+                    self._blocked = True
+                self._condition.notify_all()